@@ -1,19 +1,255 @@
-from sqlalchemy.ext.asyncio import create_async_engine
+import asyncio
+import itertools
+import logging
+import math
+import time
+import uuid
+
+from fastapi import Request
+from sqlalchemy import DDL, Table, event, exc, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
 from sqlalchemy.orm import sessionmaker
-from sqlmodel import SQLModel
+from sqlalchemy.pool import AsyncAdaptedQueuePool, NullPool
 from sqlmodel.ext.asyncio.session import AsyncSession
 
 from app.config import settings
+from app.metrics import Counter, Gauge, Histogram
+from app.telemetry import instrument_engine
+
+logger = logging.getLogger(__name__)
+
+# Text search configuration used for every tsvector and tsquery.
+SEARCH_CONFIG = "portuguese"
+
+POOL_CHECKOUT_WAIT = Histogram(
+    "db_pool_checkout_seconds", "Time to get a connection from the pool, opening one if needed", ("pool",),
+)
+POOL_TIMEOUTS = Counter("db_pool_timeouts_total", "Checkouts that gave up after db_pool_timeout_seconds", ("pool",))
+POOL_IN_USE = Gauge("db_pool_connections_in_use", "Connections checked out of the pool", ("pool",))
+POOL_LIMIT = Gauge("db_pool_connections_max", "Most connections the pool will open", ("pool",))
+
+
+class _InstrumentedPool:
+    """Times checkouts; ``name`` labels the pool's metrics."""
+
+    name = "primary"
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            POOL_TIMEOUTS.inc(pool=self.name)
+            raise
+        finally:
+            POOL_CHECKOUT_WAIT.observe(time.perf_counter() - start, pool=self.name)
+
+    def recreate(self):
+        # engine.dispose() replaces the pool with a fresh one.
+        pool = super().recreate()
+        pool.name = self.name
+        return pool
+
+
+class InstrumentedQueuePool(_InstrumentedPool, AsyncAdaptedQueuePool):
+    pass
+
 
-engine = create_async_engine(settings.database_url, echo=False)
+class InstrumentedNullPool(_InstrumentedPool, NullPool):
+    pass
+
+
+def build_engine(url: str, name: str) -> AsyncEngine:
+    """An engine with the pool settings from ``settings``, pool and query metrics."""
+    kwargs: dict = {"echo": False, "pool_pre_ping": settings.db_pool_pre_ping}
+    connect_args: dict = {}
+    if settings.db_pgbouncer:
+        # PgBouncer pools the server connections; prepared statements get
+        # unique names and aren't cached, as the next transaction may run
+        # on another server connection.
+        kwargs["poolclass"] = InstrumentedNullPool
+        statement_cache_size = 0
+        connect_args["prepared_statement_name_func"] = lambda: f"__asyncpg_{uuid.uuid4()}__"
+    else:
+        kwargs.update(
+            poolclass=InstrumentedQueuePool,
+            pool_size=settings.db_pool_size,
+            max_overflow=settings.db_max_overflow,
+            pool_timeout=settings.db_pool_timeout_seconds,
+            pool_recycle=settings.db_pool_recycle_seconds,
+        )
+        statement_cache_size = settings.db_statement_cache_size
+        POOL_LIMIT.set(settings.db_pool_size + settings.db_max_overflow, pool=name)
+    if url.startswith("postgresql+asyncpg"):
+        # asyncpg's own statement cache and SQLAlchemy's prepared statement cache.
+        connect_args.update(
+            statement_cache_size=statement_cache_size,
+            prepared_statement_cache_size=statement_cache_size,
+        )
+    else:
+        connect_args.pop("prepared_statement_name_func", None)
+    new_engine = create_async_engine(url, connect_args=connect_args, **kwargs)
+    new_engine.sync_engine.pool.name = name
+    POOL_IN_USE.set(0, pool=name)
+    event.listen(new_engine.sync_engine, "checkout", lambda *args: POOL_IN_USE.inc(pool=name))
+    event.listen(new_engine.sync_engine, "checkin", lambda *args: POOL_IN_USE.dec(pool=name))
+    instrument_engine(new_engine, name)
+    return new_engine
+
+
+engine = build_engine(settings.database_url, "primary")
 async_session = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
 
 
+# Seconds the replica is behind the primary; 0 when caught up or not a replica.
+_LAG_QUERY = text("""
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())
+    END
+""")
+
+# Holds the time until which the client's reads go to the primary.
+PRIMARY_COOKIE = "violeta_primary_until"
+
+REPLICA_LAG = Gauge("db_replica_lag_seconds", "Replication lag at the last check", ("replica",))
+READ_SESSIONS = Counter("db_read_sessions_total", "Sessions opened for read-only endpoints", ("target",))
+
+
+class ReplicaSet:
+    """Read replicas and their replication lag, checked in the background.
+
+    A replica serves reads only while its last measured lag is within
+    ``settings.replica_max_lag_seconds``; until the first check, and when
+    a check fails, it counts as infinitely behind.
+    """
+
+    def __init__(self, urls: list[str]):
+        self.engines = [build_engine(url, f"replica{index}") for index, url in enumerate(urls)]
+        self.sessions = [
+            sessionmaker(replica, class_=AsyncSession, expire_on_commit=False) for replica in self.engines
+        ]
+        self.lag = [math.inf] * len(self.engines)
+        self._turn = itertools.count()
+
+    def __bool__(self) -> bool:
+        return bool(self.engines)
+
+    def pick(self) -> sessionmaker | None:
+        """Round robin over the replicas that are caught up, or ``None``."""
+        healthy = [
+            maker for maker, lag in zip(self.sessions, self.lag) if lag <= settings.replica_max_lag_seconds
+        ]
+        if not healthy:
+            return None
+        return healthy[next(self._turn) % len(healthy)]
+
+    async def check(self):
+        for index, replica in enumerate(self.engines):
+            try:
+                async with replica.connect() as conn:
+                    lag = (await conn.execute(_LAG_QUERY)).scalar()
+                self.lag[index] = math.inf if lag is None else float(lag)
+            except Exception:
+                logger.warning("Replica %d is unreachable", index, exc_info=True)
+                self.lag[index] = math.inf
+            REPLICA_LAG.set(self.lag[index], replica=str(index))
+
+    async def run(self, interval: float):
+        while True:
+            await self.check()
+            await asyncio.sleep(interval)
+
+    async def dispose(self):
+        for replica in self.engines:
+            await replica.dispose()
+
+
+replicas = ReplicaSet(settings.database_replica_urls)
+
+
 async def get_session():
     async with async_session() as session:
         yield session
 
 
-async def create_db_and_tables():
-    async with engine.begin() as conn:
-        await conn.run_sync(SQLModel.metadata.create_all)
+def _wrote_recently(request: Request) -> bool:
+    try:
+        return float(request.cookies.get(PRIMARY_COOKIE, 0)) > time.time()
+    except ValueError:
+        return False
+
+
+async def get_read_session(request: Request):
+    """Session for endpoints that only read.
+
+    Bound to a replica that is caught up, unless the client wrote within
+    the last ``settings.replica_sticky_seconds`` (see
+    ``ReadYourWritesMiddleware``) or no replica is: then the primary.
+    """
+    maker = None if _wrote_recently(request) else replicas.pick()
+    READ_SESSIONS.inc(target="primary" if maker is None else "replica")
+    async with (maker or async_session)() as session:
+        yield session
+
+
+class ReadYourWritesMiddleware:
+    """After a successful write, pin the client's reads to the primary.
+
+    Sets ``PRIMARY_COOKIE`` on responses to non-GET requests, so the
+    pinning follows the browser across workers. Does nothing without
+    replicas.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not replicas or scope["method"] in ("GET", "HEAD", "OPTIONS"):
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_cookie(message):
+            if message["type"] == "http.response.start" and message["status"] < 400:
+                sticky = settings.replica_sticky_seconds
+                cookie = (
+                    f"{PRIMARY_COOKIE}={time.time() + sticky:.3f}; Max-Age={math.ceil(sticky)}; "
+                    "Path=/; HttpOnly; SameSite=Lax"
+                )
+                message["headers"] = list(message.get("headers", [])) + [(b"set-cookie", cookie.encode())]
+            await send(message)
+
+        await self.app(scope, receive, send_with_cookie)
+
+
+def dialect_insert(session: AsyncSession, model):
+    """INSERT construct for the session's dialect, with ``on_conflict_*`` support.
+
+    Production runs on PostgreSQL, tests on SQLite; both support
+    ``ON CONFLICT`` and ``RETURNING`` but through different constructs.
+    """
+    if session.get_bind().dialect.name == "postgresql":
+        return pg_insert(model)
+    return sqlite_insert(model)
+
+
+def add_search_vector(table: Table, weights: dict[str, str]):
+    """Give ``table`` a GIN-indexed ``search_vector`` tsvector on PostgreSQL.
+
+    The column is generated from the text columns in ``weights`` (column
+    name -> ``A``..``D``), so Postgres keeps it current on every write.
+    Other dialects don't get it; see ``app.services.search``.
+    """
+    expression = " || ".join(
+        f"setweight(to_tsvector('{SEARCH_CONFIG}', coalesce({column}, '')), '{weight}')"
+        for column, weight in weights.items()
+    )
+    for statement in (
+        f"ALTER TABLE {table.name} ADD COLUMN search_vector tsvector "
+        f"GENERATED ALWAYS AS ({expression}) STORED",
+        f"CREATE INDEX ix_{table.name}_search_vector ON {table.name} USING gin (search_vector)",
+    ):
+        event.listen(table, "after_create", DDL(statement).execute_if(dialect="postgresql"))
@@ -0,0 +1,49 @@
+"""Maintenance jobs, run as ``python -m app.jobs <name>``.
+
+Each job is an async function taking a session and returning the number of
+rows it touched. They are safe to run while the API is serving traffic,
+except ``reconcile-counters`` with ``COUNTER_WRITE_BEHIND`` on: the API
+workers' buffered deltas would be counted twice, so it refuses to run.
+"""
+
+import argparse
+import asyncio
+
+from app.database import async_session
+from app.services.blobs import extract_document_blobs, prune_blobs
+from app.services.contents import reconcile_content_refs
+from app.services.counters import reconcile_publication_counters, reconcile_user_counters
+from app.services.history import prune_history
+from app.services.search import reindex_search
+from app.services.suggestions import rebuild_suggestions
+
+JOBS = {
+    "reconcile-counters": reconcile_publication_counters,
+    "reconcile-user-counters": reconcile_user_counters,
+    "rebuild-suggestions": rebuild_suggestions,
+    "extract-blobs": extract_document_blobs,
+    "prune-blobs": prune_blobs,
+    "prune-history": prune_history,
+    "reconcile-content-refs": reconcile_content_refs,
+    "reindex-search": reindex_search,
+}
+
+
+async def run_job(name: str) -> int:
+    async with async_session() as session:
+        return await JOBS[name](session)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Violeta maintenance jobs")
+    parser.add_argument("job", choices=sorted(JOBS))
+    args = parser.parse_args()
+    try:
+        touched = asyncio.run(run_job(args.job))
+    except RuntimeError as exc:
+        parser.exit(1, f"{args.job}: {exc}\n")
+    print(f"{args.job}: {touched} rows updated")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,23 @@
+import asyncio
+import contextlib
 from contextlib import asynccontextmanager
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 
 from app.config import settings
-from app.database import create_db_and_tables
+from app.database import ReadYourWritesMiddleware, engine, replicas
+from app.metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, render as render_metrics
+from app.telemetry import MetricsMiddleware, monitor_event_loop
 from app.models.publication import Publication, PublicationLike, PublicationComment  # noqa: F401
 from app.models.follow import Follow  # noqa: F401
+from app.models.suggestion import FollowSuggestion  # noqa: F401
+from app.models.notification import Notification, NotificationActor  # noqa: F401
+from app.models.blob import Blob  # noqa: F401
+from app.models.revision import DocumentRevision  # noqa: F401
+from app.models.job import Job  # noqa: F401
+from app.models.drive_file import DriveFile, DriveSyncState  # noqa: F401
 from app.routers.auth import router as auth_router
 from app.routers.documents import router as documents_router
 from app.routers.sharing import router as sharing_router
@@ -15,12 +26,65 @@ from app.routers.publications import router as publications_router, public_route
 from app.routers.comments import router as comments_router
 from app.routers.follows import router as follows_router
 from app.routers.compile import router as compile_router
+from app.routers.notifications import router as notifications_router
+from app.routers.blobs import router as blobs_router
+from app.routers.search import router as search_router
+from app.routers.collab import router as collab_router
+from app.routers.jobs import router as jobs_router
+from app.services.autosave import document_saves
+from app.services.collab import collab_hub
+from app.services.counters import counter_buffer
+from app.services.google_drive import drive_client
+from app.services.notifications import notification_hub
+from app.services.passwords import password_hasher
+from app.utils.pagination import NEXT_CURSOR_HEADER
+
+
+async def _stop(task: asyncio.Task):
+    """Cancel ``task`` and wait until it has finished unwinding."""
+    task.cancel()
+    with contextlib.suppress(asyncio.CancelledError):
+        await task
 
 
 @asynccontextmanager
 async def lifespan(app_instance: FastAPI):
-    await create_db_and_tables()
+    # The schema is managed by Alembic (``alembic upgrade head``), not here.
+    flush_task = None
+    if settings.counter_write_behind:
+        flush_task = asyncio.create_task(counter_buffer.run(settings.counter_flush_interval_seconds))
+    save_task = None
+    if settings.document_write_behind:
+        save_task = asyncio.create_task(document_saves.run(
+            settings.document_idle_flush_seconds, settings.document_max_flush_delay_seconds,
+        ))
+    checkpoint_task = asyncio.create_task(collab_hub.run(settings.collab_checkpoint_seconds))
+    loop_lag_task = asyncio.create_task(monitor_event_loop(settings.event_loop_lag_interval_seconds))
+    replica_task = None
+    if replicas:
+        await replicas.check()
+        replica_task = asyncio.create_task(replicas.run(settings.replica_check_interval_seconds))
+    listener_task = None
+    if engine.dialect.name == "postgresql":
+        listener_task = asyncio.create_task(notification_hub.listen())
     yield
+    if listener_task:
+        listener_task.cancel()
+    loop_lag_task.cancel()
+    # A flush cut short puts its work back; wait for that before the last one.
+    await _stop(checkpoint_task)
+    await collab_hub.checkpoint_all()
+    if flush_task:
+        await _stop(flush_task)
+        await counter_buffer.flush()
+    if save_task:
+        await _stop(save_task)
+        await document_saves.flush_all()
+    password_hasher.shutdown()
+    await drive_client.aclose()
+    if replica_task:
+        replica_task.cancel()
+        await replicas.dispose()
 
 
 app = FastAPI(title="Violeta API", version="0.1.0", lifespan=lifespan)
@@ -31,7 +95,11 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER],
 )
+app.add_middleware(ReadYourWritesMiddleware)
+# Added last, so it is outermost and times everything the others do too.
+app.add_middleware(MetricsMiddleware)
 
 
 app.include_router(auth_router)
@@ -43,6 +111,16 @@ app.include_router(publications_public_router)
 app.include_router(comments_router)
 app.include_router(follows_router)
 app.include_router(compile_router)
+app.include_router(notifications_router)
+app.include_router(blobs_router)
+app.include_router(search_router)
+app.include_router(collab_router)
+app.include_router(jobs_router)
+
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    return PlainTextResponse(render_metrics(), media_type=METRICS_CONTENT_TYPE)
 
 
 @app.get("/api/health")
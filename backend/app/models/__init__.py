@@ -1,4 +1,16 @@
 from app.models.user import User
-from app.models.document import Document
+from app.models.document import Document, DocumentContent
+from app.models.publication import Publication, PublicationComment, PublicationLike
+from app.models.follow import Follow
+from app.models.suggestion import FollowSuggestion
+from app.models.notification import Notification, NotificationActor
+from app.models.blob import Blob
+from app.models.revision import DocumentRevision
+from app.models.job import Job
+from app.models.drive_file import DriveFile, DriveSyncState
 
-__all__ = ["User", "Document"]
+__all__ = [
+    "User", "Document", "DocumentContent", "Publication", "PublicationComment", "PublicationLike",
+    "Follow", "FollowSuggestion", "Notification", "NotificationActor", "Blob", "DocumentRevision", "Job",
+    "DriveFile", "DriveSyncState",
+]
@@ -0,0 +1,18 @@
+from datetime import datetime
+
+from sqlmodel import SQLModel, Field
+
+
+class Blob(SQLModel, table=True):
+    """Content-addressed file extracted from document content.
+
+    The bytes live on disk under ``settings.blob_dir``; the row records that
+    the file exists and how to serve it. ``hash`` is the SHA-256 hex digest.
+    """
+
+    __tablename__ = "blobs"
+
+    hash: str = Field(primary_key=True, max_length=64)
+    mime_type: str = Field(max_length=255)
+    size: int
+    created_at: datetime = Field(default_factory=datetime.utcnow)
@@ -3,19 +3,74 @@ from datetime import datetime
 from typing import Any
 
 from sqlmodel import SQLModel, Field, Column
-from sqlalchemy import JSON
+from sqlalchemy import DDL, JSON, Index, Text, event, text
+
+from app.database import add_search_vector
+
+
+class DocumentContent(SQLModel, table=True):
+    """Content shared by several documents, stored once.
+
+    ``hash`` is the SHA-256 of the canonical JSON; ``ref_count`` is the
+    number of documents whose ``content_hash`` points here.
+    """
+
+    __tablename__ = "document_contents"
+
+    hash: str = Field(primary_key=True, max_length=64)
+    content: dict[str, Any] = Field(default_factory=dict, sa_column=Column(JSON))
+    ref_count: int = Field(default=0)
+    created_at: datetime = Field(default_factory=datetime.utcnow)
 
 
 class Document(SQLModel, table=True):
+    """A user's document.
+
+    While ``content_hash`` is set the document has not been edited since it
+    was copied (or since a copy was made from it): ``content`` is empty and
+    the real content lives in ``DocumentContent``. The first save gives the
+    document its own ``content`` again.
+    """
+
     __tablename__ = "documents"
+    __table_args__ = (
+        Index("ix_documents_owner_id_updated_at", "owner_id", "updated_at", "id"),
+        # Title search (ILIKE '%term%') on PostgreSQL; needs pg_trgm.
+        Index(
+            "ix_documents_title_trgm",
+            "title",
+            postgresql_using="gin",
+            postgresql_ops={"title": "gin_trgm_ops"},
+        ).ddl_if(dialect="postgresql"),
+        # Shared views look public documents up by token; few are public.
+        Index(
+            "ix_documents_share_token_public",
+            "share_token",
+            postgresql_where=text("is_public"),
+            sqlite_where=text("is_public"),
+        ),
+    )
 
     id: uuid.UUID = Field(default_factory=uuid.uuid4, primary_key=True)
     owner_id: uuid.UUID = Field(foreign_key="users.id", index=True)
     title: str = Field(max_length=255, default="Untitled")
     content: dict[str, Any] = Field(default_factory=dict, sa_column=Column(JSON))
+    content_hash: str | None = Field(default=None, foreign_key="document_contents.hash", max_length=64)
+    # Plain text of ``content`` (see ``app.utils.tiptap``), for search.
+    search_text: str = Field(default="", sa_column=Column(Text, nullable=False, server_default=""))
     is_public: bool = Field(default=False)
     share_token: str | None = Field(default=None, max_length=64, unique=True)
     copied_from_id: uuid.UUID | None = Field(default=None, foreign_key="documents.id")
     google_drive_file_id: str | None = Field(default=None, max_length=255)
+    version: int = Field(default=1)
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
+
+
+add_search_vector(Document.__table__, {"title": "A", "search_text": "B"})
+
+event.listen(
+    SQLModel.metadata,
+    "before_create",
+    DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm").execute_if(dialect="postgresql"),
+)
@@ -0,0 +1,31 @@
+import uuid
+from datetime import datetime
+
+from sqlalchemy import Index, UniqueConstraint
+from sqlmodel import SQLModel, Field
+
+
+class DriveFile(SQLModel, table=True):
+    """A Google Doc in a user's Drive, as of the last sync of their index."""
+
+    __tablename__ = "drive_files"
+    __table_args__ = (
+        UniqueConstraint("owner_id", "file_id"),
+        Index("ix_drive_files_owner_id_modified_time", "owner_id", "modified_time"),
+    )
+
+    id: uuid.UUID = Field(default_factory=uuid.uuid4, primary_key=True)
+    owner_id: uuid.UUID = Field(foreign_key="users.id")
+    file_id: str = Field(max_length=255)
+    name: str = Field(max_length=1024)
+    modified_time: datetime
+
+
+class DriveSyncState(SQLModel, table=True):
+    """Where a user's index is in the Drive changes feed."""
+
+    __tablename__ = "drive_sync_states"
+
+    owner_id: uuid.UUID = Field(foreign_key="users.id", primary_key=True)
+    page_token: str = Field(max_length=255)
+    synced_at: datetime = Field(default_factory=datetime.utcnow)
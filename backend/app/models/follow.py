@@ -1,7 +1,7 @@
 import uuid
 from datetime import datetime
 
-from sqlalchemy import UniqueConstraint
+from sqlalchemy import Index, UniqueConstraint
 from sqlmodel import SQLModel, Field
 
 
@@ -9,6 +9,8 @@ class Follow(SQLModel, table=True):
     __tablename__ = "follows"
     __table_args__ = (
         UniqueConstraint("follower_id", "following_id"),
+        Index("ix_follows_following_id_created_at", "following_id", "created_at"),
+        Index("ix_follows_follower_id_created_at", "follower_id", "created_at"),
     )
 
     id: uuid.UUID = Field(default_factory=uuid.uuid4, primary_key=True)
@@ -0,0 +1,37 @@
+import enum
+import uuid
+from datetime import datetime
+from typing import Any
+
+from sqlalchemy import JSON, Column, Enum
+from sqlmodel import SQLModel, Field
+
+
+class JobStatus(str, enum.Enum):
+    pending = "pending"
+    running = "running"
+    succeeded = "succeeded"
+    failed = "failed"
+
+
+class Job(SQLModel, table=True):
+    """A long-running task started by a user, polled for progress.
+
+    ``processed`` of ``total`` items are done; ``result`` holds the
+    task-specific outcome once it finishes.
+    """
+
+    __tablename__ = "jobs"
+
+    id: uuid.UUID = Field(default_factory=uuid.uuid4, primary_key=True)
+    owner_id: uuid.UUID = Field(foreign_key="users.id", index=True)
+    kind: str = Field(max_length=50)
+    status: JobStatus = Field(
+        default=JobStatus.pending, sa_column=Column(Enum(JobStatus), nullable=False)
+    )
+    total: int = Field(default=0)
+    processed: int = Field(default=0)
+    result: dict[str, Any] | None = Field(default=None, sa_column=Column(JSON))
+    error: str | None = Field(default=None)
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
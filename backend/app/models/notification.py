@@ -0,0 +1,62 @@
+import enum
+import uuid
+from datetime import datetime
+
+from sqlalchemy import Column, Enum, Index, text
+from sqlmodel import SQLModel, Field
+
+
+class NotificationType(str, enum.Enum):
+    like = "like"
+    comment = "comment"
+    reply = "reply"
+    follow = "follow"
+
+
+class Notification(SQLModel, table=True):
+    """One (possibly coalesced) notification.
+
+    Events with the same ``group_key`` are folded into the recipient's
+    unread row for that key ("12 people liked your post"); ``actor_id`` is
+    the most recent actor and ``actor_count`` how many distinct actors
+    (``NotificationActor`` rows) the row stands for. ``uncounted_actors``
+    is added to that count: on rows from before actor sets were kept it is
+    the actors that aren't in the set, and 0 everywhere else.
+    """
+
+    __tablename__ = "notifications"
+    __table_args__ = (
+        Index("ix_notifications_recipient_id_updated_at", "recipient_id", "updated_at"),
+        Index(
+            "uq_notifications_unread_group",
+            "recipient_id", "group_key",
+            unique=True,
+            postgresql_where=text("read_at IS NULL"),
+            sqlite_where=text("read_at IS NULL"),
+        ),
+    )
+
+    id: uuid.UUID = Field(default_factory=uuid.uuid4, primary_key=True)
+    recipient_id: uuid.UUID = Field(foreign_key="users.id")
+    actor_id: uuid.UUID = Field(foreign_key="users.id")
+    type: NotificationType = Field(
+        sa_column=Column(Enum(NotificationType), nullable=False)
+    )
+    group_key: str = Field(max_length=100)
+    publication_id: uuid.UUID | None = Field(default=None)
+    comment_id: uuid.UUID | None = Field(default=None)
+    actor_count: int = Field(default=1)
+    uncounted_actors: int = Field(default=0, sa_column_kwargs={"server_default": "0"})
+    read_at: datetime | None = Field(default=None)
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+
+
+class NotificationActor(SQLModel, table=True):
+    """One actor folded into a notification; an actor counts once per row."""
+
+    __tablename__ = "notification_actors"
+
+    notification_id: uuid.UUID = Field(foreign_key="notifications.id", primary_key=True)
+    actor_id: uuid.UUID = Field(foreign_key="users.id", primary_key=True)
+    created_at: datetime = Field(default_factory=datetime.utcnow)
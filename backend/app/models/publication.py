@@ -2,9 +2,11 @@ import enum
 import uuid
 from datetime import datetime
 
-from sqlalchemy import Column, Enum, UniqueConstraint
+from sqlalchemy import Column, Enum, Index, Text, UniqueConstraint
 from sqlmodel import SQLModel, Field
 
+from app.database import add_search_vector
+
 
 class PublicationType(str, enum.Enum):
     article = "article"
@@ -15,6 +17,11 @@ class PublicationType(str, enum.Enum):
 
 class Publication(SQLModel, table=True):
     __tablename__ = "publications"
+    __table_args__ = (
+        Index("ix_publications_author_id_created_at", "author_id", "created_at", "id"),
+        # Explore: everyone's publications, newest first.
+        Index("ix_publications_created_at", "created_at", "id"),
+    )
 
     id: uuid.UUID = Field(default_factory=uuid.uuid4, primary_key=True)
     author_id: uuid.UUID = Field(foreign_key="users.id", index=True)
@@ -29,9 +36,14 @@ class Publication(SQLModel, table=True):
     share_token: str = Field(max_length=32, unique=True, index=True)
     like_count: int = Field(default=0)
     comment_count: int = Field(default=0)
+    # Text extracted from the PDF at publish time, for search.
+    search_text: str = Field(default="", sa_column=Column(Text, nullable=False, server_default=""))
     created_at: datetime = Field(default_factory=datetime.utcnow)
 
 
+add_search_vector(Publication.__table__, {"title": "A", "abstract": "B", "search_text": "C"})
+
+
 class PublicationLike(SQLModel, table=True):
     __tablename__ = "publication_likes"
     __table_args__ = (
@@ -46,6 +58,15 @@ class PublicationLike(SQLModel, table=True):
 
 class PublicationComment(SQLModel, table=True):
     __tablename__ = "publication_comments"
+    __table_args__ = (
+        Index(
+            "ix_publication_comments_thread_page",
+            "publication_id", "parent_id", "created_at",
+        ),
+        Index("ix_publication_comments_parent_id_created_at", "parent_id", "created_at"),
+        # The flat comment list, oldest first.
+        Index("ix_publication_comments_publication_id_created_at", "publication_id", "created_at"),
+    )
 
     id: uuid.UUID = Field(default_factory=uuid.uuid4, primary_key=True)
     publication_id: uuid.UUID = Field(foreign_key="publications.id", index=True)
@@ -0,0 +1,39 @@
+import enum
+import uuid
+from datetime import datetime
+
+from sqlalchemy import Column, Enum, Index, LargeBinary, UniqueConstraint
+from sqlmodel import SQLModel, Field
+
+
+class RevisionKind(str, enum.Enum):
+    snapshot = "snapshot"
+    delta = "delta"
+
+
+class DocumentRevision(SQLModel, table=True):
+    """One saved version of a document's content.
+
+    ``data`` is zlib-compressed JSON: the full content for a snapshot, or
+    the JSON Patch from the previous revision for a delta. Every chain
+    starts with a snapshot, so any version is rebuilt from the nearest
+    snapshot at or before it plus the deltas in between;
+    ``chain_length`` counts those deltas.
+    """
+
+    __tablename__ = "document_revisions"
+    __table_args__ = (
+        UniqueConstraint("document_id", "version", name="uq_document_revisions_document_id_version"),
+        Index("ix_document_revisions_owner_id_created_at", "owner_id", "created_at"),
+    )
+
+    id: uuid.UUID = Field(default_factory=uuid.uuid4, primary_key=True)
+    document_id: uuid.UUID = Field(foreign_key="documents.id")
+    owner_id: uuid.UUID = Field(foreign_key="users.id")
+    version: int
+    kind: RevisionKind = Field(sa_column=Column(Enum(RevisionKind), nullable=False))
+    title: str = Field(max_length=255)
+    data: bytes = Field(sa_column=Column(LargeBinary, nullable=False))
+    size: int
+    chain_length: int = Field(default=0)
+    created_at: datetime = Field(default_factory=datetime.utcnow)
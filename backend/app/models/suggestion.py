@@ -0,0 +1,27 @@
+import uuid
+from datetime import datetime
+
+from sqlalchemy import Index
+from sqlmodel import SQLModel, Field
+
+
+class FollowSuggestion(SQLModel, table=True):
+    """Precomputed "who to follow" candidate for a user.
+
+    ``mutual_count`` is how many of the user's followings follow the
+    candidate; ``like_count`` how many of the candidate's publications the
+    user liked. ``score`` is their weighted sum, kept in the row so the
+    suggestions read is a single index scan.
+    """
+
+    __tablename__ = "follow_suggestions"
+    __table_args__ = (
+        Index("ix_follow_suggestions_user_id_score", "user_id", "score"),
+    )
+
+    user_id: uuid.UUID = Field(foreign_key="users.id", primary_key=True)
+    candidate_id: uuid.UUID = Field(foreign_key="users.id", primary_key=True)
+    mutual_count: int = Field(default=0)
+    like_count: int = Field(default=0)
+    score: int = Field(default=0)
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
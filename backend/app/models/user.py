@@ -12,5 +12,10 @@ class User(SQLModel, table=True):
     email: str = Field(max_length=255, unique=True, index=True)
     password_hash: str = Field(max_length=255)
     google_refresh_token: str | None = Field(default=None)
+    # Carried in tokens as ``tv``; bumping it revokes every issued token.
+    token_version: int = Field(default=0, sa_column_kwargs={"server_default": "0"})
+    follower_count: int = Field(default=0)
+    following_count: int = Field(default=0)
+    publication_count: int = Field(default=0)
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
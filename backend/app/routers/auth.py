@@ -1,3 +1,4 @@
+import ipaddress
 import uuid
 
 from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
@@ -8,9 +9,11 @@ from sqlmodel.ext.asyncio.session import AsyncSession
 from app.database import get_session
 from app.models.user import User
 from app.schemas.user import UserRegister, UserLogin, UserResponse, TokenResponse
+from app.config import settings
+from app.services.passwords import HasherBusy, password_hasher
+from app.services.ratelimit import RateLimiter, login_account_limiter, login_ip_limiter, register_ip_limiter
 from app.utils.security import (
-    hash_password,
-    verify_password,
+    needs_rehash,
     create_access_token,
     create_refresh_token,
     decode_token,
@@ -20,12 +23,58 @@ from app.utils.deps import get_current_user
 router = APIRouter(prefix="/api/auth", tags=["auth"])
 
 
+def _check_limit(limiter: RateLimiter, key: str, limit: int, window: float):
+    retry_after = limiter.retry_after(key, limit, window)
+    if retry_after is not None:
+        raise HTTPException(
+            status_code=429,
+            detail="Muitas tentativas, tente novamente mais tarde",
+            headers={"Retry-After": str(retry_after)},
+        )
+
+
+async def _hash_call(call):
+    try:
+        return await call
+    except HasherBusy:
+        raise HTTPException(
+            status_code=503, detail="Servidor ocupado, tente novamente", headers={"Retry-After": "1"},
+        )
+
+
+def _trusted_proxy(host: str) -> bool:
+    try:
+        address = ipaddress.ip_address(host)
+    except ValueError:
+        return False
+    return any(address in ipaddress.ip_network(proxy, strict=False) for proxy in settings.trusted_proxies)
+
+
+def _client_ip(request: Request) -> str:
+    """The address rate limits count against.
+
+    Behind the proxy every connection comes from the proxy itself, so the
+    client is the one it names in X-Real-IP (set from ``$remote_addr``,
+    replacing whatever the client sent).
+    """
+    if request.client is None:
+        return "unknown"
+    real_ip = request.headers.get("x-real-ip", "").strip()
+    if real_ip and _trusted_proxy(request.client.host):
+        return real_ip
+    return request.client.host
+
+
 @router.post("/register", response_model=UserResponse, status_code=201)
-async def register(data: UserRegister, session: AsyncSession = Depends(get_session)):
+async def register(data: UserRegister, request: Request, session: AsyncSession = Depends(get_session)):
+    ip = _client_ip(request)
+    _check_limit(register_ip_limiter, ip, settings.register_ip_limit, settings.register_ip_window_seconds)
+    register_ip_limiter.hit(ip, settings.register_ip_window_seconds)
     existing = await session.exec(select(User).where(User.email == data.email))
     if existing.first():
         raise HTTPException(status_code=409, detail="Este email já está cadastrado")
-    user = User(name=data.name, email=data.email, password_hash=hash_password(data.password))
+    password_hash = await _hash_call(password_hasher.hash(data.password))
+    user = User(name=data.name, email=data.email, password_hash=password_hash)
     session.add(user)
     try:
         await session.commit()
@@ -37,13 +86,36 @@ async def register(data: UserRegister, session: AsyncSession = Depends(get_sessi
 
 
 @router.post("/login", response_model=TokenResponse)
-async def login(data: UserLogin, response: Response, session: AsyncSession = Depends(get_session)):
+async def login(
+    data: UserLogin,
+    request: Request,
+    response: Response,
+    session: AsyncSession = Depends(get_session),
+):
+    """Every attempt counts against the client IP; failures also count
+    against the account, and a successful login clears those."""
+    ip, account = _client_ip(request), data.email.lower()
+    _check_limit(login_ip_limiter, ip, settings.login_ip_limit, settings.login_ip_window_seconds)
+    _check_limit(login_account_limiter, account, settings.login_account_limit, settings.login_account_window_seconds)
+    login_ip_limiter.hit(ip, settings.login_ip_window_seconds)
+
     result = await session.exec(select(User).where(User.email == data.email))
     user = result.first()
-    if not user or not verify_password(data.password, user.password_hash):
+    if not user or not await _hash_call(password_hasher.verify(data.password, user.password_hash)):
+        login_account_limiter.hit(account, settings.login_account_window_seconds)
         raise HTTPException(status_code=401, detail="Email ou senha incorretos")
-    access_token = create_access_token(subject=str(user.id))
-    refresh_token = create_refresh_token(subject=str(user.id))
+    login_account_limiter.reset(account)
+    if needs_rehash(user.password_hash):
+        # Upgrade to the configured cost while we have the plain password.
+        try:
+            user.password_hash = await password_hasher.hash(data.password)
+        except HasherBusy:
+            pass
+        else:
+            session.add(user)
+            await session.commit()
+    access_token = create_access_token(str(user.id), user.name, user.token_version)
+    refresh_token = create_refresh_token(str(user.id), user.token_version)
     response.set_cookie(
         key="refresh_token",
         value=refresh_token,
@@ -65,7 +137,9 @@ async def refresh(request: Request, session: AsyncSession = Depends(get_session)
     user = await session.get(User, uuid.UUID(payload["sub"]))
     if not user:
         raise HTTPException(status_code=401, detail="User not found")
-    new_access = create_access_token(subject=str(user.id))
+    if payload.get("tv", 0) != user.token_version:
+        raise HTTPException(status_code=401, detail="Token revoked")
+    new_access = create_access_token(str(user.id), user.name, user.token_version)
     return TokenResponse(access_token=new_access)
 
 
@@ -75,6 +149,20 @@ async def logout(response: Response):
     return {"ok": True}
 
 
+@router.post("/logout-all")
+async def logout_all(
+    response: Response,
+    user: User = Depends(get_current_user),
+    session: AsyncSession = Depends(get_session),
+):
+    """Revoke every access and refresh token issued to the user."""
+    user.token_version += 1
+    session.add(user)
+    await session.commit()
+    response.delete_cookie(key="refresh_token")
+    return {"ok": True}
+
+
 @router.get("/me", response_model=UserResponse)
 async def me(user: User = Depends(get_current_user)):
     return user
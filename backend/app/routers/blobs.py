@@ -0,0 +1,34 @@
+from fastapi import APIRouter, Depends, HTTPException, Path
+from fastapi.responses import FileResponse
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.database import get_session
+from app.models.blob import Blob
+from app.services.blobs import IMAGE_TYPES, OPAQUE_TYPE, blob_path
+
+router = APIRouter(prefix="/api/blobs", tags=["blobs"])
+
+
+@router.get("/{hash}")
+async def get_blob(
+    hash: str = Path(pattern="^[0-9a-f]{64}$"),
+    session: AsyncSession = Depends(get_session),
+):
+    blob = await session.get(Blob, hash)
+    if not blob:
+        raise HTTPException(status_code=404, detail="Blob not found")
+
+    # Blobs are addressed by content hash, so they never change.
+    headers = {
+        "Cache-Control": "public, max-age=31536000, immutable",
+        "ETag": f'"{hash}"',
+        # Served from our origin: never sniffed or run as a page.
+        "X-Content-Type-Options": "nosniff",
+        "Content-Security-Policy": "default-src 'none'; sandbox",
+    }
+    media_type = blob.mime_type
+    if media_type not in IMAGE_TYPES:
+        # Stored before the image allowlist, or not an image: download only.
+        media_type = OPAQUE_TYPE
+        headers["Content-Disposition"] = f'attachment; filename="{hash}"'
+    return FileResponse(blob_path(hash), media_type=media_type, headers=headers)
@@ -0,0 +1,95 @@
+import uuid
+
+from fastapi import APIRouter, Depends, WebSocket, WebSocketDisconnect, WebSocketException, status
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.database import get_session
+from app.models.document import Document
+from app.services.collab import CollabRoom, collab_hub
+from app.utils.json_patch import JsonPatchError
+from app.utils.deps import principal_from_token
+
+router = APIRouter(tags=["collab"])
+
+
+async def _relay(
+    websocket: WebSocket,
+    session: AsyncSession,
+    doc: Document,
+    room_id: str | None,
+    since: int | None,
+    read_only: bool,
+):
+    """Serve one connection of a document's room until it disconnects.
+
+    See ``app.services.collab`` for the message protocol.
+    """
+    await websocket.accept()
+    room: CollabRoom = await collab_hub.join(session, doc, websocket)
+    # Don't hold a pooled connection for the lifetime of the socket; the
+    # session reconnects for the final checkpoint.
+    await session.close()
+    try:
+        await websocket.send_json(room.hello(room_id, since))
+        while True:
+            message = await websocket.receive_json()
+            if message.get("type") != "steps":
+                await websocket.send_json({"type": "error", "detail": "Unknown message type"})
+                continue
+            if read_only:
+                await websocket.send_json({"type": "error", "detail": "Read-only connection"})
+                continue
+            try:
+                broadcast = room.receive(int(message["version"]), str(message["client_id"]), message["ops"])
+            except (KeyError, TypeError, ValueError) as exc:
+                # JsonPatchError is a ValueError.
+                detail = str(exc) if isinstance(exc, JsonPatchError) else "Malformed steps message"
+                await websocket.send_json({"type": "error", "detail": detail})
+                continue
+            if broadcast is None:
+                await websocket.send_json({"type": "rejected", "version": room.version})
+                continue
+            await room.broadcast(broadcast)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        await collab_hub.leave(session, room, websocket)
+
+
+@router.websocket("/api/documents/{doc_id}/collab")
+async def collaborate(
+    websocket: WebSocket,
+    doc_id: uuid.UUID,
+    token: str,
+    room: str | None = None,
+    since: int | None = None,
+    session: AsyncSession = Depends(get_session),
+):
+    """Live editing for the owner. Browsers can't set headers on a
+    WebSocket, so the access token comes in the query string."""
+    principal = await principal_from_token(session, token)
+    if principal is None:
+        raise WebSocketException(code=status.WS_1008_POLICY_VIOLATION, reason="Invalid token")
+    doc = await session.get(Document, doc_id)
+    if not doc or doc.owner_id != principal.id:
+        raise WebSocketException(code=status.WS_1008_POLICY_VIOLATION, reason="Document not found")
+    await _relay(websocket, session, doc, room, since, read_only=False)
+
+
+@router.websocket("/api/shared/{share_token}/collab")
+async def follow_shared(
+    websocket: WebSocket,
+    share_token: str,
+    room: str | None = None,
+    since: int | None = None,
+    session: AsyncSession = Depends(get_session),
+):
+    """Read-only live view of a public document."""
+    result = await session.exec(
+        select(Document).where(Document.share_token == share_token, Document.is_public == True)
+    )
+    doc = result.first()
+    if not doc:
+        raise WebSocketException(code=status.WS_1008_POLICY_VIOLATION, reason="Shared document not found")
+    await _relay(websocket, session, doc, room, since, read_only=True)
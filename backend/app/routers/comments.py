@@ -1,18 +1,37 @@
 import uuid
 from datetime import datetime
 
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlmodel import select
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from sqlalchemy import func, or_, tuple_
+from sqlmodel import col, select
 from sqlmodel.ext.asyncio.session import AsyncSession
 
-from app.database import get_session
-from app.models.publication import Publication, PublicationComment
+from app.database import get_read_session, get_session
+from app.models.publication import PublicationComment
 from app.models.user import User
-from app.schemas.publication import CommentCreate, CommentResponse
-from app.utils.deps import get_current_user
+from app.schemas.publication import CommentCreate, CommentResponse, CommentThreadResponse
+from app.services.counters import bump
+from app.services.notifications import notify_comment
+from app.services.principals import Principal
+from app.utils.deps import get_current_principal
+from app.utils.pagination import decode_cursor, set_next_cursor
 
 router = APIRouter(tags=["comments"])
 
+REPLIES_PER_THREAD = 3
+
+
+def _comment_response(comment: PublicationComment, author_name: str) -> dict:
+    return {
+        "id": comment.id,
+        "publication_id": comment.publication_id,
+        "author_id": comment.author_id,
+        "author_name": author_name,
+        "parent_id": comment.parent_id,
+        "content": comment.content,
+        "created_at": comment.created_at,
+    }
+
 
 @router.get(
     "/api/publications/{pub_id}/comments",
@@ -22,8 +41,8 @@ async def list_comments(
     pub_id: uuid.UUID,
     cursor: str | None = None,
     limit: int = 20,
-    user: User = Depends(get_current_user),
-    session: AsyncSession = Depends(get_session),
+    user: Principal = Depends(get_current_principal),
+    session: AsyncSession = Depends(get_read_session),
 ):
     query = (
         select(PublicationComment, User.name)
@@ -40,18 +59,124 @@ async def list_comments(
     result = await session.exec(query)
     rows = result.all()
 
-    return [
-        {
-            "id": comment.id,
-            "publication_id": comment.publication_id,
-            "author_id": comment.author_id,
-            "author_name": author_name,
-            "parent_id": comment.parent_id,
-            "content": comment.content,
-            "created_at": comment.created_at,
-        }
-        for comment, author_name in rows
-    ]
+    return [_comment_response(comment, author_name) for comment, author_name in rows]
+
+
+@router.get(
+    "/api/publications/{pub_id}/threads",
+    response_model=list[CommentThreadResponse],
+)
+async def list_threads(
+    pub_id: uuid.UUID,
+    response: Response,
+    cursor: str | None = None,
+    limit: int = Query(20, ge=1, le=100),
+    replies: int = Query(REPLIES_PER_THREAD, ge=0, le=20),
+    user: Principal = Depends(get_current_principal),
+    session: AsyncSession = Depends(get_read_session),
+):
+    """Top-level comments, oldest first, each with its first ``replies``
+    replies and its total reply count.
+
+    A single query pages the thread roots in a CTE, then pulls roots and
+    replies together, numbering each thread's rows with window functions
+    so only the first replies of every thread come back.
+    """
+    page = (
+        select(PublicationComment.id, PublicationComment.created_at)
+        .where(
+            PublicationComment.publication_id == pub_id,
+            col(PublicationComment.parent_id).is_(None),
+        )
+        .order_by(PublicationComment.created_at.asc(), PublicationComment.id.asc())
+        .limit(limit)
+    )
+    if cursor:
+        cursor_dt, cursor_id = decode_cursor(cursor)
+        page = page.where(
+            tuple_(PublicationComment.created_at, PublicationComment.id) > tuple_(cursor_dt, cursor_id)
+        )
+    page = page.cte("page")
+
+    root_id = func.coalesce(PublicationComment.parent_id, PublicationComment.id)
+    ranked = (
+        select(
+            PublicationComment.id,
+            root_id.label("root_id"),
+            func.row_number()
+            .over(
+                partition_by=root_id,
+                order_by=(
+                    col(PublicationComment.parent_id).is_not(None),
+                    PublicationComment.created_at.asc(),
+                    PublicationComment.id.asc(),
+                ),
+            )
+            .label("position"),
+            func.count().over(partition_by=root_id).label("size"),
+        )
+        .where(
+            or_(
+                col(PublicationComment.id).in_(select(page.c.id)),
+                col(PublicationComment.parent_id).in_(select(page.c.id)),
+            )
+        )
+        .subquery()
+    )
+    result = await session.exec(
+        select(PublicationComment, User.name, ranked.c.position, ranked.c.size)
+        .join(ranked, ranked.c.id == PublicationComment.id)
+        .join(page, page.c.id == ranked.c.root_id)
+        .join(User, PublicationComment.author_id == User.id)
+        .where(ranked.c.position <= replies + 1)
+        .order_by(page.c.created_at, page.c.id, ranked.c.position)
+    )
+
+    threads: dict[uuid.UUID, dict] = {}
+    for comment, author_name, position, size in result.all():
+        if position == 1:
+            threads[comment.id] = {
+                **_comment_response(comment, author_name),
+                "replies": [],
+                "reply_count": size - 1,
+            }
+        else:
+            threads[comment.parent_id]["replies"].append(_comment_response(comment, author_name))
+
+    roots = list(threads.values())
+    set_next_cursor(response, roots, limit, key=lambda thread: (thread["created_at"], thread["id"]))
+    return roots
+
+
+@router.get(
+    "/api/comments/{comment_id}/replies",
+    response_model=list[CommentResponse],
+)
+async def list_replies(
+    comment_id: uuid.UUID,
+    response: Response,
+    cursor: str | None = None,
+    limit: int = Query(20, ge=1, le=100),
+    user: Principal = Depends(get_current_principal),
+    session: AsyncSession = Depends(get_read_session),
+):
+    query = (
+        select(PublicationComment, User.name)
+        .join(User, PublicationComment.author_id == User.id)
+        .where(PublicationComment.parent_id == comment_id)
+        .order_by(PublicationComment.created_at.asc(), PublicationComment.id.asc())
+        .limit(limit)
+    )
+    if cursor:
+        cursor_dt, cursor_id = decode_cursor(cursor)
+        query = query.where(
+            tuple_(PublicationComment.created_at, PublicationComment.id) > tuple_(cursor_dt, cursor_id)
+        )
+
+    result = await session.exec(query)
+    rows = result.all()
+    set_next_cursor(response, rows, limit, key=lambda row: (row[0].created_at, row[0].id))
+    return [_comment_response(comment, author_name) for comment, author_name in rows]
 
 
 @router.post(
@@ -62,54 +187,48 @@ async def list_comments(
 async def create_comment(
     pub_id: uuid.UUID,
     data: CommentCreate,
-    user: User = Depends(get_current_user),
+    user: Principal = Depends(get_current_principal),
     session: AsyncSession = Depends(get_session),
 ):
-    pub = await session.get(Publication, pub_id)
-    if not pub:
-        raise HTTPException(status_code=404, detail="Publication not found")
-
-    parent_uuid = None
     if data.parent_id:
-        parent_uuid = uuid.UUID(data.parent_id)
-        parent = await session.get(PublicationComment, parent_uuid)
-        if not parent or parent.publication_id != pub_id:
+        # One probe checks both that the parent belongs to this publication
+        # and that it is itself top-level.
+        parent_result = await session.exec(
+            select(PublicationComment.id, PublicationComment.parent_id).where(
+                PublicationComment.id == data.parent_id,
+                PublicationComment.publication_id == pub_id,
+            )
+        )
+        parent = parent_result.first()
+        if parent is None:
             raise HTTPException(status_code=404, detail="Parent comment not found")
-        if parent.parent_id is not None:
+        if parent[1] is not None:
             raise HTTPException(
                 status_code=400,
                 detail="Cannot reply to a reply. Only one level of nesting is allowed.",
             )
 
+    if await bump(session, pub_id, "comment_count", 1) is None:
+        raise HTTPException(status_code=404, detail="Publication not found")
+
     comment = PublicationComment(
         publication_id=pub_id,
         author_id=user.id,
-        parent_id=parent_uuid,
+        parent_id=data.parent_id,
         content=data.content,
     )
     session.add(comment)
-
-    pub.comment_count += 1
-    session.add(pub)
-
+    await notify_comment(session, user.id, user.name, pub_id, comment.id, data.parent_id)
     await session.commit()
     await session.refresh(comment)
 
-    return {
-        "id": comment.id,
-        "publication_id": comment.publication_id,
-        "author_id": comment.author_id,
-        "author_name": user.name,
-        "parent_id": comment.parent_id,
-        "content": comment.content,
-        "created_at": comment.created_at,
-    }
+    return _comment_response(comment, user.name)
 
 
 @router.delete("/api/comments/{comment_id}", status_code=204)
 async def delete_comment(
     comment_id: uuid.UUID,
-    user: User = Depends(get_current_user),
+    user: Principal = Depends(get_current_principal),
     session: AsyncSession = Depends(get_session),
 ):
     comment = await session.get(PublicationComment, comment_id)
@@ -118,10 +237,6 @@ async def delete_comment(
     if comment.author_id != user.id:
         raise HTTPException(status_code=403, detail="Not authorized")
 
-    pub = await session.get(Publication, comment.publication_id)
-    if pub:
-        pub.comment_count = max(0, pub.comment_count - 1)
-        session.add(pub)
-
     await session.delete(comment)
+    await bump(session, comment.publication_id, "comment_count", -1)
     await session.commit()
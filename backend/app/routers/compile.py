@@ -1,13 +1,25 @@
 import asyncio
 import shutil
 import tempfile
+import time
 from pathlib import Path
 
 from fastapi import APIRouter, File, Request, UploadFile
 from fastapi.responses import JSONResponse, Response
 
+from app.metrics import Gauge, Histogram
+from app.telemetry import span
+
 router = APIRouter(prefix="/api", tags=["compile"])
 
+COMPILE_SECONDS = Histogram(
+    "latex_compile_seconds", "Time tectonic took per compile.", ("outcome",),
+    buckets=(0.5, 1.0, 2.0, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0),
+)
+# Compiles aren't queued: each request starts tectonic right away, so the
+# number running is the backlog the CPU has to work through.
+COMPILES_IN_FLIGHT = Gauge("latex_compiles_in_flight", "tectonic processes running.")
+
 
 @router.post("/compile")
 async def compile_latex(request: Request):
@@ -25,18 +37,26 @@ async def compile_latex(request: Request):
             asset_path = Path(tmp_dir) / name
             asset_path.write_bytes(await asset.read())
 
-        proc = await asyncio.create_subprocess_exec(
-            "tectonic", "document.tex",
-            cwd=tmp_dir,
-            stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.PIPE,
-        )
-        stdout, stderr = await proc.communicate()
+        started = time.perf_counter()
+        COMPILES_IN_FLIGHT.inc()
+        try:
+            with span("tectonic"):
+                proc = await asyncio.create_subprocess_exec(
+                    "tectonic", "document.tex",
+                    cwd=tmp_dir,
+                    stdout=asyncio.subprocess.PIPE,
+                    stderr=asyncio.subprocess.PIPE,
+                )
+                stdout, stderr = await proc.communicate()
+        finally:
+            COMPILES_IN_FLIGHT.dec()
         log = (stdout + stderr).decode(errors="replace")
 
         pdf_path = Path(tmp_dir) / "document.pdf"
+        succeeded = proc.returncode == 0 and pdf_path.exists()
+        COMPILE_SECONDS.observe(time.perf_counter() - started, outcome="ok" if succeeded else "error")
 
-        if proc.returncode != 0 or not pdf_path.exists():
+        if not succeeded:
             error = _extract_error(log)
             return JSONResponse(
                 status_code=422,
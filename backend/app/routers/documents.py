@@ -1,84 +1,347 @@
-from datetime import datetime, timezone
+import copy
 import uuid
+from typing import Callable
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import (
+    APIRouter, BackgroundTasks, Depends, File, Header, HTTPException, Query, Response, UploadFile, status,
+)
+from fastapi.responses import StreamingResponse
+from sqlalchemy import tuple_
 from sqlmodel import select
 from sqlmodel.ext.asyncio.session import AsyncSession
 
+from app.config import settings
 from app.database import get_session
 from app.models.document import Document
-from app.models.user import User
-from app.schemas.document import DocumentCreate, DocumentUpdate, DocumentResponse, DocumentListItem
-from app.utils.deps import get_current_user
+from app.models.revision import DocumentRevision
+from app.schemas.document import (
+    DocumentCreate,
+    DocumentUpdate,
+    DocumentResponse,
+    DocumentListItem,
+    DocumentRevisionItem,
+    DocumentRevisionResponse,
+    DocumentVersionResponse,
+    PatchOperation,
+)
+from app.schemas.job import JobResponse
+from app.services.autosave import PendingSave, VersionConflict, document_saves
+from app.services.blobs import extract_blobs
+from app.services.collab import collab_hub
+from app.services.contents import release_contents, resolve_content
+from app.services.documents import add_document
+from app.services.history import delete_history, load_revision
+from app.services.jobs import create_job
+from app.services.principals import Principal
+from app.services.transfer import export_documents, run_import, save_upload
+from app.utils.deps import get_current_principal
+from app.utils.json_patch import JsonPatchError, apply_patch
+from app.utils.pagination import decode_cursor, set_next_cursor
 
 router = APIRouter(prefix="/api/documents", tags=["documents"])
 
 
+def _etag(version: int) -> str:
+    return f'"{version}"'
+
+
+def _parse_if_match(if_match: str | None) -> int | None:
+    """Version number from an ``If-Match: "<version>"`` header."""
+    if if_match is None:
+        return None
+    try:
+        return int(if_match.strip().removeprefix("W/").strip('"'))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid If-Match header")
+
+
+def _require_not_live(doc_id: uuid.UUID):
+    """Content edits go through the live session while one is open."""
+    if doc_id in collab_hub:
+        raise HTTPException(status_code=409, detail="Document is being edited live")
+
+
+async def _save(
+    session: AsyncSession,
+    response: Response,
+    doc_id: uuid.UUID,
+    user: Principal,
+    base_version: int | None,
+    edit: Callable[[PendingSave], None],
+) -> dict:
+    try:
+        version = await document_saves.stage(session, doc_id, user.id, base_version, edit)
+        if version is None:
+            raise HTTPException(status_code=404, detail="Document not found")
+        try:
+            if settings.document_write_behind:
+                # Persist any blobs extracted from this save; the content follows later.
+                await session.commit()
+            else:
+                await document_saves.flush_document(session, doc_id, raise_on_conflict=True)
+        except VersionConflict:
+            raise
+        except Exception:
+            # The client is not told about this version; it must not be written later.
+            document_saves.unstage(doc_id, version)
+            raise
+    except VersionConflict:
+        raise HTTPException(status_code=409, detail="Document was modified")
+    response.headers["ETag"] = _etag(version)
+    return {"version": version}
+
+
 @router.get("/", response_model=list[DocumentListItem])
 async def list_documents(
-    user: User = Depends(get_current_user),
+    response: Response,
+    q: str | None = Query(default=None, max_length=255),
+    cursor: str | None = None,
+    limit: int = Query(default=50, ge=1, le=200),
+    user: Principal = Depends(get_current_principal),
     session: AsyncSession = Depends(get_session),
 ):
-    result = await session.exec(
-        select(Document).where(Document.owner_id == user.id).order_by(Document.updated_at.desc())
+    """Most recently updated first, optionally filtered by title.
+
+    Only the list columns are read, so document size does not matter here.
+    """
+    await document_saves.flush(session, document_saves.owned_by(user.id))
+    query = (
+        select(Document.id, Document.title, Document.is_public, Document.created_at, Document.updated_at)
+        .where(Document.owner_id == user.id)
+        .order_by(Document.updated_at.desc(), Document.id.desc())
+        .limit(limit)
     )
-    return result.all()
+    if q:
+        pattern = q.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        query = query.where(Document.title.ilike(f"%{pattern}%", escape="\\"))
+    if cursor:
+        cursor_dt, cursor_id = decode_cursor(cursor)
+        query = query.where(tuple_(Document.updated_at, Document.id) < tuple_(cursor_dt, cursor_id))
+    result = await session.exec(query)
+    rows = result.all()
+    set_next_cursor(response, rows, limit, key=lambda row: (row.updated_at, row.id))
+    return rows
 
 
 @router.post("/", response_model=DocumentResponse, status_code=201)
 async def create_document(
     data: DocumentCreate,
-    user: User = Depends(get_current_user),
+    user: Principal = Depends(get_current_principal),
     session: AsyncSession = Depends(get_session),
 ):
-    doc = Document(owner_id=user.id, title=data.title, content=data.content)
-    session.add(doc)
+    doc = await add_document(session, user.id, data.title, data.content)
     await session.commit()
     await session.refresh(doc)
     return doc
 
 
+@router.get("/export")
+async def export_all(
+    user: Principal = Depends(get_current_principal),
+    session: AsyncSession = Depends(get_session),
+):
+    """Every document as one ZIP, streamed as it is built."""
+    for doc_id in collab_hub.owned_by(user.id):
+        await collab_hub.checkpoint(session, doc_id)
+    await document_saves.flush(session, document_saves.owned_by(user.id))
+    return StreamingResponse(
+        export_documents(user.id),
+        media_type="application/zip",
+        headers={"Content-Disposition": 'attachment; filename="violeta-documentos.zip"'},
+    )
+
+
+@router.post("/import", response_model=JobResponse, status_code=202)
+async def import_all(
+    background_tasks: BackgroundTasks,
+    file: UploadFile = File(...),
+    user: Principal = Depends(get_current_principal),
+    session: AsyncSession = Depends(get_session),
+):
+    """Import a ZIP of LaTeX projects in the background; poll ``/api/jobs/{id}``."""
+    try:
+        path = await save_upload(file.file)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    try:
+        job = await create_job(session, user.id, "import")
+    except BaseException:
+        path.unlink(missing_ok=True)
+        raise
+    background_tasks.add_task(run_import, job.id, path)
+    return job
+
+
 @router.get("/{doc_id}", response_model=DocumentResponse)
 async def get_document(
     doc_id: uuid.UUID,
-    user: User = Depends(get_current_user),
+    response: Response,
+    user: Principal = Depends(get_current_principal),
     session: AsyncSession = Depends(get_session),
 ):
+    # Only the owner's read may write the live room and pending saves
+    # back; the row itself is loaded after them.
+    await _require_owned(session, doc_id, user)
+    await collab_hub.checkpoint(session, doc_id)
+    await document_saves.flush_document(session, doc_id)
     doc = await session.get(Document, doc_id)
-    if not doc or doc.owner_id != user.id:
-        raise HTTPException(status_code=404, detail="Document not found")
-    return doc
+    response.headers["ETag"] = _etag(doc.version)
+    return await resolve_content(session, doc)
 
 
-@router.put("/{doc_id}", response_model=DocumentResponse)
+@router.put("/{doc_id}", response_model=DocumentVersionResponse)
 async def update_document(
     doc_id: uuid.UUID,
     data: DocumentUpdate,
-    user: User = Depends(get_current_user),
+    response: Response,
+    if_match: str | None = Header(default=None),
+    user: Principal = Depends(get_current_principal),
     session: AsyncSession = Depends(get_session),
 ):
-    doc = await session.get(Document, doc_id)
-    if not doc or doc.owner_id != user.id:
-        raise HTTPException(status_code=404, detail="Document not found")
-    if data.title is not None:
-        doc.title = data.title
+    """Save title and/or content; only the new version is returned."""
     if data.content is not None:
-        doc.content = data.content
-    doc.updated_at = datetime.utcnow()
-    session.add(doc)
-    await session.commit()
-    await session.refresh(doc)
-    return doc
+        _require_not_live(doc_id)
+    content = await extract_blobs(session, data.content) if data.content is not None else None
+
+    def edit(entry: PendingSave):
+        if data.title is not None:
+            entry.title = data.title
+        if content is not None:
+            entry.content = content
+
+    return await _save(session, response, doc_id, user, _parse_if_match(if_match), edit)
+
+
+@router.patch("/{doc_id}", response_model=DocumentVersionResponse)
+async def patch_document(
+    doc_id: uuid.UUID,
+    operations: list[PatchOperation],
+    response: Response,
+    if_match: str | None = Header(default=None),
+    user: Principal = Depends(get_current_principal),
+    session: AsyncSession = Depends(get_session),
+):
+    """Apply a JSON Patch to ``content`` on top of the ``If-Match`` version.
+
+    Only the new version number is returned, so autosave traffic scales
+    with the edit rather than the document.
+    """
+    base_version = _parse_if_match(if_match)
+    if base_version is None:
+        raise HTTPException(status_code=428, detail="If-Match header required")
+    _require_not_live(doc_id)
+    patch = await extract_blobs(
+        session, [op.model_dump(by_alias=True, exclude_unset=True) for op in operations]
+    )
+
+    def edit(entry: PendingSave):
+        # Patch a copy: a failing operation must leave the buffered state intact.
+        entry.content = apply_patch(copy.deepcopy(entry.content), patch)
+
+    try:
+        return await _save(session, response, doc_id, user, base_version, edit)
+    except JsonPatchError as exc:
+        raise HTTPException(status_code=422, detail=str(exc))
+
+
+async def _require_owned(session: AsyncSession, doc_id: uuid.UUID, user: Principal):
+    result = await session.exec(
+        select(Document.id).where(Document.id == doc_id, Document.owner_id == user.id)
+    )
+    if result.first() is None:
+        raise HTTPException(status_code=404, detail="Document not found")
+
+
+@router.get("/{doc_id}/versions", response_model=list[DocumentRevisionItem])
+async def list_versions(
+    doc_id: uuid.UUID,
+    response: Response,
+    cursor: str | None = None,
+    limit: int = Query(default=50, ge=1, le=200),
+    user: Principal = Depends(get_current_principal),
+    session: AsyncSession = Depends(get_session),
+):
+    """Saved versions, newest first. Only metadata is read, never content."""
+    await _require_owned(session, doc_id, user)
+    await document_saves.flush_document(session, doc_id)
+    query = (
+        select(
+            DocumentRevision.id,
+            DocumentRevision.version,
+            DocumentRevision.title,
+            DocumentRevision.size,
+            DocumentRevision.created_at,
+        )
+        .where(DocumentRevision.document_id == doc_id)
+        .order_by(DocumentRevision.created_at.desc(), DocumentRevision.id.desc())
+        .limit(limit)
+    )
+    if cursor:
+        cursor_dt, cursor_id = decode_cursor(cursor)
+        query = query.where(
+            tuple_(DocumentRevision.created_at, DocumentRevision.id) < tuple_(cursor_dt, cursor_id)
+        )
+    result = await session.exec(query)
+    rows = result.all()
+    set_next_cursor(response, rows, limit, key=lambda row: (row.created_at, row.id))
+    return [
+        {"version": row.version, "title": row.title, "size": row.size, "created_at": row.created_at}
+        for row in rows
+    ]
+
+
+@router.get("/{doc_id}/versions/{version}", response_model=DocumentRevisionResponse)
+async def get_version(
+    doc_id: uuid.UUID,
+    version: int,
+    user: Principal = Depends(get_current_principal),
+    session: AsyncSession = Depends(get_session),
+):
+    await _require_owned(session, doc_id, user)
+    await document_saves.flush_document(session, doc_id)
+    revision = await load_revision(session, doc_id, version)
+    if revision is None:
+        raise HTTPException(status_code=404, detail="Version not found")
+    title, content = revision
+    return {"version": version, "title": title, "content": content}
+
+
+@router.post("/{doc_id}/versions/{version}/restore", response_model=DocumentVersionResponse)
+async def restore_version(
+    doc_id: uuid.UUID,
+    version: int,
+    response: Response,
+    user: Principal = Depends(get_current_principal),
+    session: AsyncSession = Depends(get_session),
+):
+    """Save an old version as the newest one; history is never rewritten."""
+    await _require_owned(session, doc_id, user)
+    _require_not_live(doc_id)
+    await document_saves.flush_document(session, doc_id)
+    revision = await load_revision(session, doc_id, version)
+    if revision is None:
+        raise HTTPException(status_code=404, detail="Version not found")
+    title, content = revision
+
+    def edit(entry: PendingSave):
+        entry.title = title
+        entry.content = content
+
+    return await _save(session, response, doc_id, user, None, edit)
 
 
 @router.delete("/{doc_id}", status_code=204)
 async def delete_document(
     doc_id: uuid.UUID,
-    user: User = Depends(get_current_user),
+    user: Principal = Depends(get_current_principal),
     session: AsyncSession = Depends(get_session),
 ):
     doc = await session.get(Document, doc_id)
     if not doc or doc.owner_id != user.id:
         raise HTTPException(status_code=404, detail="Document not found")
+    document_saves.discard(doc_id)
+    await delete_history(session, doc_id)
+    if doc.content_hash:
+        await release_contents(session, [doc.content_hash])
     await session.delete(doc)
     await session.commit()
@@ -1,42 +1,55 @@
 import uuid
 
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy import func
-from sqlmodel import select
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from sqlalchemy import tuple_
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import col, select
 from sqlmodel.ext.asyncio.session import AsyncSession
 
-from app.database import get_session
+from app.database import get_read_session, get_session
 from app.models.follow import Follow
-from app.models.publication import Publication
+from app.models.suggestion import FollowSuggestion
 from app.models.user import User
-from app.schemas.publication import UserProfileResponse
-from app.utils.deps import get_current_user
+from app.schemas.publication import FollowListItem, FollowSuggestionItem, UserProfileResponse
+from app.services.counters import add_follow, bump_user, remove_follow
+from app.services.notifications import notify_follow
+from app.services.principals import Principal
+from app.services.suggestions import on_follow, on_unfollow
+from app.utils.deps import get_current_principal
+from app.utils.pagination import decode_cursor, set_next_cursor
 
 router = APIRouter(prefix="/api/users", tags=["follows"])
 
 
-async def _count_followers(user_id: uuid.UUID, session: AsyncSession) -> int:
-    result = await session.exec(
-        select(func.count()).where(Follow.following_id == user_id)
-    )
-    return result.one()
-
-
-async def _count_following(user_id: uuid.UUID, session: AsyncSession) -> int:
+@router.get("/suggestions", response_model=list[FollowSuggestionItem])
+async def list_suggestions(
+    limit: int = Query(10, ge=1, le=50),
+    user: Principal = Depends(get_current_principal),
+    session: AsyncSession = Depends(get_read_session),
+):
     result = await session.exec(
-        select(func.count()).where(Follow.follower_id == user_id)
+        select(User.id, User.name, FollowSuggestion.mutual_count, FollowSuggestion.like_count)
+        .join(User, FollowSuggestion.candidate_id == User.id)
+        .where(FollowSuggestion.user_id == user.id)
+        .order_by(FollowSuggestion.score.desc(), FollowSuggestion.candidate_id)
+        .limit(limit)
     )
-    return result.one()
+    return [
+        {"id": row_id, "name": name, "mutual_count": mutual_count, "like_count": like_count}
+        for row_id, name, mutual_count, like_count in result.all()
+    ]
 
 
 async def _is_following(
     follower_id: uuid.UUID, following_id: uuid.UUID, session: AsyncSession
 ) -> bool:
     result = await session.exec(
-        select(Follow).where(
+        select(Follow.id)
+        .where(
             Follow.follower_id == follower_id,
             Follow.following_id == following_id,
         )
+        .limit(1)
     )
     return result.first() is not None
 
@@ -44,28 +57,21 @@ async def _is_following(
 @router.get("/{user_id}/profile", response_model=UserProfileResponse)
 async def get_user_profile(
     user_id: uuid.UUID,
-    user: User = Depends(get_current_user),
-    session: AsyncSession = Depends(get_session),
+    user: Principal = Depends(get_current_principal),
+    session: AsyncSession = Depends(get_read_session),
 ):
     target_user = await session.get(User, user_id)
     if not target_user:
         raise HTTPException(status_code=404, detail="User not found")
 
-    pub_count_result = await session.exec(
-        select(func.count()).where(Publication.author_id == user_id)
-    )
-    publication_count = pub_count_result.one()
-
-    follower_count = await _count_followers(user_id, session)
-    following_count = await _count_following(user_id, session)
     is_following = await _is_following(user.id, user_id, session)
 
     return {
         "id": target_user.id,
         "name": target_user.name,
-        "publication_count": publication_count,
-        "follower_count": follower_count,
-        "following_count": following_count,
+        "publication_count": target_user.publication_count,
+        "follower_count": target_user.follower_count,
+        "following_count": target_user.following_count,
         "is_following": is_following,
     }
 
@@ -73,61 +79,123 @@ async def get_user_profile(
 @router.post("/{user_id}/follow")
 async def toggle_follow(
     user_id: uuid.UUID,
-    user: User = Depends(get_current_user),
+    user: Principal = Depends(get_current_principal),
     session: AsyncSession = Depends(get_session),
 ):
     if user_id == user.id:
         raise HTTPException(status_code=400, detail="Cannot follow yourself")
 
-    target_user = await session.get(User, user_id)
-    if not target_user:
-        raise HTTPException(status_code=404, detail="User not found")
-
-    result = await session.exec(
-        select(Follow).where(
-            Follow.follower_id == user.id,
-            Follow.following_id == user_id,
-        )
-    )
-    existing = result.first()
-
-    if existing:
-        await session.delete(existing)
+    if await remove_follow(session, user.id, user_id):
         following = False
+        delta = -1
     else:
-        follow = Follow(follower_id=user.id, following_id=user_id)
-        session.add(follow)
+        try:
+            inserted = await add_follow(session, user.id, user_id)
+        except IntegrityError:
+            await session.rollback()
+            raise HTTPException(status_code=404, detail="User not found")
         following = True
+        delta = 1 if inserted else 0
+
+    if delta > 0:
+        await on_follow(session, user.id, user_id)
+        await notify_follow(session, user.id, user.name, user_id)
+    elif delta < 0:
+        await on_unfollow(session, user.id, user_id)
+
+    if delta:
+        # Touch both rows in id order so two users following each other at
+        # the same time can't deadlock.
+        updates = sorted(
+            [(user_id, "follower_count"), (user.id, "following_count")],
+            key=lambda item: item[0],
+        )
+        for target_id, field in updates:
+            if await bump_user(session, target_id, field, delta) is None:
+                await session.rollback()
+                raise HTTPException(status_code=404, detail="User not found")
 
     await session.commit()
     return {"following": following}
 
 
-@router.get("/{user_id}/followers")
+async def _follow_page(
+    session: AsyncSession,
+    viewer_id: uuid.UUID,
+    user_column,
+    owner_column,
+    owner_id: uuid.UUID,
+    cursor: str | None,
+    limit: int,
+    response: Response,
+) -> list[dict]:
+    """One page of a follow list, newest follow first.
+
+    ``owner_column`` is the side of ``Follow`` pinned to ``owner_id`` and
+    ``user_column`` the side listed; the ``(owner_column, created_at)``
+    index serves both the filter and the ordering.
+    """
+    query = (
+        select(User.id, User.name, Follow.created_at, Follow.id)
+        .join(Follow, user_column == User.id)
+        .where(owner_column == owner_id)
+        .order_by(Follow.created_at.desc(), Follow.id.desc())
+        .limit(limit)
+    )
+    if cursor:
+        cursor_dt, cursor_id = decode_cursor(cursor)
+        query = query.where(tuple_(Follow.created_at, Follow.id) < tuple_(cursor_dt, cursor_id))
+
+    result = await session.exec(query)
+    rows = result.all()
+
+    user_ids = [row[0] for row in rows]
+    if user_ids:
+        followed_result = await session.exec(
+            select(Follow.following_id).where(
+                Follow.follower_id == viewer_id,
+                col(Follow.following_id).in_(user_ids),
+            )
+        )
+        followed = set(followed_result.all())
+    else:
+        followed = set()
+
+    set_next_cursor(response, rows, limit, key=lambda row: (row[2], row[3]))
+    return [
+        {
+            "id": row_id,
+            "name": name,
+            "followed_at": followed_at,
+            "is_following": row_id in followed,
+        }
+        for row_id, name, followed_at, _ in rows
+    ]
+
+
+@router.get("/{user_id}/followers", response_model=list[FollowListItem])
 async def list_followers(
     user_id: uuid.UUID,
-    user: User = Depends(get_current_user),
-    session: AsyncSession = Depends(get_session),
+    response: Response,
+    cursor: str | None = None,
+    limit: int = Query(20, ge=1, le=100),
+    user: Principal = Depends(get_current_principal),
+    session: AsyncSession = Depends(get_read_session),
 ):
-    result = await session.exec(
-        select(User.id, User.name)
-        .join(Follow, Follow.follower_id == User.id)
-        .where(Follow.following_id == user_id)
+    return await _follow_page(
+        session, user.id, Follow.follower_id, Follow.following_id, user_id, cursor, limit, response
     )
-    rows = result.all()
-    return [{"id": row[0], "name": row[1]} for row in rows]
 
 
-@router.get("/{user_id}/following")
+@router.get("/{user_id}/following", response_model=list[FollowListItem])
 async def list_following(
     user_id: uuid.UUID,
-    user: User = Depends(get_current_user),
-    session: AsyncSession = Depends(get_session),
+    response: Response,
+    cursor: str | None = None,
+    limit: int = Query(20, ge=1, le=100),
+    user: Principal = Depends(get_current_principal),
+    session: AsyncSession = Depends(get_read_session),
 ):
-    result = await session.exec(
-        select(User.id, User.name)
-        .join(Follow, Follow.following_id == User.id)
-        .where(Follow.follower_id == user_id)
+    return await _follow_page(
+        session, user.id, Follow.following_id, Follow.follower_id, user_id, cursor, limit, response
     )
-    rows = result.all()
-    return [{"id": row[0], "name": row[1]} for row in rows]
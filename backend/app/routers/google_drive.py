@@ -1,20 +1,45 @@
+import asyncio
+import functools
 import uuid
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query, Response
 from fastapi.responses import RedirectResponse
+from sqlalchemy import tuple_
+from sqlmodel import select
 from sqlmodel.ext.asyncio.session import AsyncSession
 
 from app.config import settings
 from app.database import get_session
 from app.models.document import Document
+from app.models.drive_file import DriveFile, DriveSyncState
 from app.models.user import User
+from app.schemas.google_drive import DriveFileResponse, DriveImportRequest
+from app.schemas.job import JobResponse
 from app.utils.deps import get_current_user
-from app.utils.google_auth import create_oauth_flow, get_credentials
-from app.services.google_drive import list_drive_files, export_google_doc_as_html, get_file_name, create_google_doc
+from app.utils.google_auth import create_oauth_flow
+from app.utils.pagination import decode_cursor, set_next_cursor
+from app.services.documents import add_document
+from app.services.drive_import import convert_drive_file, import_drive_files
+from app.services.drive_index import forget_drive_index, is_stale, refresh_drive_index, sync_drive_index
+from app.services.google_drive import DriveAuthError, DriveError, drive_client
+from app.services.jobs import create_job, run_job
+from app.services.autosave import document_saves
 
 router = APIRouter(prefix="/api/google", tags=["google-drive"])
 
 
+def _refresh_token(user: User) -> str:
+    if not user.google_refresh_token:
+        raise HTTPException(status_code=400, detail="Google Drive not connected")
+    return user.google_refresh_token
+
+
+def _drive_failed(exc: DriveError) -> HTTPException:
+    if isinstance(exc, DriveAuthError):
+        return HTTPException(status_code=400, detail="Google Drive access expired; reconnect your account")
+    return HTTPException(status_code=502, detail=str(exc))
+
+
 @router.get("/auth")
 async def google_auth(user: User = Depends(get_current_user)):
     if not settings.google_client_id or not settings.google_client_secret:
@@ -34,24 +59,86 @@ async def google_auth(user: User = Depends(get_current_user)):
 @router.get("/callback")
 async def google_callback(code: str, state: str, session: AsyncSession = Depends(get_session)):
     flow = create_oauth_flow()
-    flow.fetch_token(code=code)
+    # fetch_token makes a blocking HTTP call.
+    await asyncio.to_thread(flow.fetch_token, code=code)
     credentials = flow.credentials
     user = await session.get(User, uuid.UUID(state))
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
+    if credentials.refresh_token != user.google_refresh_token:
+        # Possibly a different Google account: its files are indexed afresh.
+        await forget_drive_index(session, user.id)
     user.google_refresh_token = credentials.refresh_token
     session.add(user)
     await session.commit()
     return RedirectResponse(url=f"{settings.frontend_url}?google_connected=true")
 
 
-@router.get("/files")
-async def google_files(user: User = Depends(get_current_user)):
-    if not user.google_refresh_token:
-        raise HTTPException(status_code=400, detail="Google Drive not connected")
-    creds = get_credentials(user.google_refresh_token)
-    files = list_drive_files(creds)
-    return files
+@router.get("/files", response_model=list[DriveFileResponse])
+async def google_files(
+    response: Response,
+    background_tasks: BackgroundTasks,
+    q: str | None = Query(default=None, max_length=255),
+    cursor: str | None = None,
+    limit: int = Query(default=50, ge=1, le=200),
+    refresh: bool = False,
+    user: User = Depends(get_current_user),
+    session: AsyncSession = Depends(get_session),
+):
+    """The user's Google Docs from the local index, most recently modified first.
+
+    The first call builds the index; later calls answer from it at once
+    and bring it up to date in the background. ``refresh`` syncs before
+    answering.
+    """
+    refresh_token = _refresh_token(user)
+    # Read up front: the sync commits, which expires ``user``.
+    user_id = user.id
+    state = await session.get(DriveSyncState, user_id)
+    if state is None or refresh:
+        try:
+            await sync_drive_index(session, user_id, refresh_token, force=True)
+        except DriveError as exc:
+            raise _drive_failed(exc)
+    elif is_stale(state):
+        background_tasks.add_task(refresh_drive_index, user_id, refresh_token)
+
+    query = (
+        select(DriveFile.id, DriveFile.file_id, DriveFile.name, DriveFile.modified_time)
+        .where(DriveFile.owner_id == user_id)
+        .order_by(DriveFile.modified_time.desc(), DriveFile.id.desc())
+        .limit(limit)
+    )
+    if q:
+        pattern = q.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        query = query.where(DriveFile.name.ilike(f"%{pattern}%", escape="\\"))
+    if cursor:
+        cursor_dt, cursor_id = decode_cursor(cursor)
+        query = query.where(tuple_(DriveFile.modified_time, DriveFile.id) < tuple_(cursor_dt, cursor_id))
+    rows = (await session.exec(query)).all()
+    set_next_cursor(response, rows, limit, key=lambda row: (row.modified_time, row.id))
+    return [DriveFileResponse(id=row.file_id, name=row.name, modifiedTime=row.modified_time) for row in rows]
+
+
+@router.post("/import", response_model=JobResponse, status_code=202)
+async def import_many_from_drive(
+    data: DriveImportRequest,
+    background_tasks: BackgroundTasks,
+    user: User = Depends(get_current_user),
+    session: AsyncSession = Depends(get_session),
+):
+    """Import several Google Docs in the background; poll the returned job."""
+    refresh_token = _refresh_token(user)
+    if len(data.file_ids) > settings.drive_import_max_files:
+        raise HTTPException(
+            status_code=400, detail=f"At most {settings.drive_import_max_files} files per import",
+        )
+    job = await create_job(session, user.id, "drive_import")
+    background_tasks.add_task(
+        run_job, job.id,
+        functools.partial(import_drive_files, refresh_token=refresh_token, file_ids=data.file_ids),
+    )
+    return job
 
 
 @router.post("/import/{file_id}")
@@ -60,22 +147,15 @@ async def import_from_drive(
     user: User = Depends(get_current_user),
     session: AsyncSession = Depends(get_session),
 ):
-    if not user.google_refresh_token:
-        raise HTTPException(status_code=400, detail="Google Drive not connected")
-    creds = get_credentials(user.google_refresh_token)
-    html = export_google_doc_as_html(creds, file_id)
-    name = get_file_name(creds, file_id)
-    content = {
-        "type": "doc",
-        "content": [{"type": "paragraph", "content": [{"type": "text", "text": html}]}]
-    }
-    doc = Document(
-        owner_id=user.id,
-        title=name,
-        content=content,
-        google_drive_file_id=file_id,
-    )
-    session.add(doc)
+    refresh_token = _refresh_token(user)
+    try:
+        content, name = await asyncio.gather(
+            convert_drive_file(refresh_token, file_id),
+            drive_client.file_name(refresh_token, file_id),
+        )
+    except DriveError as exc:
+        raise _drive_failed(exc)
+    doc = await add_document(session, user.id, (name or "Untitled")[:255], content, google_drive_file_id=file_id)
     await session.commit()
     await session.refresh(doc)
     return doc
@@ -87,14 +167,16 @@ async def export_to_drive(
     user: User = Depends(get_current_user),
     session: AsyncSession = Depends(get_session),
 ):
-    if not user.google_refresh_token:
-        raise HTTPException(status_code=400, detail="Google Drive not connected")
+    refresh_token = _refresh_token(user)
+    await document_saves.flush_document(session, document_id)
     doc = await session.get(Document, document_id)
     if not doc or doc.owner_id != user.id:
         raise HTTPException(status_code=404, detail="Document not found")
-    creds = get_credentials(user.google_refresh_token)
     html = f"<html><body><h1>{doc.title}</h1><p>Exported from Violeta</p></body></html>"
-    drive_file_id = create_google_doc(creds, doc.title, html)
+    try:
+        drive_file_id = await drive_client.create_doc(refresh_token, doc.title, html)
+    except DriveError as exc:
+        raise _drive_failed(exc)
     doc.google_drive_file_id = drive_file_id
     session.add(doc)
     await session.commit()
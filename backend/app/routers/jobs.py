@@ -0,0 +1,24 @@
+import uuid
+
+from fastapi import APIRouter, Depends, HTTPException
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.database import get_session
+from app.models.job import Job
+from app.schemas.job import JobResponse
+from app.services.principals import Principal
+from app.utils.deps import get_current_principal
+
+router = APIRouter(prefix="/api/jobs", tags=["jobs"])
+
+
+@router.get("/{job_id}", response_model=JobResponse)
+async def get_job(
+    job_id: uuid.UUID,
+    user: Principal = Depends(get_current_principal),
+    session: AsyncSession = Depends(get_session),
+):
+    job = await session.get(Job, job_id)
+    if not job or job.owner_id != user.id:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
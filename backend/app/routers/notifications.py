@@ -0,0 +1,113 @@
+import asyncio
+import json
+import uuid
+from datetime import datetime
+
+from fastapi import APIRouter, Depends, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy import tuple_, update
+from sqlmodel import col, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.database import get_session
+from app.models.notification import Notification
+from app.models.user import User
+from app.schemas.notification import NotificationResponse, NotificationsRead
+from app.services.notifications import notification_hub
+from app.services.principals import Principal
+from app.utils.deps import get_current_principal
+from app.utils.pagination import decode_cursor, set_next_cursor
+
+router = APIRouter(prefix="/api/notifications", tags=["notifications"])
+
+KEEPALIVE_SECONDS = 15
+
+
+@router.get("/", response_model=list[NotificationResponse])
+async def list_notifications(
+    response: Response,
+    cursor: str | None = None,
+    limit: int = Query(20, ge=1, le=100),
+    unread_only: bool = False,
+    user: Principal = Depends(get_current_principal),
+    session: AsyncSession = Depends(get_session),
+):
+    query = (
+        select(Notification, User.name)
+        .join(User, Notification.actor_id == User.id)
+        .where(Notification.recipient_id == user.id)
+        .order_by(Notification.updated_at.desc(), Notification.id.desc())
+        .limit(limit)
+    )
+    if unread_only:
+        query = query.where(col(Notification.read_at).is_(None))
+    if cursor:
+        cursor_dt, cursor_id = decode_cursor(cursor)
+        query = query.where(tuple_(Notification.updated_at, Notification.id) < tuple_(cursor_dt, cursor_id))
+
+    result = await session.exec(query)
+    rows = result.all()
+    set_next_cursor(response, rows, limit, key=lambda row: (row[0].updated_at, row[0].id))
+    return [
+        {
+            "id": notification.id,
+            "type": notification.type.value,
+            "actor_id": notification.actor_id,
+            "actor_name": actor_name,
+            "actor_count": notification.actor_count,
+            "publication_id": notification.publication_id,
+            "comment_id": notification.comment_id,
+            "read": notification.read_at is not None,
+            "created_at": notification.created_at,
+            "updated_at": notification.updated_at,
+        }
+        for notification, actor_name in rows
+    ]
+
+
+@router.post("/read", status_code=204)
+async def mark_read(
+    data: NotificationsRead,
+    user: Principal = Depends(get_current_principal),
+    session: AsyncSession = Depends(get_session),
+):
+    stmt = update(Notification).where(
+        Notification.recipient_id == user.id,
+        col(Notification.read_at).is_(None),
+    )
+    if data.ids is not None:
+        stmt = stmt.where(col(Notification.id).in_(data.ids))
+    await session.exec(stmt.values(read_at=datetime.utcnow()))
+    await session.commit()
+
+
+@router.get("/stream")
+async def stream_notifications(
+    request: Request,
+    user: Principal = Depends(get_current_principal),
+    session: AsyncSession = Depends(get_session),
+):
+    """Server-sent events: one ``notification`` event per new or coalesced
+    notification, plus a comment line every few seconds as keepalive."""
+    user_id: uuid.UUID = user.id
+    # Don't hold a pooled connection for the lifetime of the stream.
+    await session.close()
+    queue = notification_hub.subscribe(user_id)
+
+    async def events():
+        try:
+            while not await request.is_disconnected():
+                try:
+                    payload = await asyncio.wait_for(queue.get(), timeout=KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                yield f"event: notification\ndata: {json.dumps(payload)}\n\n"
+        finally:
+            notification_hub.unsubscribe(user_id, queue)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
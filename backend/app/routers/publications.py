@@ -1,19 +1,28 @@
 import secrets
 import uuid
-from datetime import datetime
+from datetime import datetime, timezone
 
-from fastapi import APIRouter, Depends, File, Form, HTTPException, UploadFile, status
+from fastapi import APIRouter, Depends, File, Form, HTTPException, Query, UploadFile, status
 from fastapi.responses import FileResponse
+from sqlalchemy import tuple_
+from sqlalchemy.exc import IntegrityError
 from sqlmodel import col, select
 from sqlmodel.ext.asyncio.session import AsyncSession
 
-from app.database import get_session
+from app.config import settings
+from app.database import get_read_session, get_session
 from app.models.publication import Publication, PublicationLike, PublicationType
 from app.models.follow import Follow
 from app.models.user import User
-from app.schemas.publication import PublicationResponse, PublicPublicationResponse
+from app.schemas.publication import FeedProbeResponse, PublicationResponse, PublicPublicationResponse
+from app.services.counters import add_like, bump, bump_user, remove_like
+from app.services.feed import feed_watermarks
+from app.services.notifications import notify_like, retract_like
+from app.services.principals import Principal
+from app.services.search import pdf_text
+from app.services.suggestions import on_like, on_unlike
 from app.services.thumbnail import save_pdf, generate_thumbnail, delete_publication_files
-from app.utils.deps import get_current_user
+from app.utils.deps import get_current_principal
 
 router = APIRouter(prefix="/api/publications", tags=["publications"])
 public_router = APIRouter(tags=["publications-public"])
@@ -43,7 +52,7 @@ async def create_publication(
     abstract: str | None = Form(None),
     document_id: str | None = Form(None),
     pdf: UploadFile = File(...),
-    user: User = Depends(get_current_user),
+    user: Principal = Depends(get_current_principal),
     session: AsyncSession = Depends(get_session),
 ):
     try:
@@ -72,10 +81,13 @@ async def create_publication(
         pdf_path=pdf_path,
         thumbnail_path=thumbnail_path,
         share_token=share_token,
+        search_text=await pdf_text(pdf_path),
     )
     session.add(publication)
+    await bump_user(session, user.id, "publication_count", 1)
     await session.commit()
     await session.refresh(publication)
+    feed_watermarks.publication_created()
 
     return _pub_response(publication, user.name)
 
@@ -84,8 +96,8 @@ async def create_publication(
 async def feed(
     cursor: str | None = None,
     limit: int = 20,
-    user: User = Depends(get_current_user),
-    session: AsyncSession = Depends(get_session),
+    user: Principal = Depends(get_current_principal),
+    session: AsyncSession = Depends(get_read_session),
 ):
     following_result = await session.exec(
         select(Follow.following_id).where(Follow.follower_id == user.id)
@@ -129,12 +141,46 @@ async def feed(
     ]
 
 
+@router.get("/feed/new", response_model=FeedProbeResponse)
+async def feed_new_since(
+    since_created_at: datetime,
+    since_id: uuid.UUID,
+    limit: int = Query(50, ge=1, le=100),
+    user: Principal = Depends(get_current_principal),
+    session: AsyncSession = Depends(get_read_session),
+):
+    """Cheap "pull to refresh" check: ids of feed items newer than the
+    client's newest ``(created_at, id)``, without building the feed."""
+    if since_created_at.tzinfo:
+        since_created_at = since_created_at.astimezone(timezone.utc).replace(tzinfo=None)
+    since = (since_created_at, since_id)
+    if feed_watermarks.is_current(user.id, since, settings.feed_probe_ttl_seconds):
+        return {"count": 0, "ids": []}
+
+    result = await session.exec(
+        select(Publication.id, Publication.created_at)
+        .join(Follow, Follow.following_id == Publication.author_id)
+        .where(
+            Follow.follower_id == user.id,
+            tuple_(Publication.created_at, Publication.id) > tuple_(since_created_at, since_id),
+        )
+        .order_by(Publication.created_at.desc(), Publication.id.desc())
+        .limit(limit + 1)
+    )
+    rows = result.all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    feed_watermarks.record(user.id, (rows[0][1], rows[0][0]) if rows else since)
+    return {"count": len(rows), "ids": [row[0] for row in rows], "has_more": has_more}
+
+
 @router.get("/explore", response_model=list[PublicationResponse])
 async def explore(
     cursor: str | None = None,
     limit: int = 20,
-    user: User = Depends(get_current_user),
-    session: AsyncSession = Depends(get_session),
+    user: Principal = Depends(get_current_principal),
+    session: AsyncSession = Depends(get_read_session),
 ):
     query = (
         select(Publication, User.name)
@@ -172,8 +218,8 @@ async def explore(
 @router.get("/{pub_id}", response_model=PublicationResponse)
 async def get_publication(
     pub_id: uuid.UUID,
-    user: User = Depends(get_current_user),
-    session: AsyncSession = Depends(get_session),
+    user: Principal = Depends(get_current_principal),
+    session: AsyncSession = Depends(get_read_session),
 ):
     result = await session.exec(
         select(Publication, User.name)
@@ -200,7 +246,7 @@ async def get_publication(
 @router.delete("/{pub_id}", status_code=204)
 async def delete_publication(
     pub_id: uuid.UUID,
-    user: User = Depends(get_current_user),
+    user: Principal = Depends(get_current_principal),
     session: AsyncSession = Depends(get_session),
 ):
     pub = await session.get(Publication, pub_id)
@@ -211,13 +257,14 @@ async def delete_publication(
 
     delete_publication_files(str(pub.id))
     await session.delete(pub)
+    await bump_user(session, user.id, "publication_count", -1)
     await session.commit()
 
 
 @router.get("/{pub_id}/pdf")
 async def get_publication_pdf(
     pub_id: uuid.UUID,
-    session: AsyncSession = Depends(get_session),
+    session: AsyncSession = Depends(get_read_session),
 ):
     pub = await session.get(Publication, pub_id)
     if not pub:
@@ -233,7 +280,7 @@ async def get_publication_pdf(
 @router.get("/{pub_id}/thumbnail")
 async def get_publication_thumbnail(
     pub_id: uuid.UUID,
-    session: AsyncSession = Depends(get_session),
+    session: AsyncSession = Depends(get_read_session),
 ):
     pub = await session.get(Publication, pub_id)
     if not pub:
@@ -249,36 +296,38 @@ async def get_publication_thumbnail(
 @router.post("/{pub_id}/like")
 async def toggle_like(
     pub_id: uuid.UUID,
-    user: User = Depends(get_current_user),
+    user: Principal = Depends(get_current_principal),
     session: AsyncSession = Depends(get_session),
 ):
-    pub = await session.get(Publication, pub_id)
-    if not pub:
-        raise HTTPException(status_code=404, detail="Publication not found")
-
-    result = await session.exec(
-        select(PublicationLike).where(
-            PublicationLike.publication_id == pub_id,
-            PublicationLike.user_id == user.id,
-        )
-    )
-    existing = result.first()
-
-    if existing:
-        await session.delete(existing)
-        pub.like_count = max(0, pub.like_count - 1)
+    if await remove_like(session, pub_id, user.id):
         liked = False
+        like_count = await bump(session, pub_id, "like_count", -1)
+        changed = True
     else:
-        like = PublicationLike(publication_id=pub_id, user_id=user.id)
-        session.add(like)
-        pub.like_count += 1
+        try:
+            inserted = await add_like(session, pub_id, user.id)
+        except IntegrityError:
+            # Foreign key violation: the publication does not exist.
+            await session.rollback()
+            raise HTTPException(status_code=404, detail="Publication not found")
         liked = True
+        # A concurrent request may have inserted the same like first.
+        like_count = await bump(session, pub_id, "like_count", 1 if inserted else 0)
+        changed = inserted
 
-    session.add(pub)
-    await session.commit()
-    await session.refresh(pub)
+    if like_count is None:
+        await session.rollback()
+        raise HTTPException(status_code=404, detail="Publication not found")
 
-    return {"liked": liked, "like_count": pub.like_count}
+    if changed and liked:
+        await on_like(session, user.id, pub_id)
+        await notify_like(session, user.id, user.name, pub_id)
+    elif changed:
+        await on_unlike(session, user.id, pub_id)
+        await retract_like(session, user.id, pub_id)
+
+    await session.commit()
+    return {"liked": liked, "like_count": like_count}
 
 
 # --- Public router (no auth) ---
@@ -286,7 +335,7 @@ async def toggle_like(
 @public_router.get("/api/p/{share_token}", response_model=PublicPublicationResponse)
 async def get_public_publication(
     share_token: str,
-    session: AsyncSession = Depends(get_session),
+    session: AsyncSession = Depends(get_read_session),
 ):
     result = await session.exec(
         select(Publication, User.name)
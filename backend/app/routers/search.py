@@ -0,0 +1,31 @@
+from fastapi import APIRouter, Depends, Query, Response
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.database import get_session
+from app.schemas.search import SearchResult
+from app.services.principals import Principal
+from app.services.search import search
+from app.utils.deps import get_current_principal
+from app.utils.pagination import decode_cursor, set_next_cursor
+
+router = APIRouter(prefix="/api/search", tags=["search"])
+
+
+@router.get("/", response_model=list[SearchResult])
+async def search_all(
+    response: Response,
+    q: str = Query(min_length=1, max_length=200),
+    cursor: str | None = None,
+    limit: int = Query(default=20, ge=1, le=50),
+    user: Principal = Depends(get_current_principal),
+    session: AsyncSession = Depends(get_session),
+):
+    """Ranked matches among the caller's documents and all publications.
+
+    Paged by ``(rank, id)`` rather than time, with the same
+    ``X-Next-Cursor`` header as the other lists.
+    """
+    after = decode_cursor(cursor, float) if cursor else None
+    results = await search(session, user.id, q, limit, after)
+    set_next_cursor(response, results, limit, key=lambda result: (result["rank"], result["id"]))
+    return results
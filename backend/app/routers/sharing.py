@@ -2,15 +2,19 @@ import secrets
 import uuid
 
 from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy import update
 from sqlmodel import select
 from sqlmodel.ext.asyncio.session import AsyncSession
 
 from app.config import settings
-from app.database import get_session
+from app.database import get_read_session, get_session
 from app.models.document import Document
-from app.models.user import User
 from app.schemas.document import DocumentResponse, ShareResponse
-from app.utils.deps import get_current_user
+from app.services.autosave import document_saves
+from app.services.collab import collab_hub
+from app.services.contents import add_reference, resolve_content, store_content
+from app.services.principals import Principal
+from app.utils.deps import get_current_principal
 
 router = APIRouter(tags=["sharing"])
 
@@ -18,7 +22,7 @@ router = APIRouter(tags=["sharing"])
 @router.post("/api/documents/{doc_id}/share", response_model=ShareResponse)
 async def share_document(
     doc_id: uuid.UUID,
-    user: User = Depends(get_current_user),
+    user: Principal = Depends(get_current_principal),
     session: AsyncSession = Depends(get_session),
 ):
     doc = await session.get(Document, doc_id)
@@ -39,7 +43,7 @@ async def share_document(
 @router.delete("/api/documents/{doc_id}/share", status_code=204)
 async def revoke_share(
     doc_id: uuid.UUID,
-    user: User = Depends(get_current_user),
+    user: Principal = Depends(get_current_principal),
     session: AsyncSession = Depends(get_session),
 ):
     doc = await session.get(Document, doc_id)
@@ -52,35 +56,73 @@ async def revoke_share(
 
 
 @router.get("/api/shared/{share_token}", response_model=DocumentResponse)
-async def view_shared(share_token: str, session: AsyncSession = Depends(get_session)):
+async def view_shared(
+    share_token: str,
+    session: AsyncSession = Depends(get_read_session),
+    primary: AsyncSession = Depends(get_session),
+):
+    """Read from a replica, unless the document has unsaved edits in this
+    process; ``primary`` only connects in that case."""
     result = await session.exec(
         select(Document).where(Document.share_token == share_token, Document.is_public == True)
     )
     doc = result.first()
     if not doc:
         raise HTTPException(status_code=404, detail="Shared document not found")
-    return doc
+    if doc.id not in collab_hub and doc.id not in document_saves:
+        return await resolve_content(session, doc)
+    await collab_hub.checkpoint(primary, doc.id)
+    await document_saves.flush_document(primary, doc.id)
+    doc = await primary.get(Document, doc.id, populate_existing=True)
+    return await resolve_content(primary, doc)
 
 
 @router.post("/api/shared/{share_token}/copy", response_model=DocumentResponse, status_code=201)
 async def copy_shared(
     share_token: str,
-    user: User = Depends(get_current_user),
+    user: Principal = Depends(get_current_principal),
     session: AsyncSession = Depends(get_session),
 ):
+    """Copy a shared document by reference; see ``app.services.contents``."""
     result = await session.exec(
         select(Document).where(Document.share_token == share_token, Document.is_public == True)
     )
     original = result.first()
     if not original:
         raise HTTPException(status_code=404, detail="Shared document not found")
+    await collab_hub.checkpoint(session, original.id)
+    if await document_saves.flush_document(session, original.id):
+        await session.refresh(original)
+
+    if original.content_hash:
+        digest = original.content_hash
+        if not await add_reference(session, digest):
+            raise HTTPException(status_code=409, detail="Shared document changed, try again")
+    else:
+        digest = await store_content(session, original.content, references=1)
+        # The original shares the stored content too, unless it was saved
+        # in the meantime or a concurrent copy already moved it (copying
+        # doesn't bump the version, so the hash is the guard for that).
+        moved = await session.exec(
+            update(Document)
+            .where(
+                Document.id == original.id,
+                Document.version == original.version,
+                Document.content_hash.is_(None),
+            )
+            .values(content={}, content_hash=digest)
+        )
+        if moved.rowcount:
+            await add_reference(session, digest)
+
     copy = Document(
         owner_id=user.id,
         title=f"Copy of {original.title}",
-        content=original.content,
+        content_hash=digest,
+        search_text=original.search_text,
         copied_from_id=original.id,
     )
     session.add(copy)
     await session.commit()
     await session.refresh(copy)
-    return copy
+    return await resolve_content(session, copy)
@@ -1,8 +1,8 @@
 import uuid
 from datetime import datetime
-from typing import Any
+from typing import Any, Literal
 
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
 
 class DocumentCreate(BaseModel):
@@ -15,6 +15,21 @@ class DocumentUpdate(BaseModel):
     content: dict[str, Any] | None = None
 
 
+class PatchOperation(BaseModel):
+    """One RFC 6902 operation against the document's ``content``."""
+
+    model_config = {"populate_by_name": True}
+
+    op: Literal["add", "remove", "replace", "move", "copy", "test"]
+    path: str
+    value: Any = None
+    from_: str | None = Field(default=None, alias="from")
+
+
+class DocumentVersionResponse(BaseModel):
+    version: int
+
+
 class DocumentResponse(BaseModel):
     id: uuid.UUID
     owner_id: uuid.UUID
@@ -24,10 +39,24 @@ class DocumentResponse(BaseModel):
     share_token: str | None
     copied_from_id: uuid.UUID | None
     google_drive_file_id: str | None
+    version: int
     created_at: datetime
     updated_at: datetime
 
 
+class DocumentRevisionItem(BaseModel):
+    version: int
+    title: str
+    size: int
+    created_at: datetime
+
+
+class DocumentRevisionResponse(BaseModel):
+    version: int
+    title: str
+    content: dict[str, Any]
+
+
 class DocumentListItem(BaseModel):
     id: uuid.UUID
     title: str
@@ -0,0 +1,14 @@
+from datetime import datetime
+
+from pydantic import BaseModel, Field
+
+
+class DriveImportRequest(BaseModel):
+    file_ids: list[str] = Field(min_length=1)
+
+
+class DriveFileResponse(BaseModel):
+    # Named like Drive's own fields, which the client already reads.
+    id: str
+    name: str
+    modifiedTime: datetime
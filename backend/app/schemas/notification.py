@@ -0,0 +1,21 @@
+import uuid
+from datetime import datetime
+
+from pydantic import BaseModel
+
+
+class NotificationResponse(BaseModel):
+    id: uuid.UUID
+    type: str
+    actor_id: uuid.UUID
+    actor_name: str
+    actor_count: int
+    publication_id: uuid.UUID | None
+    comment_id: uuid.UUID | None
+    read: bool
+    created_at: datetime
+    updated_at: datetime
+
+
+class NotificationsRead(BaseModel):
+    ids: list[uuid.UUID] | None = None
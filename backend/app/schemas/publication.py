@@ -26,6 +26,12 @@ class PublicationResponse(BaseModel):
     liked_by_me: bool = False
 
 
+class FeedProbeResponse(BaseModel):
+    count: int
+    ids: list[uuid.UUID]
+    has_more: bool = False
+
+
 class PublicPublicationResponse(BaseModel):
     id: uuid.UUID
     author_name: str
@@ -39,7 +45,7 @@ class PublicPublicationResponse(BaseModel):
 
 class CommentCreate(BaseModel):
     content: str
-    parent_id: str | None = None
+    parent_id: uuid.UUID | None = None
 
 
 class CommentResponse(BaseModel):
@@ -52,6 +58,11 @@ class CommentResponse(BaseModel):
     created_at: datetime
 
 
+class CommentThreadResponse(CommentResponse):
+    replies: list[CommentResponse] = []
+    reply_count: int = 0
+
+
 class UserProfileResponse(BaseModel):
     id: uuid.UUID
     name: str
@@ -59,3 +70,17 @@ class UserProfileResponse(BaseModel):
     follower_count: int
     following_count: int
     is_following: bool = False
+
+
+class FollowListItem(BaseModel):
+    id: uuid.UUID
+    name: str
+    followed_at: datetime
+    is_following: bool = False
+
+
+class FollowSuggestionItem(BaseModel):
+    id: uuid.UUID
+    name: str
+    mutual_count: int
+    like_count: int
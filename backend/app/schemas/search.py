@@ -0,0 +1,15 @@
+import uuid
+from datetime import datetime
+from typing import Literal
+
+from pydantic import BaseModel
+
+
+class SearchResult(BaseModel):
+    kind: Literal["document", "publication"]
+    id: uuid.UUID
+    title: str
+    # HTML: the excerpt is escaped; matched terms are wrapped in <mark>...</mark>.
+    snippet: str
+    rank: float
+    updated_at: datetime
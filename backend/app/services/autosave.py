@@ -0,0 +1,306 @@
+"""Write coalescing for document autosaves.
+
+The editor saves every couple of seconds while the user types. Instead of
+a transaction per save, ``document_saves.stage`` applies the edit to an
+in-memory copy of the document, bumps its version and acknowledges
+straight away. ``run()`` writes the latest state once a document has been
+idle for ``document_idle_flush_seconds`` or buffered for
+``document_max_flush_delay_seconds``, so a burst of saves becomes one
+``UPDATE`` and one history revision.
+
+Anything that reads a document calls ``flush_document`` first, and the
+lifespan flushes everything on shutdown. The buffer lives in one process:
+with several API workers, ``settings.document_write_behind`` should only be
+enabled when a document's requests are routed to the same worker. When it
+is off, every save is still staged here but written through immediately.
+
+A flush only writes a document still at the version the buffered state was
+built on. If another process wrote it first, the buffered state is dropped:
+a write-through save gets ``VersionConflict`` (409), and after a
+write-behind loss the next save on this worker does, so the client reloads
+instead of overwriting the other write.
+
+Flushes lock the documents they write, not the buffer: saves to different
+documents are written concurrently.
+"""
+
+import asyncio
+import contextlib
+import dataclasses
+import logging
+import time
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, AsyncIterator, Callable
+
+from sqlalchemy import bindparam, update
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.database import async_session
+from app.models.document import Document
+from app.services.contents import release_contents, resolve_content
+from app.services.history import SavedVersion, record_revisions
+from app.utils.tiptap import extract_text
+
+logger = logging.getLogger(__name__)
+
+
+class VersionConflict(Exception):
+    """The client's base version is not the document's current version."""
+
+
+@dataclass
+class PendingSave:
+    owner_id: uuid.UUID
+    title: str
+    content: dict[str, Any]
+    version: int
+    updated_at: datetime
+    # Last written state, which the next history delta is taken against.
+    base_version: int
+    base_content: dict[str, Any]
+    # Shared copy-on-write content the document pointed at when loaded.
+    content_hash: str | None = None
+    first_staged: float = field(default_factory=time.monotonic)
+    last_staged: float = field(default_factory=time.monotonic)
+
+
+class DocumentSaveBuffer:
+    """Latest unsaved state per document, flushed in batches."""
+
+    def __init__(self):
+        self._pending: dict[uuid.UUID, PendingSave] = {}
+        # Documents whose acknowledged saves were lost to a conflicting write.
+        self._lost: set[uuid.UUID] = set()
+        # What the latest stage replaced: (its version, the entry before it).
+        self._undo: dict[uuid.UUID, tuple[int, PendingSave | None]] = {}
+        # Per-document flush locks and how many flushes hold or await each.
+        self._locks: dict[uuid.UUID, tuple[asyncio.Lock, int]] = {}
+
+    def __contains__(self, doc_id: uuid.UUID) -> bool:
+        return doc_id in self._pending
+
+    def owned_by(self, owner_id: uuid.UUID) -> list[uuid.UUID]:
+        return [doc_id for doc_id, entry in self._pending.items() if entry.owner_id == owner_id]
+
+    @contextlib.asynccontextmanager
+    async def _locked(self, doc_ids: list[uuid.UUID]) -> AsyncIterator[None]:
+        """Hold the flush locks of ``doc_ids``, taken in a fixed order."""
+        ordered = sorted(set(doc_ids))
+        for doc_id in ordered:
+            lock, users = self._locks.get(doc_id, (None, 0))
+            self._locks[doc_id] = (lock or asyncio.Lock(), users + 1)
+        held = []
+        try:
+            for doc_id in ordered:
+                await self._locks[doc_id][0].acquire()
+                held.append(doc_id)
+            yield
+        finally:
+            for doc_id in held:
+                self._locks[doc_id][0].release()
+            for doc_id in ordered:
+                lock, users = self._locks[doc_id]
+                if users == 1:
+                    del self._locks[doc_id]
+                else:
+                    self._locks[doc_id] = (lock, users - 1)
+
+    def discard(self, doc_id: uuid.UUID):
+        self._pending.pop(doc_id, None)
+        self._undo.pop(doc_id, None)
+        self._lost.discard(doc_id)
+
+    async def stage(
+        self,
+        session: AsyncSession,
+        doc_id: uuid.UUID,
+        owner_id: uuid.UUID,
+        base_version: int | None,
+        edit: Callable[[PendingSave], None],
+    ) -> int | None:
+        """Apply ``edit`` to the buffered document and return its new version.
+
+        The document is loaded from the database only when nothing is
+        buffered for it yet. Returns ``None`` when it does not exist or
+        belongs to someone else; raises ``VersionConflict`` when
+        ``base_version`` is stale. Exceptions from ``edit`` propagate and
+        leave the buffer untouched, so ``edit`` must not mutate in place.
+        """
+        if doc_id in self._lost:
+            self._lost.discard(doc_id)
+            # Only a client that names its base version can be told to reload.
+            if base_version is not None:
+                raise VersionConflict
+        entry = self._pending.get(doc_id)
+        if entry is None:
+            # Bypass the identity map: a long-lived session may hold an old copy.
+            doc = await session.get(Document, doc_id, populate_existing=True)
+            if not doc or doc.owner_id != owner_id:
+                return None
+            await resolve_content(session, doc)
+            # Another save may have been staged while we were loading.
+            entry = self._pending.get(doc_id) or PendingSave(
+                owner_id=doc.owner_id,
+                title=doc.title,
+                content=doc.content,
+                version=doc.version,
+                updated_at=doc.updated_at,
+                base_version=doc.version,
+                base_content=doc.content,
+                content_hash=doc.content_hash,
+            )
+        elif entry.owner_id != owner_id:
+            return None
+
+        if base_version is not None and base_version != entry.version:
+            raise VersionConflict
+        previous = dataclasses.replace(self._pending[doc_id]) if doc_id in self._pending else None
+        edit(entry)
+        entry.version += 1
+        entry.updated_at = datetime.utcnow()
+        entry.last_staged = time.monotonic()
+        self._pending[doc_id] = entry
+        self._undo[doc_id] = (entry.version, previous)
+        return entry.version
+
+    def unstage(self, doc_id: uuid.UUID, version: int):
+        """Take back the stage that returned ``version`` if it was not written.
+
+        For a save whose request failed: nothing acknowledged it, so it must
+        not reach the database later. A save staged on top of it since then
+        keeps it.
+        """
+        undo = self._undo.pop(doc_id, None)
+        entry = self._pending.get(doc_id)
+        if undo is None or entry is None or undo[0] != version or entry.version != version:
+            return
+        if undo[1] is None:
+            del self._pending[doc_id]
+        else:
+            self._pending[doc_id] = undo[1]
+
+    async def flush(
+        self, session: AsyncSession, doc_ids: list[uuid.UUID] | None = None, raise_on_conflict: bool = False,
+    ) -> int:
+        """Write the buffered state of ``doc_ids`` (default: all) and commit.
+
+        Entries re-staged while the write was in flight stay buffered for
+        the next flush. Entries whose document was written elsewhere are
+        dropped; with ``raise_on_conflict`` that raises ``VersionConflict``
+        after the other entries are committed. Returns the number of
+        documents written.
+        """
+        ids = list(self._pending) if doc_ids is None else [d for d in doc_ids if d in self._pending]
+        if not ids:
+            return 0
+        async with self._locked(ids):
+            # Another flush may have written some of them while we waited.
+            entries = {doc_id: self._pending[doc_id] for doc_id in ids if doc_id in self._pending}
+            if not entries:
+                return 0
+            saves = [
+                SavedVersion(
+                    document_id=doc_id,
+                    owner_id=entry.owner_id,
+                    title=entry.title,
+                    content=entry.content,
+                    version=entry.version,
+                    base_version=entry.base_version,
+                    base_content=entry.base_content,
+                )
+                for doc_id, entry in entries.items()
+            ]
+            rows = [
+                {
+                    "b_id": doc_id,
+                    "b_title": entry.title,
+                    "b_content": entry.content,
+                    "b_search_text": extract_text(entry.content),
+                    "b_version": entry.version,
+                    "b_base_version": entry.base_version,
+                    "b_updated_at": entry.updated_at,
+                }
+                for doc_id, entry in entries.items()
+            ]
+            table = Document.__table__
+            # Only over the version the state was built on: anything else
+            # means another process wrote the document in between.
+            stmt = (
+                update(table)
+                .where(table.c.id == bindparam("b_id"), table.c.version == bindparam("b_base_version"))
+                .values(
+                    title=bindparam("b_title"),
+                    content=bindparam("b_content"),
+                    content_hash=None,
+                    search_text=bindparam("b_search_text"),
+                    version=bindparam("b_version"),
+                    updated_at=bindparam("b_updated_at"),
+                )
+            )
+            conn = await session.connection()
+            conflicts = []
+            # One statement per row: executemany has no per-row rowcount.
+            for row in rows:
+                if (await conn.execute(stmt, row)).rowcount != 1:
+                    conflicts.append(row["b_id"])
+            saves = [save for save in saves if save.document_id not in conflicts]
+            hashes = [entries[save.document_id].content_hash for save in saves]
+            await release_contents(session, [content_hash for content_hash in hashes if content_hash])
+            await record_revisions(session, saves)
+            await session.commit()
+            for doc_id in conflicts:
+                logger.warning("Document %s was written elsewhere; dropping buffered saves", doc_id)
+                self._pending.pop(doc_id, None)
+                self._undo.pop(doc_id, None)
+                self._lost.add(doc_id)
+            for save in saves:
+                entry = self._pending.get(save.document_id)
+                if entry is None:
+                    continue
+                if entry.version == save.version:
+                    del self._pending[save.document_id]
+                    self._undo.pop(save.document_id, None)
+                else:
+                    entry.base_version = save.version
+                    entry.base_content = save.content
+                    entry.content_hash = None
+            if conflicts and raise_on_conflict:
+                # The caller is told now; don't fail its next save as well.
+                self._lost.difference_update(conflicts)
+                raise VersionConflict
+            return len(saves)
+
+    async def flush_document(self, session: AsyncSession, doc_id: uuid.UUID, raise_on_conflict: bool = False) -> bool:
+        """Force-flush one document before it is read. True if anything was written."""
+        if doc_id not in self._pending:
+            return False
+        return await self.flush(session, [doc_id], raise_on_conflict) > 0
+
+    async def flush_all(self) -> int:
+        async with async_session() as session:
+            return await self.flush(session)
+
+    def due(self, idle: float, max_delay: float) -> list[uuid.UUID]:
+        now = time.monotonic()
+        return [
+            doc_id
+            for doc_id, entry in self._pending.items()
+            if now - entry.last_staged >= idle or now - entry.first_staged >= max_delay
+        ]
+
+    async def run(self, idle: float, max_delay: float):
+        while True:
+            await asyncio.sleep(min(idle, max_delay) / 2)
+            due = self.due(idle, max_delay)
+            if not due:
+                continue
+            try:
+                async with async_session() as session:
+                    await self.flush(session, due)
+            except Exception:
+                logger.exception("Document flush failed; will retry")
+
+
+document_saves = DocumentSaveBuffer()
@@ -0,0 +1,301 @@
+"""Content-addressed storage for files embedded in document content.
+
+The editor inlines uploaded images as ``data:`` URLs, which made document
+rows megabytes in size. On every write, ``extract_blobs`` moves each data
+URL into the blob store, keyed by the SHA-256 of its bytes (so the same
+image is stored once across documents and users), and replaces it with
+``/api/blobs/<hash>``. Blobs are immutable, so they can be cached forever.
+
+Blobs are served from the app's origin, so only raster images are served
+as what they claim to be (``IMAGE_TYPES``). Other data URLs stay inline,
+and any other stored file is served as an ``application/octet-stream``
+download.
+
+Content written before blobs existed is converted by the ``extract-blobs``
+job. ``prune-blobs`` deletes blobs that no document, shared content or
+revision refers to any more. Storing a blob again renews its
+``created_at``, and only blobs older than ``BLOB_GRACE`` are pruned, so a
+blob whose referencing save is still buffered in memory is kept.
+"""
+
+import asyncio
+import base64
+import binascii
+import hashlib
+import json
+import os
+import re
+import uuid
+import zlib
+from collections.abc import AsyncIterator
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any
+
+from sqlalchemy import String, cast, delete, update
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.config import settings
+from app.database import dialect_insert
+from app.models.blob import Blob
+from app.models.document import Document, DocumentContent
+from app.models.revision import DocumentRevision
+from app.services.contents import release_contents, store_content
+from app.services.history import SavedVersion, record_revisions
+from app.utils.tiptap import extract_text
+
+BLOB_URL_PREFIX = "/api/blobs/"
+EXTRACT_BATCH_SIZE = 100
+# No scripts in these: no HTML, no SVG.
+IMAGE_TYPES = frozenset({"image/png", "image/jpeg", "image/gif", "image/webp"})
+OPAQUE_TYPE = "application/octet-stream"
+# How long an unreferenced blob is kept before ``prune_blobs`` deletes it.
+BLOB_GRACE = timedelta(days=1)
+
+_BLOB_URL = re.compile(re.escape(BLOB_URL_PREFIX) + r"([0-9a-f]{64})")
+
+
+def blob_path(hash: str) -> Path:
+    return Path(settings.blob_dir) / hash[:2] / hash
+
+
+def safe_mime_type(mime_type: str | None) -> str:
+    """``mime_type`` if it is an allowed image type, else the opaque type."""
+    mime_type = (mime_type or "").strip().lower()
+    return mime_type if mime_type in IMAGE_TYPES else OPAQUE_TYPE
+
+
+def _decode_data_url(value: str) -> tuple[bytes, str] | None:
+    """``(bytes, mime_type)`` for a base64 image data URL, else ``None``."""
+    header, sep, payload = value.partition(",")
+    if not sep or not header.endswith(";base64"):
+        return None
+    mime_type = header[len("data:"):].split(";", 1)[0].strip().lower()
+    if mime_type not in IMAGE_TYPES:
+        return None
+    try:
+        return base64.b64decode(payload, validate=True), mime_type
+    except (binascii.Error, ValueError):
+        return None
+
+
+def _collect(node: Any, found: dict[str, tuple[bytes, str]]):
+    if isinstance(node, dict):
+        for value in node.values():
+            _collect(value, found)
+    elif isinstance(node, list):
+        for value in node:
+            _collect(value, found)
+    elif isinstance(node, str) and node.startswith("data:") and node not in found:
+        decoded = _decode_data_url(node)
+        if decoded is not None:
+            found[node] = decoded
+
+
+def _replace(node: Any, urls: dict[str, str]) -> Any:
+    if isinstance(node, dict):
+        return {key: _replace(value, urls) for key, value in node.items()}
+    if isinstance(node, list):
+        return [_replace(value, urls) for value in node]
+    if isinstance(node, str):
+        return urls.get(node, node)
+    return node
+
+
+def _write_file(path: Path, data: bytes):
+    if path.exists():
+        return
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f"{path.name}.{uuid.uuid4().hex}.tmp")
+    tmp.write_bytes(data)
+    os.replace(tmp, path)
+
+
+async def store_blob(session: AsyncSession, data: bytes, mime_type: str) -> str:
+    """Store ``data`` (once) and return its hash. The caller commits.
+
+    Anything but an allowed image type is recorded as the opaque type.
+    """
+    digest = hashlib.sha256(data).hexdigest()
+    stmt = dialect_insert(session, Blob).values(
+        hash=digest, mime_type=safe_mime_type(mime_type), size=len(data), created_at=datetime.utcnow(),
+    )
+    # Renewed, so ``prune_blobs`` keeps it. The row comes first: it waits
+    # for a prune deleting it to commit, and then the file is written again.
+    await session.exec(stmt.on_conflict_do_update(
+        index_elements=["hash"], set_={"created_at": stmt.excluded.created_at},
+    ))
+    await asyncio.to_thread(_write_file, blob_path(digest), data)
+    return digest
+
+
+async def extract_blobs(session: AsyncSession, content: Any) -> Any:
+    """Return ``content`` with every base64 data URL replaced by a blob URL.
+
+    ``content`` itself is not modified; when it holds no data URLs it is
+    returned as is.
+    """
+    found: dict[str, tuple[bytes, str]] = {}
+    _collect(content, found)
+    if not found:
+        return content
+    urls = {}
+    for data_url, (data, mime_type) in found.items():
+        urls[data_url] = BLOB_URL_PREFIX + await store_blob(session, data, mime_type)
+    return _replace(content, urls)
+
+
+async def extract_document_blobs(session: AsyncSession) -> int:
+    """Move data URLs out of existing content. Returns documents rewritten.
+
+    Covers documents' own content and shared ``document_contents`` rows.
+    Each rewrite is a save: the document's version goes up, its
+    ``search_text`` is refreshed and a revision is recorded, so clients
+    holding the old version get a conflict rather than overwriting it. A
+    document is rewritten only if its version is unchanged, so a concurrent
+    save is never overwritten; run the job again to pick those up.
+    """
+    return await _extract_own_content(session) + await _extract_shared_content(session)
+
+
+async def _extract_own_content(session: AsyncSession) -> int:
+    rewritten = 0
+    last_id: uuid.UUID | None = None
+    while True:
+        query = (
+            select(Document.id, Document.owner_id, Document.title, Document.version, Document.content)
+            .where(cast(Document.content, String).like('%"data:%'))
+            .order_by(Document.id)
+            .limit(EXTRACT_BATCH_SIZE)
+        )
+        if last_id is not None:
+            query = query.where(Document.id > last_id)
+        rows = (await session.exec(query)).all()
+        if not rows:
+            return rewritten
+        saves = []
+        for doc_id, owner_id, title, version, content in rows:
+            extracted = await extract_blobs(session, content)
+            if extracted is content:
+                continue
+            result = await session.exec(
+                update(Document)
+                .where(Document.id == doc_id, Document.version == version)
+                .values(content=extracted, version=version + 1, search_text=extract_text(extracted))
+                .execution_options(synchronize_session=False)
+            )
+            if result.rowcount:
+                saves.append(SavedVersion(
+                    document_id=doc_id, owner_id=owner_id, title=title, content=extracted,
+                    version=version + 1, base_version=version, base_content=content,
+                ))
+        await record_revisions(session, saves)
+        await session.commit()
+        rewritten += len(saves)
+        last_id = rows[-1][0]
+
+
+async def _extract_shared_content(session: AsyncSession) -> int:
+    """Store each shared content with data URLs under its new hash and repoint its documents."""
+    rewritten = 0
+    last_hash: str | None = None
+    while True:
+        query = (
+            select(DocumentContent.hash, DocumentContent.content)
+            .where(cast(DocumentContent.content, String).like('%"data:%'))
+            .order_by(DocumentContent.hash)
+            .limit(EXTRACT_BATCH_SIZE)
+        )
+        if last_hash is not None:
+            query = query.where(DocumentContent.hash > last_hash)
+        rows = (await session.exec(query)).all()
+        if not rows:
+            return rewritten
+        for digest, content in rows:
+            extracted = await extract_blobs(session, content)
+            if extracted is content:
+                continue
+            new_digest = await store_content(session, extracted, references=0)
+            moved = (await session.exec(
+                update(Document)
+                .where(Document.content_hash == digest)
+                .values(content_hash=new_digest, version=Document.version + 1, search_text=extract_text(extracted))
+                .returning(Document.id, Document.owner_id, Document.title, Document.version)
+                .execution_options(synchronize_session=False)
+            )).all()
+            await session.exec(
+                update(DocumentContent)
+                .where(DocumentContent.hash == new_digest)
+                .values(ref_count=DocumentContent.ref_count + len(moved))
+            )
+            await session.exec(
+                delete(DocumentContent).where(DocumentContent.hash == new_digest, DocumentContent.ref_count <= 0)
+            )
+            await release_contents(session, [digest] * len(moved))
+            await record_revisions(session, [
+                SavedVersion(
+                    document_id=doc_id, owner_id=owner_id, title=title, content=extracted,
+                    version=version, base_version=version - 1, base_content=content,
+                )
+                for doc_id, owner_id, title, version in moved
+            ])
+            rewritten += len(moved)
+        await session.commit()
+        last_hash = rows[-1][0]
+
+
+async def _scan(session: AsyncSession, key, value, *where) -> AsyncIterator[Any]:
+    """Every ``value`` of the rows matching ``where``, read in batches by ``key``."""
+    last = None
+    while True:
+        query = select(key, value).where(*where).order_by(key).limit(EXTRACT_BATCH_SIZE)
+        if last is not None:
+            query = query.where(key > last)
+        rows = (await session.exec(query)).all()
+        if not rows:
+            return
+        for _, found in rows:
+            yield found
+        last = rows[-1][0]
+
+
+async def _referenced_blobs(session: AsyncSession) -> set[str]:
+    referenced: set[str] = set()
+    pattern = f"%{BLOB_URL_PREFIX}%"
+    async for content in _scan(session, Document.id, Document.content, cast(Document.content, String).like(pattern)):
+        referenced.update(_BLOB_URL.findall(json.dumps(content)))
+    async for content in _scan(
+        session, DocumentContent.hash, DocumentContent.content, cast(DocumentContent.content, String).like(pattern),
+    ):
+        referenced.update(_BLOB_URL.findall(json.dumps(content)))
+    # Revisions are zlib-compressed JSON, snapshots and deltas alike.
+    async for data in _scan(session, DocumentRevision.id, DocumentRevision.data):
+        referenced.update(_BLOB_URL.findall(zlib.decompress(data).decode()))
+    return referenced
+
+
+async def prune_blobs(session: AsyncSession) -> int:
+    """Delete blobs nothing refers to that are older than ``BLOB_GRACE``. Returns blobs deleted."""
+    cutoff = datetime.utcnow() - BLOB_GRACE
+    referenced = await _referenced_blobs(session)
+    unreferenced = [
+        digest
+        async for digest in _scan(session, Blob.hash, Blob.hash.label("digest"), Blob.created_at < cutoff)
+        if digest not in referenced
+    ]
+    deleted = 0
+    for start in range(0, len(unreferenced), EXTRACT_BATCH_SIZE):
+        batch = unreferenced[start:start + EXTRACT_BATCH_SIZE]
+        # Renewed since the scan: stored again, so kept.
+        result = await session.exec(
+            delete(Blob).where(Blob.hash.in_(batch), Blob.created_at < cutoff).returning(Blob.hash)
+        )
+        gone = result.scalars().all()
+        # Before committing: a concurrent ``store_blob`` of the same bytes
+        # waits for the commit and then writes the file again.
+        for digest in gone:
+            await asyncio.to_thread(blob_path(digest).unlink, missing_ok=True)
+        await session.commit()
+        deleted += len(gone)
+    return deleted
@@ -0,0 +1,196 @@
+"""Real-time collaborative editing.
+
+Each document being edited live gets a ``CollabRoom`` that holds the
+authoritative content in memory and a bounded log of accepted steps. The
+protocol follows prosemirror-collab's central-authority model, with JSON
+Patch operations (``app.utils.json_patch``) as the steps:
+
+* a client sends ``{"type": "steps", "version": v, "client_id": c,
+  "ops": [...]}``; if ``v`` is the room's version the ops are applied and
+  broadcast to every connection, and the sender recognises its own
+  ``client_id`` as confirmation. Otherwise it is told its steps were
+  rejected, waits for the ones it is missing, rebases and resends;
+* on (re)connect a client passes the ``room`` id and the last ``version``
+  it saw and receives only the steps after it, or a snapshot when those
+  have left the log or the room was recreated.
+
+Rooms checkpoint their content through ``document_saves`` every
+``settings.collab_checkpoint_seconds`` and when the last editor leaves.
+While a room is open, REST writes to the content are refused. Rooms live
+in one process, so all connections for a document must reach the same
+worker.
+"""
+
+import asyncio
+import copy
+import logging
+import uuid
+from collections import deque
+from dataclasses import dataclass
+from typing import Any
+
+from fastapi import WebSocket
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.config import settings
+from app.database import async_session
+from app.models.document import Document
+from app.services.autosave import PendingSave, document_saves
+from app.services.blobs import extract_blobs
+from app.services.contents import resolve_content
+from app.utils.json_patch import JsonPatchError, apply_patch
+
+logger = logging.getLogger(__name__)
+
+STEP_LOG_SIZE = 1000
+
+
+@dataclass
+class Step:
+    version: int
+    client_id: str
+    ops: list[dict[str, Any]]
+
+    def as_message(self) -> dict:
+        return {"version": self.version, "client_id": self.client_id, "ops": self.ops}
+
+
+class CollabRoom:
+    def __init__(self, doc_id: uuid.UUID, owner_id: uuid.UUID, content: dict[str, Any]):
+        self.id = uuid.uuid4().hex
+        self.doc_id = doc_id
+        self.owner_id = owner_id
+        self.content = copy.deepcopy(content)
+        self.version = 0
+        self.connections: set[WebSocket] = set()
+        self.steps: deque[Step] = deque(maxlen=STEP_LOG_SIZE)
+        self.lock = asyncio.Lock()
+        # Last checkpointed state (never mutated) and the steps since, so a
+        # patch that fails halfway can be undone by replaying.
+        self._saved_content = content
+        self._saved_version = 0
+        self._unsaved: list[Step] = []
+
+    def hello(self, room_id: str | None, since: int | None) -> dict:
+        """First message for a connection: missed steps, or a snapshot."""
+        oldest = self.steps[0].version if self.steps else self.version + 1
+        if room_id == self.id and since is not None and oldest - 1 <= since <= self.version:
+            return {
+                "type": "steps",
+                "room": self.id,
+                "version": self.version,
+                "steps": [step.as_message() for step in self.steps if step.version > since],
+            }
+        return {"type": "snapshot", "room": self.id, "version": self.version, "content": self.content}
+
+    def receive(self, version: int, client_id: str, ops: list[dict[str, Any]]) -> dict | None:
+        """Apply a client's ops on top of ``version``.
+
+        Returns the message to broadcast, or ``None`` if ``version`` is stale.
+        Raises ``JsonPatchError`` (leaving the room unchanged) for bad ops.
+        """
+        if version != self.version:
+            return None
+        # Patching puts op values into the content by reference; the logged
+        # steps must not change when later steps edit inside those values.
+        ops = copy.deepcopy(ops)
+        try:
+            self.content = apply_patch(self.content, copy.deepcopy(ops))
+        except JsonPatchError:
+            self.content = copy.deepcopy(self._saved_content)
+            for step in self._unsaved:
+                self.content = apply_patch(self.content, copy.deepcopy(step.ops))
+            raise
+        self.version += 1
+        step = Step(self.version, client_id, ops)
+        self.steps.append(step)
+        self._unsaved.append(step)
+        return {"type": "steps", "room": self.id, "version": self.version, "steps": [step.as_message()]}
+
+    async def checkpoint(self, session: AsyncSession) -> bool:
+        """Save the current content as a normal document save, if it changed."""
+        if self._saved_version == self.version:
+            return False
+        version, content, saved_steps = self.version, copy.deepcopy(self.content), len(self._unsaved)
+        stored = await extract_blobs(session, content)
+
+        def edit(entry: PendingSave):
+            entry.content = stored
+
+        if await document_saves.stage(session, self.doc_id, self.owner_id, None, edit) is None:
+            return False  # deleted meanwhile
+        if settings.document_write_behind:
+            await session.commit()
+        else:
+            await document_saves.flush_document(session, self.doc_id)
+        self._saved_content, self._saved_version = content, version
+        del self._unsaved[:saved_steps]
+        return True
+
+    async def broadcast(self, message: dict):
+        async with self.lock:
+            await asyncio.gather(
+                *(connection.send_json(message) for connection in list(self.connections)),
+                return_exceptions=True,
+            )
+
+
+class CollabHub:
+    """Open rooms in this process, by document id."""
+
+    def __init__(self):
+        self._rooms: dict[uuid.UUID, CollabRoom] = {}
+
+    def __contains__(self, doc_id: uuid.UUID) -> bool:
+        return doc_id in self._rooms
+
+    def owned_by(self, owner_id: uuid.UUID) -> list[uuid.UUID]:
+        return [doc_id for doc_id, room in self._rooms.items() if room.owner_id == owner_id]
+
+    def get(self, doc_id: uuid.UUID) -> CollabRoom | None:
+        return self._rooms.get(doc_id)
+
+    async def join(self, session: AsyncSession, doc: Document, websocket: WebSocket) -> CollabRoom:
+        room = self._rooms.get(doc.id)
+        if room is None:
+            # Start from the latest saved state, including buffered saves.
+            if await document_saves.flush_document(session, doc.id):
+                await session.refresh(doc)
+            await resolve_content(session, doc)
+            room = self._rooms.setdefault(doc.id, CollabRoom(doc.id, doc.owner_id, doc.content))
+        room.connections.add(websocket)
+        return room
+
+    async def leave(self, session: AsyncSession, room: CollabRoom, websocket: WebSocket):
+        room.connections.discard(websocket)
+        if room.connections:
+            return
+        try:
+            await room.checkpoint(session)
+        finally:
+            if not room.connections and self._rooms.get(room.doc_id) is room:
+                del self._rooms[room.doc_id]
+
+    async def checkpoint(self, session: AsyncSession, doc_id: uuid.UUID) -> bool:
+        room = self._rooms.get(doc_id)
+        return await room.checkpoint(session) if room else False
+
+    async def checkpoint_all(self, session: AsyncSession | None = None) -> int:
+        if session is None:
+            async with async_session() as own_session:
+                return await self.checkpoint_all(own_session)
+        saved = 0
+        for room in list(self._rooms.values()):
+            saved += await room.checkpoint(session)
+        return saved
+
+    async def run(self, interval: float):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.checkpoint_all()
+            except Exception:
+                logger.exception("Collaboration checkpoint failed; will retry")
+
+
+collab_hub = CollabHub()
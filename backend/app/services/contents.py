@@ -0,0 +1,85 @@
+"""Copy-on-write document content.
+
+Copying a shared document does not duplicate its JSON. The first copy
+moves the original's content into ``document_contents`` (keyed by content
+hash, so identical content is stored once) and both documents point at
+it; later copies only add a reference. A document gets its own content
+back on its first save (see ``app.services.autosave``), releasing its
+reference; rows nobody references are deleted.
+"""
+
+import hashlib
+import json
+from datetime import datetime
+from typing import Any
+
+from sqlalchemy import bindparam, delete, func, select, update
+from sqlalchemy.orm.attributes import set_committed_value
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.database import dialect_insert
+from app.models.document import Document, DocumentContent
+
+_table = DocumentContent.__table__
+
+
+def content_hash(content: dict[str, Any]) -> str:
+    canonical = json.dumps(content, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+async def resolve_content(session: AsyncSession, doc: Document) -> Document:
+    """Load shared content into ``doc.content`` without marking it changed."""
+    if doc.content_hash is not None:
+        result = await session.exec(select(_table.c.content).where(_table.c.hash == doc.content_hash))
+        set_committed_value(doc, "content", result.scalar_one())
+    return doc
+
+
+async def store_content(session: AsyncSession, content: dict[str, Any], references: int) -> str:
+    """Store ``content`` once with ``references`` more references. Returns its hash."""
+    digest = content_hash(content)
+    stmt = dialect_insert(session, DocumentContent).values(
+        hash=digest, content=content, ref_count=references, created_at=datetime.utcnow(),
+    )
+    await session.exec(
+        stmt.on_conflict_do_update(
+            index_elements=["hash"],
+            set_={"ref_count": _table.c.ref_count + stmt.excluded.ref_count},
+        )
+    )
+    return digest
+
+
+async def add_reference(session: AsyncSession, digest: str) -> bool:
+    """Reference already-stored content; False if it is gone."""
+    result = await session.exec(
+        update(_table).where(_table.c.hash == digest).values(ref_count=_table.c.ref_count + 1)
+    )
+    return result.rowcount > 0
+
+
+async def release_contents(session: AsyncSession, digests: list[str]):
+    """Drop one reference per entry in ``digests`` (repeats allowed)."""
+    if not digests:
+        return
+    conn = await session.connection()
+    await conn.execute(
+        update(_table).where(_table.c.hash == bindparam("b_hash")).values(ref_count=_table.c.ref_count - 1),
+        [{"b_hash": digest} for digest in digests],
+    )
+    await session.exec(delete(_table).where(_table.c.hash.in_(set(digests)), _table.c.ref_count <= 0))
+
+
+async def reconcile_content_refs(session: AsyncSession) -> int:
+    """Recompute reference counts and delete unreferenced content. Returns rows fixed."""
+    refs = (
+        select(func.count())
+        .select_from(Document)
+        .where(Document.content_hash == _table.c.hash)
+        .scalar_subquery()
+    )
+    updated = await session.exec(update(_table).where(_table.c.ref_count != refs).values(ref_count=refs))
+    deleted = await session.exec(delete(_table).where(_table.c.ref_count <= 0))
+    await session.commit()
+    return updated.rowcount + deleted.rowcount
@@ -0,0 +1,263 @@
+"""Denormalized counters on publications (likes, comments) and users
+(followers, following, publications).
+
+Counters are changed with a single ``UPDATE ... SET col = col + :delta``
+so concurrent likes never lose updates and the publication row is never
+read into Python. The like row itself is toggled with
+``INSERT ... ON CONFLICT DO NOTHING`` / ``DELETE ... RETURNING``, and the
+counter only moves when that statement actually changed a row.
+
+With ``settings.counter_write_behind`` the deltas are summed in memory
+(only once the surrounding transaction commits) and flushed in batches by
+``counter_buffer.run()``; ``reconcile_publication_counters`` recomputes
+everything from the source tables, but only while write-behind is off.
+"""
+
+import asyncio
+import logging
+import uuid
+from collections import defaultdict
+from datetime import datetime
+
+from sqlalchemy import bindparam, delete, event, func, or_, select, update
+from sqlalchemy.orm import Session
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.config import settings
+from app.database import async_session, dialect_insert
+from app.models.follow import Follow
+from app.models.publication import Publication, PublicationComment, PublicationLike
+from app.models.user import User
+
+logger = logging.getLogger(__name__)
+
+COUNTER_FIELDS = ("like_count", "comment_count")
+
+_PENDING_KEY = "pending_counter_deltas"
+
+
+class CounterBuffer:
+    """In-memory accumulator of committed counter deltas, flushed in batches."""
+
+    def __init__(self):
+        self._deltas: dict[uuid.UUID, dict[str, int]] = defaultdict(lambda: dict.fromkeys(COUNTER_FIELDS, 0))
+        self._lock = asyncio.Lock()
+
+    def add(self, pub_id: uuid.UUID, field: str, delta: int):
+        self._deltas[pub_id][field] += delta
+
+    def pending(self, pub_id: uuid.UUID, field: str) -> int:
+        entry = self._deltas.get(pub_id)
+        return entry[field] if entry else 0
+
+    async def flush(self, session: AsyncSession | None = None) -> int:
+        """Write all buffered deltas in one batched UPDATE. Returns rows touched.
+
+        When ``session`` is given the UPDATE joins its transaction and the
+        caller commits; otherwise a dedicated session is used.
+        """
+        async with self._lock:
+            deltas, self._deltas = self._deltas, defaultdict(lambda: dict.fromkeys(COUNTER_FIELDS, 0))
+            rows = [
+                {"b_id": pub_id, "b_like": d["like_count"], "b_comment": d["comment_count"]}
+                for pub_id, d in deltas.items()
+                if d["like_count"] or d["comment_count"]
+            ]
+            if not rows:
+                return 0
+            table = Publication.__table__
+            stmt = (
+                update(table)
+                .where(table.c.id == bindparam("b_id"))
+                .values(
+                    like_count=table.c.like_count + bindparam("b_like"),
+                    comment_count=table.c.comment_count + bindparam("b_comment"),
+                )
+            )
+            try:
+                if session is not None:
+                    conn = await session.connection()
+                    await conn.execute(stmt, rows)
+                else:
+                    async with async_session() as own_session:
+                        conn = await own_session.connection()
+                        await conn.execute(stmt, rows)
+                        await own_session.commit()
+            except BaseException:
+                # Put the deltas back so the next flush retries them, also
+                # when the flush is cancelled (shutdown).
+                for row in rows:
+                    self.add(row["b_id"], "like_count", row["b_like"])
+                    self.add(row["b_id"], "comment_count", row["b_comment"])
+                raise
+            return len(rows)
+
+    async def run(self, interval: float):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.flush()
+            except Exception:
+                logger.exception("Counter flush failed; will retry")
+
+
+counter_buffer = CounterBuffer()
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_pending_deltas(session: Session):
+    for pub_id, field, delta in session.info.pop(_PENDING_KEY, ()):
+        counter_buffer.add(pub_id, field, delta)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_pending_deltas(session: Session):
+    session.info.pop(_PENDING_KEY, None)
+
+
+async def bump(session: AsyncSession, pub_id: uuid.UUID, field: str, delta: int) -> int | None:
+    """Add ``delta`` to a publication counter and return its new value.
+
+    A zero ``delta`` only reads the current value. Returns ``None`` when the
+    publication does not exist.
+    """
+    column = getattr(Publication, field)
+    if delta and not settings.counter_write_behind:
+        result = await session.exec(
+            update(Publication)
+            .where(Publication.id == pub_id)
+            .values({field: column + delta})
+            .returning(column)
+        )
+        return result.scalar_one_or_none()
+
+    result = await session.exec(select(column).where(Publication.id == pub_id))
+    current = result.scalar_one_or_none()
+    if current is None:
+        return None
+    pending = session.sync_session.info.setdefault(_PENDING_KEY, [])
+    if delta:
+        pending.append((pub_id, field, delta))
+    in_txn = sum(d for p, f, d in pending if p == pub_id and f == field)
+    return max(0, current + counter_buffer.pending(pub_id, field) + in_txn)
+
+
+async def bump_user(session: AsyncSession, user_id: uuid.UUID, field: str, delta: int) -> int | None:
+    """Add ``delta`` to a user counter in the current transaction.
+
+    User counters are never write-behind: the profile page reads them
+    straight after a follow. Returns ``None`` when the user does not exist.
+    """
+    column = getattr(User, field)
+    result = await session.exec(
+        update(User)
+        .where(User.id == user_id)
+        .values({field: column + delta})
+        .returning(column)
+    )
+    return result.scalar_one_or_none()
+
+
+async def add_like(session: AsyncSession, pub_id: uuid.UUID, user_id: uuid.UUID) -> bool:
+    """Insert a like row; False if the user had already liked the publication."""
+    stmt = (
+        dialect_insert(session, PublicationLike)
+        .values(id=uuid.uuid4(), publication_id=pub_id, user_id=user_id, created_at=datetime.utcnow())
+        .on_conflict_do_nothing(index_elements=["publication_id", "user_id"])
+        .returning(PublicationLike.id)
+    )
+    result = await session.exec(stmt)
+    return result.scalar_one_or_none() is not None
+
+
+async def remove_like(session: AsyncSession, pub_id: uuid.UUID, user_id: uuid.UUID) -> bool:
+    """Delete a like row; False if there was nothing to delete."""
+    result = await session.exec(
+        delete(PublicationLike)
+        .where(
+            PublicationLike.publication_id == pub_id,
+            PublicationLike.user_id == user_id,
+        )
+        .returning(PublicationLike.id)
+    )
+    return result.scalar_one_or_none() is not None
+
+
+async def reconcile_publication_counters(session: AsyncSession) -> int:
+    """Recompute like/comment counts from the source tables. Returns rows fixed.
+
+    Refuses to run with ``counter_write_behind``: deltas still buffered in
+    the API workers would be added on top of the recomputed counts. Turn
+    write-behind off (or stop the API) first.
+    """
+    if settings.counter_write_behind:
+        raise RuntimeError("Counter write-behind is on; disable it or stop the API before reconciling")
+    likes = (
+        select(func.count())
+        .select_from(PublicationLike)
+        .where(PublicationLike.publication_id == Publication.id)
+        .scalar_subquery()
+    )
+    comments = (
+        select(func.count())
+        .select_from(PublicationComment)
+        .where(PublicationComment.publication_id == Publication.id)
+        .scalar_subquery()
+    )
+    result = await session.exec(
+        update(Publication)
+        .where(or_(Publication.like_count != likes, Publication.comment_count != comments))
+        .values(like_count=likes, comment_count=comments)
+        .execution_options(synchronize_session=False)
+    )
+    await session.commit()
+    return result.rowcount
+
+
+async def add_follow(session: AsyncSession, follower_id: uuid.UUID, following_id: uuid.UUID) -> bool:
+    """Insert a follow row; False if it already existed."""
+    stmt = (
+        dialect_insert(session, Follow)
+        .values(id=uuid.uuid4(), follower_id=follower_id, following_id=following_id, created_at=datetime.utcnow())
+        .on_conflict_do_nothing(index_elements=["follower_id", "following_id"])
+        .returning(Follow.id)
+    )
+    result = await session.exec(stmt)
+    return result.scalar_one_or_none() is not None
+
+
+async def remove_follow(session: AsyncSession, follower_id: uuid.UUID, following_id: uuid.UUID) -> bool:
+    """Delete a follow row; False if there was nothing to delete."""
+    result = await session.exec(
+        delete(Follow)
+        .where(Follow.follower_id == follower_id, Follow.following_id == following_id)
+        .returning(Follow.id)
+    )
+    return result.scalar_one_or_none() is not None
+
+
+async def reconcile_user_counters(session: AsyncSession) -> int:
+    """Recompute follower/following/publication counts. Returns rows fixed."""
+    followers = (
+        select(func.count()).select_from(Follow).where(Follow.following_id == User.id).scalar_subquery()
+    )
+    following = (
+        select(func.count()).select_from(Follow).where(Follow.follower_id == User.id).scalar_subquery()
+    )
+    publications = (
+        select(func.count()).select_from(Publication).where(Publication.author_id == User.id).scalar_subquery()
+    )
+    result = await session.exec(
+        update(User)
+        .where(
+            or_(
+                User.follower_count != followers,
+                User.following_count != following,
+                User.publication_count != publications,
+            )
+        )
+        .values(follower_count=followers, following_count=following, publication_count=publications)
+        .execution_options(synchronize_session=False)
+    )
+    await session.commit()
+    return result.rowcount
@@ -0,0 +1,30 @@
+"""Creating documents.
+
+Every way a document comes into being (the editor, ZIP and Drive imports)
+goes through ``add_document``, so each new document has its inline
+images moved to blobs and its first revision recorded.
+"""
+
+import uuid
+from typing import Any
+
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.models.document import Document
+from app.services.blobs import extract_blobs
+from app.services.history import SavedVersion, record_revisions
+from app.utils.tiptap import extract_text
+
+
+async def add_document(
+    session: AsyncSession, owner_id: uuid.UUID, title: str, content: dict[str, Any] | None, **fields: Any,
+) -> Document:
+    """Add a document and its first revision; the caller commits."""
+    content = await extract_blobs(session, content)
+    doc = Document(owner_id=owner_id, title=title, content=content, search_text=extract_text(content), **fields)
+    session.add(doc)
+    await session.flush()
+    await record_revisions(session, [
+        SavedVersion(document_id=doc.id, owner_id=owner_id, title=title, content=content, version=doc.version)
+    ])
+    return doc
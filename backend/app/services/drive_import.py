@@ -0,0 +1,71 @@
+"""Importing many Google Docs as one background job.
+
+The names of all files come from one Drive batch request. The exports run
+concurrently, at most ``settings.drive_import_concurrency`` at a time,
+each streamed through ``DocHtmlParser`` into editor JSON. Documents are
+saved as exports finish, and the job's ``result`` lists every file's
+outcome so far, so a client polling the job sees per-file progress.
+"""
+
+import asyncio
+from typing import Any
+
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.config import settings
+from app.models.job import Job
+from app.services.documents import add_document
+from app.services.google_drive import DriveError, drive_client
+from app.services.jobs import report_progress
+from app.utils.google_html import DocHtmlParser
+
+
+async def convert_drive_file(refresh_token: str, file_id: str) -> dict[str, Any]:
+    """Editor JSON for a Google Doc, parsed while it downloads."""
+    parser = DocHtmlParser()
+    await drive_client.export_html(refresh_token, file_id, parser.feed)
+    return parser.close()
+
+
+async def import_drive_files(
+    session: AsyncSession, job: Job, refresh_token: str, file_ids: list[str],
+) -> dict[str, Any]:
+    file_ids = list(dict.fromkeys(file_ids))
+    names = await drive_client.file_names(refresh_token, file_ids)
+    files: list[dict[str, Any]] = []
+    await report_progress(session, job, 0, total=len(file_ids))
+
+    semaphore = asyncio.Semaphore(settings.drive_import_concurrency)
+
+    async def convert(file_id: str) -> tuple[str, dict[str, Any] | None, str | None]:
+        if file_id not in names:
+            return file_id, None, "File not found"
+        async with semaphore:
+            try:
+                return file_id, await convert_drive_file(refresh_token, file_id), None
+            except DriveError as exc:
+                return file_id, None, str(exc)
+
+    tasks = [asyncio.create_task(convert(file_id)) for file_id in file_ids]
+    try:
+        # Exports only do HTTP; the session is used here, one save at a time.
+        for done, finished in enumerate(asyncio.as_completed(tasks), start=1):
+            file_id, content, error = await finished
+            entry: dict[str, Any] = {"file_id": file_id, "name": names.get(file_id)}
+            if content is None:
+                entry["error"] = error
+            else:
+                title = (names[file_id] or "Untitled")[:255]
+                doc = await add_document(session, job.owner_id, title, content, google_drive_file_id=file_id)
+                entry["document_id"] = str(doc.id)
+            files.append(entry)
+            # A new dict each time: the JSON column doesn't track in-place changes.
+            job.result = {"files": list(files)}
+            await report_progress(session, job, done)
+    finally:
+        for task in tasks:
+            task.cancel()
+    return {
+        "files": files,
+        "document_ids": [entry["document_id"] for entry in files if "document_id" in entry],
+    }
@@ -0,0 +1,176 @@
+"""A local index of each user's Google Docs, so listing them needs no call to Google.
+
+The first sync lists the whole Drive, page by page, after taking a start
+token for the changes feed. Later syncs read only the changes since the
+stored token. A sync runs at most once per
+``settings.drive_sync_interval_seconds`` per user; the listing endpoint
+serves from the index and refreshes it in the background when it is older
+than that. If Google no longer accepts the stored token, the index is
+rebuilt from a full listing.
+
+A full listing commits each page as it arrives, so no transaction stays
+open across calls to Google. It first drops the index and its sync state,
+and writes the state last: until then the listing endpoint sees no index
+and syncs before answering.
+
+Syncs for one user are serialized with a per-process lock. Across
+workers two syncs may overlap, which is harmless: both apply the same
+changes, and upserts are idempotent.
+"""
+
+import asyncio
+import contextlib
+import logging
+import uuid
+from collections.abc import AsyncIterator
+from datetime import datetime, timedelta, timezone
+from typing import Any
+
+from sqlalchemy import delete
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.config import settings
+from app.database import async_session, dialect_insert
+from app.models.drive_file import DriveFile, DriveSyncState
+from app.services.google_drive import GOOGLE_DOC, DriveError, drive_client
+
+logger = logging.getLogger(__name__)
+
+# Statuses Drive answers an expired or unknown page token with.
+_INVALID_TOKEN_STATUSES = {400, 404, 410}
+
+# Sync lock per user, with the number of syncs holding or waiting for it.
+_locks: dict[uuid.UUID, tuple[asyncio.Lock, int]] = {}
+
+
+@contextlib.asynccontextmanager
+async def _locked(owner_id: uuid.UUID) -> AsyncIterator[None]:
+    """Hold ``owner_id``'s sync lock; it is dropped once nobody needs it."""
+    lock, users = _locks.get(owner_id, (None, 0))
+    lock = lock or asyncio.Lock()
+    _locks[owner_id] = (lock, users + 1)
+    try:
+        async with lock:
+            yield
+    finally:
+        lock, users = _locks[owner_id]
+        if users == 1:
+            del _locks[owner_id]
+        else:
+            _locks[owner_id] = (lock, users - 1)
+
+
+def _modified_time(value: str | None) -> datetime:
+    if not value:
+        return datetime.utcnow()
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+def is_stale(state: DriveSyncState) -> bool:
+    return datetime.utcnow() - state.synced_at >= timedelta(seconds=settings.drive_sync_interval_seconds)
+
+
+async def _upsert(session: AsyncSession, owner_id: uuid.UUID, files: list[dict[str, Any]]):
+    if not files:
+        return
+    stmt = dialect_insert(session, DriveFile).values([
+        {
+            "id": uuid.uuid4(),
+            "owner_id": owner_id,
+            "file_id": file["id"],
+            "name": file.get("name", "")[:1024],
+            "modified_time": _modified_time(file.get("modifiedTime")),
+        }
+        for file in files
+    ])
+    await session.exec(stmt.on_conflict_do_update(
+        index_elements=["owner_id", "file_id"],
+        set_={"name": stmt.excluded.name, "modified_time": stmt.excluded.modified_time},
+    ))
+
+
+async def _full_sync(session: AsyncSession, owner_id: uuid.UUID, refresh_token: str) -> str:
+    # Taken first, so changes made while listing are applied on the next sync.
+    start_token = await drive_client.start_page_token(refresh_token)
+    await forget_drive_index(session, owner_id)
+    await session.commit()
+    page_token = None
+    while True:
+        page = await drive_client.list_files(refresh_token, page_token)
+        await _upsert(session, owner_id, page.get("files", []))
+        await session.commit()
+        page_token = page.get("nextPageToken")
+        if not page_token:
+            return start_token
+
+
+async def _apply_changes(session: AsyncSession, owner_id: uuid.UUID, refresh_token: str, page_token: str) -> str:
+    while True:
+        page = await drive_client.list_changes(refresh_token, page_token)
+        changed: dict[str, dict[str, Any]] = {}
+        removed: set[str] = set()
+        for change in page.get("changes", []):
+            if change.get("changeType", "file") != "file":
+                continue
+            file = change.get("file") or {}
+            # Later changes to the same file in a page win.
+            if change.get("removed") or file.get("trashed") or file.get("mimeType") != GOOGLE_DOC:
+                removed.add(change["fileId"])
+                changed.pop(change["fileId"], None)
+            else:
+                changed[change["fileId"]] = file
+                removed.discard(change["fileId"])
+        if removed:
+            await session.exec(
+                delete(DriveFile).where(DriveFile.owner_id == owner_id, DriveFile.file_id.in_(removed))
+            )
+        await _upsert(session, owner_id, list(changed.values()))
+        if "newStartPageToken" in page:
+            return page["newStartPageToken"]
+        page_token = page["nextPageToken"]
+
+
+async def sync_drive_index(session: AsyncSession, owner_id: uuid.UUID, refresh_token: str, force: bool = False):
+    """Bring ``owner_id``'s index up to date, unless it was synced recently."""
+    async with _locked(owner_id):
+        state = await session.get(DriveSyncState, owner_id, populate_existing=True)
+        if state is not None and not force and not is_stale(state):
+            return
+        try:
+            if state is None:
+                token = await _full_sync(session, owner_id, refresh_token)
+            else:
+                token = await _apply_changes(session, owner_id, refresh_token, state.page_token)
+        except DriveError as exc:
+            if state is None or exc.status_code not in _INVALID_TOKEN_STATUSES:
+                await session.rollback()
+                raise
+            logger.info("Drive page token for %s no longer valid; rebuilding index", owner_id)
+            await session.rollback()
+            token = await _full_sync(session, owner_id, refresh_token)
+        stmt = dialect_insert(session, DriveSyncState).values(
+            owner_id=owner_id, page_token=token, synced_at=datetime.utcnow(),
+        )
+        await session.exec(stmt.on_conflict_do_update(
+            index_elements=["owner_id"],
+            set_={"page_token": stmt.excluded.page_token, "synced_at": stmt.excluded.synced_at},
+        ))
+        await session.commit()
+
+
+async def refresh_drive_index(owner_id: uuid.UUID, refresh_token: str):
+    """``sync_drive_index`` as a background task, in a session of its own."""
+    try:
+        async with async_session() as session:
+            await sync_drive_index(session, owner_id, refresh_token)
+    except DriveError as exc:
+        logger.warning("Background Drive sync for %s failed: %s", owner_id, exc)
+
+
+async def forget_drive_index(session: AsyncSession, owner_id: uuid.UUID):
+    """Drop the index, e.g. when the user connects a different Google account."""
+    await session.exec(delete(DriveFile).where(DriveFile.owner_id == owner_id))
+    await session.exec(delete(DriveSyncState).where(DriveSyncState.owner_id == owner_id))
@@ -0,0 +1,45 @@
+"""Per-user high-water marks for the "new posts since" feed probe.
+
+After a probe hits the database, the newest ``(created_at, id)`` visible in
+the user's feed is remembered for ``feed_probe_ttl_seconds``. A repeat
+probe from a client already at that mark is answered from memory unless
+this worker has accepted a new publication since. Publications created on
+other workers become visible once the mark expires, so the staleness is
+bounded by the TTL.
+"""
+
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+
+MAX_TRACKED_USERS = 10_000
+
+
+class FeedWatermarks:
+    def __init__(self, max_users: int = MAX_TRACKED_USERS):
+        self._marks: OrderedDict[uuid.UUID, tuple[float, tuple[datetime, uuid.UUID]]] = OrderedDict()
+        self._max_users = max_users
+        self._last_publish = 0.0
+
+    def publication_created(self):
+        self._last_publish = time.monotonic()
+
+    def is_current(self, user_id: uuid.UUID, since: tuple[datetime, uuid.UUID], ttl: float) -> bool:
+        """True when ``since`` is known to be the newest item in the user's feed."""
+        entry = self._marks.get(user_id)
+        if entry is None:
+            return False
+        checked_at, newest = entry
+        if time.monotonic() - checked_at > ttl or self._last_publish >= checked_at:
+            return False
+        return since >= newest
+
+    def record(self, user_id: uuid.UUID, newest: tuple[datetime, uuid.UUID]):
+        self._marks[user_id] = (time.monotonic(), newest)
+        self._marks.move_to_end(user_id)
+        while len(self._marks) > self._max_users:
+            self._marks.popitem(last=False)
+
+
+feed_watermarks = FeedWatermarks()
@@ -1,34 +1,239 @@
-from googleapiclient.discovery import build
-from googleapiclient.http import MediaInMemoryUpload
-from google.oauth2.credentials import Credentials
+"""Google Drive client.
 
+Calls the Drive v3 REST API directly over one pooled ``httpx.AsyncClient``
+instead of ``googleapiclient``, whose ``build()`` loaded the discovery
+document on every call and whose requests (like the OAuth token refresh)
+blocked the event loop. Access tokens are cached per refresh token until
+shortly before they expire, and concurrent refreshes for the same user
+share one request.
+"""
 
-def list_drive_files(credentials: Credentials) -> list[dict]:
-    service = build("drive", "v3", credentials=credentials)
-    results = service.files().list(
-        q="mimeType='application/vnd.google-apps.document'",
-        fields="files(id, name, modifiedTime)",
-        orderBy="modifiedTime desc",
-        pageSize=50,
-    ).execute()
-    return results.get("files", [])
+import asyncio
+import email.parser
+import email.policy
+import hashlib
+import json
+import time
+import uuid
+from typing import Callable
+from urllib.parse import quote
 
+import httpx
 
-def export_google_doc_as_html(credentials: Credentials, file_id: str) -> str:
-    service = build("drive", "v3", credentials=credentials)
-    content = service.files().export(fileId=file_id, mimeType="text/html").execute()
-    return content.decode("utf-8") if isinstance(content, bytes) else content
+from app.config import settings
 
+DRIVE_API = "https://www.googleapis.com/drive/v3"
+UPLOAD_API = "https://www.googleapis.com/upload/drive/v3"
+BATCH_API = "https://www.googleapis.com/batch/drive/v3"
+TOKEN_URI = "https://oauth2.googleapis.com/token"
+GOOGLE_DOC = "application/vnd.google-apps.document"
 
-def get_file_name(credentials: Credentials, file_id: str) -> str:
-    service = build("drive", "v3", credentials=credentials)
-    file = service.files().get(fileId=file_id, fields="name").execute()
-    return file["name"]
+# Refresh this long before Google's stated expiry.
+TOKEN_EXPIRY_MARGIN_SECONDS = 60
+# Most calls Drive accepts in one batch request.
+BATCH_LIMIT = 100
+# Largest page files.list and changes.list return.
+PAGE_SIZE = 1000
 
 
-def create_google_doc(credentials: Credentials, title: str, html_content: str) -> str:
-    service = build("drive", "v3", credentials=credentials)
-    file_metadata = {"name": title, "mimeType": "application/vnd.google-apps.document"}
-    media = MediaInMemoryUpload(html_content.encode("utf-8"), mimetype="text/html")
-    file = service.files().create(body=file_metadata, media_body=media, fields="id").execute()
-    return file["id"]
+class DriveError(Exception):
+    """Google answered with an error."""
+
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+
+
+class DriveAuthError(DriveError):
+    """The refresh token was revoked or is invalid; the user must reconnect."""
+
+
+class DriveClient:
+    def __init__(self, transport: httpx.AsyncBaseTransport | None = None):
+        self._transport = transport
+        self._http: httpx.AsyncClient | None = None
+        self._tokens: dict[str, tuple[str, float]] = {}
+        self._refreshing: dict[str, asyncio.Task] = {}
+
+    @property
+    def http(self) -> httpx.AsyncClient:
+        if self._http is None:
+            self._http = httpx.AsyncClient(
+                transport=self._transport,
+                timeout=httpx.Timeout(30.0, connect=5.0),
+                limits=httpx.Limits(max_connections=50, max_keepalive_connections=10),
+            )
+        return self._http
+
+    async def aclose(self):
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
+
+    @staticmethod
+    def _key(refresh_token: str) -> str:
+        return hashlib.sha256(refresh_token.encode()).hexdigest()
+
+    async def access_token(self, refresh_token: str) -> str:
+        key = self._key(refresh_token)
+        cached = self._tokens.get(key)
+        if cached and cached[1] > time.monotonic():
+            return cached[0]
+        task = self._refreshing.get(key)
+        if task is None:
+            task = asyncio.create_task(self._refresh(key, refresh_token))
+            self._refreshing[key] = task
+            task.add_done_callback(lambda _: self._refreshing.pop(key, None))
+        return await asyncio.shield(task)
+
+    async def _refresh(self, key: str, refresh_token: str) -> str:
+        response = await self.http.post(TOKEN_URI, data={
+            "grant_type": "refresh_token",
+            "refresh_token": refresh_token,
+            "client_id": settings.google_client_id,
+            "client_secret": settings.google_client_secret,
+        })
+        if response.status_code in (400, 401):
+            raise DriveAuthError(response.status_code, "Google Drive access was revoked")
+        if response.is_error:
+            raise DriveError(response.status_code, "Google token refresh failed")
+        data = response.json()
+        now = time.monotonic()
+        expires_at = now + max(0, data.get("expires_in", 3600) - TOKEN_EXPIRY_MARGIN_SECONDS)
+        self._tokens = {k: v for k, v in self._tokens.items() if v[1] > now}
+        self._tokens[key] = (data["access_token"], expires_at)
+        return data["access_token"]
+
+    async def _request(
+        self,
+        refresh_token: str,
+        method: str,
+        url: str,
+        headers: dict[str, str] | None = None,
+        stream: bool = False,
+        **kwargs,
+    ) -> httpx.Response:
+        """Send an authorized request; with ``stream`` the caller closes the response."""
+        for attempt in range(2):
+            token = await self.access_token(refresh_token)
+            request = self.http.build_request(
+                method, url, headers={**(headers or {}), "Authorization": f"Bearer {token}"}, **kwargs,
+            )
+            response = await self.http.send(request, stream=stream)
+            if response.status_code == 401 and attempt == 0:
+                # Revoked or expired early: drop it and refresh once.
+                await response.aclose()
+                self._tokens.pop(self._key(refresh_token), None)
+                continue
+            break
+        if response.is_error:
+            await response.aclose()
+            raise DriveError(response.status_code, f"Google Drive request failed ({response.status_code})")
+        return response
+
+    async def list_files(self, refresh_token: str, page_token: str | None = None) -> dict:
+        """One page of the user's Google Docs: ``{"files": [...], "nextPageToken"?}``."""
+        params = {
+            "q": f"mimeType='{GOOGLE_DOC}' and trashed=false",
+            "fields": "nextPageToken, files(id, name, modifiedTime)",
+            "pageSize": PAGE_SIZE,
+        }
+        if page_token:
+            params["pageToken"] = page_token
+        response = await self._request(refresh_token, "GET", f"{DRIVE_API}/files", params=params)
+        return response.json()
+
+    async def start_page_token(self, refresh_token: str) -> str:
+        """Token for the changes feed from now on."""
+        response = await self._request(refresh_token, "GET", f"{DRIVE_API}/changes/startPageToken")
+        return response.json()["startPageToken"]
+
+    async def list_changes(self, refresh_token: str, page_token: str) -> dict:
+        """One page of changes since ``page_token``; the last page has ``newStartPageToken``."""
+        response = await self._request(refresh_token, "GET", f"{DRIVE_API}/changes", params={
+            "pageToken": page_token,
+            "fields": "nextPageToken, newStartPageToken, "
+                      "changes(changeType, fileId, removed, file(id, name, mimeType, modifiedTime, trashed))",
+            "pageSize": PAGE_SIZE,
+            "spaces": "drive",
+        })
+        return response.json()
+
+    async def export_html(self, refresh_token: str, file_id: str, feed: Callable[[str], object]):
+        """Download ``file_id`` as HTML, passing each decoded chunk to ``feed``."""
+        response = await self._request(
+            refresh_token, "GET", f"{DRIVE_API}/files/{file_id}/export",
+            params={"mimeType": "text/html"}, stream=True,
+        )
+        try:
+            async for chunk in response.aiter_text():
+                feed(chunk)
+        finally:
+            await response.aclose()
+
+    async def file_name(self, refresh_token: str, file_id: str) -> str:
+        response = await self._request(
+            refresh_token, "GET", f"{DRIVE_API}/files/{file_id}", params={"fields": "name"},
+        )
+        return response.json()["name"]
+
+    async def file_names(self, refresh_token: str, file_ids: list[str]) -> dict[str, str]:
+        """Names of ``file_ids``, fetched through Drive's batch endpoint.
+
+        Files that can't be read are left out of the result.
+        """
+        names: dict[str, str] = {}
+        for start in range(0, len(file_ids), BATCH_LIMIT):
+            chunk = file_ids[start:start + BATCH_LIMIT]
+            boundary = uuid.uuid4().hex
+            body = "".join(
+                f"--{boundary}\r\nContent-Type: application/http\r\nContent-ID: <{index}>\r\n\r\n"
+                f"GET /drive/v3/files/{quote(file_id, safe='')}?fields=id,name\r\n\r\n"
+                for index, file_id in enumerate(chunk)
+            ) + f"--{boundary}--\r\n"
+            response = await self._request(
+                refresh_token, "POST", BATCH_API,
+                headers={"Content-Type": f"multipart/mixed; boundary={boundary}"},
+                content=body.encode(),
+            )
+            for status, payload in _batch_responses(response):
+                if status == 200 and isinstance(payload, dict) and "id" in payload:
+                    names[payload["id"]] = payload.get("name", "")
+        return names
+
+    async def create_doc(self, refresh_token: str, title: str, html: str) -> str:
+        """Upload ``html`` as a new Google Doc; returns its file id."""
+        boundary = uuid.uuid4().hex
+        metadata = json.dumps({"name": title, "mimeType": GOOGLE_DOC})
+        body = (
+            f"--{boundary}\r\nContent-Type: application/json; charset=UTF-8\r\n\r\n{metadata}\r\n"
+            f"--{boundary}\r\nContent-Type: text/html; charset=UTF-8\r\n\r\n{html}\r\n"
+            f"--{boundary}--\r\n"
+        ).encode("utf-8")
+        response = await self._request(
+            refresh_token, "POST", f"{UPLOAD_API}/files",
+            params={"uploadType": "multipart", "fields": "id"},
+            content=body,
+            headers={"Content-Type": f"multipart/related; boundary={boundary}"},
+        )
+        return response.json()["id"]
+
+
+def _batch_responses(response: httpx.Response) -> list[tuple[int, object]]:
+    """``(status, JSON body)`` of each call in a ``multipart/mixed`` batch response."""
+    header = f"Content-Type: {response.headers.get('content-type', '')}\r\n\r\n".encode()
+    message = email.parser.BytesParser(policy=email.policy.HTTP).parsebytes(header + response.content)
+    results = []
+    for part in message.iter_parts():
+        http = part.get_payload(decode=True) or b""
+        head, _, body = http.replace(b"\r\n", b"\n").partition(b"\n\n")
+        try:
+            status = int(head.split(b"\n", 1)[0].split()[1])
+            payload = json.loads(body) if body.strip() else None
+        except (IndexError, ValueError):
+            continue
+        results.append((status, payload))
+    return results
+
+
+drive_client = DriveClient()
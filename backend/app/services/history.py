@@ -0,0 +1,205 @@
+"""Document version history.
+
+Every write of a document's content records a revision (with autosave
+coalescing, one per flush rather than one per keystroke save). Most
+revisions are compressed JSON Patch deltas from the previous one, so
+storage grows with the edits rather than with the document size; every
+``settings.history_snapshot_interval`` deltas a full snapshot starts a new
+chain, which bounds how many deltas a restore replays.
+
+``prune_history`` enforces ``history_retention_days`` and
+``history_max_bytes_per_user``. It only ever drops whole chains from the
+oldest end, so every remaining revision stays restorable.
+"""
+
+import json
+import uuid
+import zlib
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any
+
+from sqlalchemy import and_, delete, func, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.config import settings
+from app.database import dialect_insert
+from app.models.revision import DocumentRevision, RevisionKind
+from app.utils.json_patch import apply_patch, make_patch
+
+_table = DocumentRevision.__table__
+
+
+@dataclass
+class SavedVersion:
+    """A document state that was just written, and the state it replaced."""
+
+    document_id: uuid.UUID
+    owner_id: uuid.UUID
+    title: str
+    content: dict[str, Any]
+    version: int
+    base_version: int | None = None
+    base_content: dict[str, Any] | None = None
+
+
+def _pack(value: Any) -> bytes:
+    return zlib.compress(json.dumps(value, separators=(",", ":")).encode())
+
+
+def _unpack(data: bytes) -> Any:
+    return json.loads(zlib.decompress(data))
+
+
+async def record_revisions(session: AsyncSession, saves: list[SavedVersion]):
+    """Store a revision per save, in the caller's transaction.
+
+    A save becomes a delta only if the latest stored revision is exactly
+    its base version and that chain is not full; otherwise (first save,
+    a write that bypassed history) it becomes a snapshot.
+    """
+    if not saves:
+        return
+    ids = [save.document_id for save in saves]
+    newest = (
+        select(_table.c.document_id, func.max(_table.c.version).label("version"))
+        .where(_table.c.document_id.in_(ids))
+        .group_by(_table.c.document_id)
+        .subquery()
+    )
+    result = await session.exec(
+        select(_table.c.document_id, _table.c.version, _table.c.chain_length).join(
+            newest,
+            and_(_table.c.document_id == newest.c.document_id, _table.c.version == newest.c.version),
+        )
+    )
+    latest = {doc_id: (version, chain) for doc_id, version, chain in result.all()}
+
+    now = datetime.utcnow()
+    values = []
+    for save in saves:
+        version, chain = latest.get(save.document_id, (None, None))
+        if (
+            version is not None
+            and version == save.base_version
+            and save.base_content is not None
+            and chain < settings.history_snapshot_interval
+        ):
+            kind, data, chain = RevisionKind.delta, _pack(make_patch(save.base_content, save.content)), chain + 1
+        else:
+            kind, data, chain = RevisionKind.snapshot, _pack(save.content), 0
+        values.append({
+            "id": uuid.uuid4(),
+            "document_id": save.document_id,
+            "owner_id": save.owner_id,
+            "version": save.version,
+            "kind": kind,
+            "title": save.title,
+            "data": data,
+            "size": len(data),
+            "chain_length": chain,
+            "created_at": now,
+        })
+    await session.exec(
+        dialect_insert(session, DocumentRevision)
+        .values(values)
+        .on_conflict_do_nothing(index_elements=["document_id", "version"])
+    )
+
+
+async def load_revision(session: AsyncSession, document_id: uuid.UUID, version: int) -> tuple[str, dict] | None:
+    """``(title, content)`` of a stored version, or ``None`` if it is not kept."""
+    snapshot = (
+        select(func.max(_table.c.version))
+        .where(
+            _table.c.document_id == document_id,
+            _table.c.kind == RevisionKind.snapshot,
+            _table.c.version <= version,
+        )
+        .scalar_subquery()
+    )
+    result = await session.exec(
+        select(_table.c.version, _table.c.kind, _table.c.title, _table.c.data)
+        .where(
+            _table.c.document_id == document_id,
+            _table.c.version >= snapshot,
+            _table.c.version <= version,
+        )
+        .order_by(_table.c.version)
+    )
+    rows = result.all()
+    if not rows or rows[-1].version != version:
+        return None
+    content = _unpack(rows[0].data)
+    for row in rows[1:]:
+        content = apply_patch(content, _unpack(row.data))
+    return rows[-1].title, content
+
+
+async def delete_history(session: AsyncSession, document_id: uuid.UUID):
+    await session.exec(delete(DocumentRevision).where(DocumentRevision.document_id == document_id))
+
+
+async def prune_history(session: AsyncSession) -> int:
+    """Apply retention and per-user size caps. Returns revisions deleted."""
+    deleted = 0
+
+    # Retention: drop everything before the newest snapshot that is
+    # already past the cutoff. Younger revisions still need that chain.
+    cutoff = datetime.utcnow() - timedelta(days=settings.history_retention_days)
+    snapshots = _table.alias("snapshots")
+    expired_before = (
+        select(func.max(snapshots.c.version))
+        .where(
+            snapshots.c.document_id == _table.c.document_id,
+            snapshots.c.kind == RevisionKind.snapshot,
+            snapshots.c.created_at <= cutoff,
+        )
+        .scalar_subquery()
+    )
+    result = await session.exec(delete(_table).where(_table.c.version < expired_before))
+    deleted += result.rowcount
+
+    # Size cap: for users over it, drop their oldest chains first, but
+    # never a document's current chain.
+    cap = settings.history_max_bytes_per_user
+    over_cap = await session.exec(
+        select(_table.c.owner_id).group_by(_table.c.owner_id).having(func.sum(_table.c.size) > cap)
+    )
+    for owner_id in over_cap.scalars().all():
+        result = await session.exec(
+            select(_table.c.document_id, _table.c.version, _table.c.kind, _table.c.size, _table.c.created_at)
+            .where(_table.c.owner_id == owner_id)
+            .order_by(_table.c.document_id, _table.c.version)
+        )
+        chains: dict[uuid.UUID, list[list]] = defaultdict(list)
+        total = 0
+        for doc_id, version, kind, size, created_at in result.all():
+            total += size
+            if kind == RevisionKind.snapshot or not chains[doc_id]:
+                chains[doc_id].append([version, created_at, 0])
+            chains[doc_id][-1][2] += size
+
+        # A chain can go once the next one exists; deleting it means
+        # deleting everything below the next chain's snapshot.
+        candidates = []
+        for doc_id, doc_chains in chains.items():
+            for chain, next_chain in zip(doc_chains, doc_chains[1:]):
+                candidates.append((chain[1], doc_id, next_chain[0], chain[2]))
+        candidates.sort(key=lambda candidate: candidate[0])
+
+        cut: dict[uuid.UUID, int] = {}
+        for _, doc_id, below, size in candidates:
+            if total <= cap:
+                break
+            cut[doc_id] = below
+            total -= size
+        for doc_id, below in cut.items():
+            result = await session.exec(
+                delete(_table).where(_table.c.document_id == doc_id, _table.c.version < below)
+            )
+            deleted += result.rowcount
+
+    await session.commit()
+    return deleted
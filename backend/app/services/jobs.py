@@ -0,0 +1,68 @@
+"""Background jobs with progress the client polls (``GET /api/jobs/{id}``).
+
+``create_job`` records a pending ``Job``; the router then schedules
+``run_job`` with its ``BackgroundTasks``, so the work runs after the
+response is sent, in the same process. The work function reports
+progress through ``report_progress`` and returns the job's ``result``.
+
+Background work never uses the request's session: FastAPI has closed it
+by then. ``run_job`` opens its own.
+"""
+
+import logging
+import uuid
+from datetime import datetime
+from typing import Any, Awaitable, Callable
+
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.database import async_session
+from app.models.job import Job, JobStatus
+
+logger = logging.getLogger(__name__)
+
+JobWork = Callable[[AsyncSession, Job], Awaitable[dict[str, Any]]]
+
+
+async def create_job(session: AsyncSession, owner_id: uuid.UUID, kind: str, total: int = 0) -> Job:
+    job = Job(owner_id=owner_id, kind=kind, total=total)
+    session.add(job)
+    await session.commit()
+    await session.refresh(job)
+    return job
+
+
+async def report_progress(session: AsyncSession, job: Job, processed: int, total: int | None = None):
+    """Record progress and commit, along with whatever the work did so far."""
+    job.processed = processed
+    if total is not None:
+        job.total = total
+    job.updated_at = datetime.utcnow()
+    session.add(job)
+    await session.commit()
+
+
+async def run_job(job_id: uuid.UUID, work: JobWork):
+    """Run ``work`` for a pending job, in a session of its own, and record how it ended."""
+    async with async_session() as session:
+        job = await session.get(Job, job_id)
+        if job is None or job.status != JobStatus.pending:
+            return
+        job.status = JobStatus.running
+        job.updated_at = datetime.utcnow()
+        session.add(job)
+        await session.commit()
+        try:
+            result = await work(session, job)
+        except Exception as exc:
+            logger.exception("Job %s (%s) failed", job_id, job.kind)
+            await session.rollback()
+            job = await session.get(Job, job_id)
+            job.status = JobStatus.failed
+            job.error = str(exc)[:1000] or type(exc).__name__
+        else:
+            job.status = JobStatus.succeeded
+            job.result = result
+        job.updated_at = datetime.utcnow()
+        session.add(job)
+        await session.commit()
@@ -0,0 +1,268 @@
+"""Notification writes and real-time fan-out.
+
+``notify`` upserts the recipient's unread row for the event's group (so
+repeated likes coalesce into one notification), records the actor in the
+row's actor set, which ``actor_count`` is counted from (an actor counts
+once however often they act), and queues a small JSON payload for
+delivery. ``retract_like`` takes an unliking actor back out.
+
+Delivery happens only after the transaction commits:
+
+* on PostgreSQL the payload is sent with ``pg_notify`` inside the
+  transaction; every API worker runs ``notification_hub.listen()`` on a
+  dedicated connection and forwards it to its local subscribers;
+* on other databases (tests, local SQLite) it is dispatched in-process
+  from an ``after_commit`` hook.
+
+Subscribers are bounded queues, one per open stream; a slow client drops
+events rather than growing memory.
+"""
+
+import asyncio
+import json
+import logging
+import uuid
+from collections import defaultdict
+from datetime import datetime
+
+from sqlalchemy import delete, event, func, literal, select, update
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import Session
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.config import settings
+from app.database import dialect_insert
+from app.models.notification import Notification, NotificationActor, NotificationType
+from app.models.publication import Publication, PublicationComment
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = "violeta_notifications"
+SUBSCRIBER_QUEUE_SIZE = 100
+
+_PENDING_KEY = "pending_notifications"
+_table = Notification.__table__
+
+
+class NotificationHub:
+    """Per-worker registry of open notification streams."""
+
+    def __init__(self):
+        self._subscribers: dict[uuid.UUID, set[asyncio.Queue]] = defaultdict(set)
+
+    def subscribe(self, user_id: uuid.UUID) -> asyncio.Queue:
+        queue: asyncio.Queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        self._subscribers[user_id].add(queue)
+        return queue
+
+    def unsubscribe(self, user_id: uuid.UUID, queue: asyncio.Queue):
+        queues = self._subscribers.get(user_id)
+        if queues is None:
+            return
+        queues.discard(queue)
+        if not queues:
+            del self._subscribers[user_id]
+
+    def dispatch(self, message: dict):
+        recipient = uuid.UUID(message["recipient_id"])
+        for queue in self._subscribers.get(recipient, ()):
+            try:
+                queue.put_nowait(message["notification"])
+            except asyncio.QueueFull:
+                logger.warning("Dropping notification for slow subscriber %s", recipient)
+
+    async def listen(self):
+        """LISTEN on the notification channel, reconnecting on failure."""
+        import asyncpg
+
+        dsn = make_url(settings.database_url).set(drivername="postgresql")
+        dsn = dsn.render_as_string(hide_password=False)
+
+        def on_payload(connection, pid, channel, payload):
+            self.dispatch(json.loads(payload))
+
+        while True:
+            try:
+                conn = await asyncpg.connect(dsn)
+                try:
+                    await conn.add_listener(CHANNEL, on_payload)
+                    while not conn.is_closed():
+                        await asyncio.sleep(5)
+                finally:
+                    await conn.close()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Notification listener failed; reconnecting")
+            await asyncio.sleep(1)
+
+
+notification_hub = NotificationHub()
+
+
+@event.listens_for(Session, "after_commit")
+def _deliver_pending(session: Session):
+    for message in session.info.pop(_PENDING_KEY, ()):
+        notification_hub.dispatch(message)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_pending(session: Session):
+    session.info.pop(_PENDING_KEY, None)
+
+
+async def _publish(session: AsyncSession, message: dict):
+    if session.get_bind().dialect.name == "postgresql":
+        # Delivered by Postgres to every listener when the transaction commits.
+        await session.exec(select(func.pg_notify(CHANNEL, json.dumps(message))))
+    else:
+        session.sync_session.info.setdefault(_PENDING_KEY, []).append(message)
+
+
+def _lit(value, column):
+    return literal(value, _table.c[column].type)
+
+
+async def _upsert(session: AsyncSession, recipient, actor: uuid.UUID, actor_name: str,
+                  type: NotificationType, group_key: str, source_where=(),
+                  publication_id: uuid.UUID | None = None,
+                  comment_id: uuid.UUID | None = None):
+    """Insert or coalesce one notification.
+
+    ``recipient`` is either a user id or a column expression resolved by
+    ``source_where`` (e.g. a publication's author), so the lookup and the
+    write are a single statement. Actors never notify themselves.
+    """
+    now = datetime.utcnow()
+    columns = {
+        "id": _lit(uuid.uuid4(), "id"),
+        "recipient_id": recipient if not isinstance(recipient, uuid.UUID) else _lit(recipient, "recipient_id"),
+        "actor_id": _lit(actor, "actor_id"),
+        "type": _lit(type, "type"),
+        "group_key": _lit(group_key, "group_key"),
+        "publication_id": _lit(publication_id, "publication_id"),
+        "comment_id": _lit(comment_id, "comment_id"),
+        "actor_count": _lit(1, "actor_count"),
+        "created_at": _lit(now, "created_at"),
+        "updated_at": _lit(now, "updated_at"),
+    }
+    source = select(*columns.values()).where(columns["recipient_id"] != columns["actor_id"], *source_where)
+    stmt = dialect_insert(session, Notification).from_select(list(columns), source)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["recipient_id", "group_key"],
+        index_where=_table.c.read_at.is_(None),
+        set_={
+            "actor_id": stmt.excluded.actor_id,
+            "comment_id": stmt.excluded.comment_id,
+            "updated_at": stmt.excluded.updated_at,
+        },
+    ).returning(_table.c.id, _table.c.recipient_id, _table.c.created_at)
+
+    result = await session.exec(stmt)
+    row = result.first()
+    if row is None:
+        return
+    notification_id, recipient_id, created_at = row
+    actor_count = await _add_actor(session, notification_id, actor, now)
+    await _publish(session, {
+        "recipient_id": str(recipient_id),
+        "notification": {
+            "id": str(notification_id),
+            "type": type.value,
+            "actor_id": str(actor),
+            "actor_name": actor_name,
+            "actor_count": actor_count,
+            "publication_id": str(publication_id) if publication_id else None,
+            "comment_id": str(comment_id) if comment_id else None,
+            "created_at": created_at.isoformat(),
+            "updated_at": now.isoformat(),
+        },
+    })
+
+
+async def _count_actors(session: AsyncSession, notification_id: uuid.UUID, **values) -> int:
+    count = (
+        select(func.count())
+        .select_from(NotificationActor)
+        .where(NotificationActor.notification_id == notification_id)
+        .scalar_subquery()
+    )
+    result = await session.exec(
+        update(Notification)
+        .where(Notification.id == notification_id)
+        .values(actor_count=Notification.uncounted_actors + count, **values)
+        .returning(Notification.actor_count)
+        .execution_options(synchronize_session=False)
+    )
+    return result.scalar_one()
+
+
+async def _add_actor(session: AsyncSession, notification_id: uuid.UUID, actor: uuid.UUID, now: datetime) -> int:
+    stmt = dialect_insert(session, NotificationActor).values(
+        notification_id=notification_id, actor_id=actor, created_at=now,
+    )
+    # Acting again only makes the actor the most recent one.
+    await session.exec(stmt.on_conflict_do_update(
+        index_elements=["notification_id", "actor_id"], set_={"created_at": stmt.excluded.created_at},
+    ))
+    return await _count_actors(session, notification_id)
+
+
+async def retract_like(session: AsyncSession, actor_id: uuid.UUID, pub_id: uuid.UUID):
+    """Take an unliking actor out of the author's unread like notification."""
+    author = select(Publication.author_id).where(Publication.id == pub_id).scalar_subquery()
+    notification_id = (await session.exec(
+        select(Notification.id).where(
+            Notification.recipient_id == author,
+            Notification.group_key == f"like:{pub_id}",
+            Notification.read_at.is_(None),
+        )
+    )).scalars().first()
+    if notification_id is None:
+        return
+    removed = await session.exec(delete(NotificationActor).where(
+        NotificationActor.notification_id == notification_id, NotificationActor.actor_id == actor_id,
+    ))
+    if not removed.rowcount:
+        return
+    latest = (await session.exec(
+        select(NotificationActor.actor_id)
+        .where(NotificationActor.notification_id == notification_id)
+        .order_by(NotificationActor.created_at.desc())
+        .limit(1)
+    )).scalars().first()
+    if latest is None:
+        # A row from before actor sets were kept may still stand for others.
+        deleted = await session.exec(delete(Notification).where(
+            Notification.id == notification_id, Notification.uncounted_actors == 0,
+        ))
+        if not deleted.rowcount:
+            await _count_actors(session, notification_id)
+    else:
+        await _count_actors(session, notification_id, actor_id=latest)
+
+
+async def notify_like(session: AsyncSession, actor_id: uuid.UUID, actor_name: str, pub_id: uuid.UUID):
+    await _upsert(
+        session, Publication.author_id, actor_id, actor_name, NotificationType.like,
+        f"like:{pub_id}", source_where=(Publication.id == pub_id,), publication_id=pub_id,
+    )
+
+
+async def notify_comment(session: AsyncSession, actor_id: uuid.UUID, actor_name: str,
+                         pub_id: uuid.UUID, comment_id: uuid.UUID, parent_id: uuid.UUID | None):
+    await _upsert(
+        session, Publication.author_id, actor_id, actor_name, NotificationType.comment,
+        f"comment:{pub_id}", source_where=(Publication.id == pub_id,),
+        publication_id=pub_id, comment_id=comment_id,
+    )
+    if parent_id:
+        await _upsert(
+            session, PublicationComment.author_id, actor_id, actor_name, NotificationType.reply,
+            f"reply:{parent_id}", source_where=(PublicationComment.id == parent_id,),
+            publication_id=pub_id, comment_id=comment_id,
+        )
+
+
+async def notify_follow(session: AsyncSession, actor_id: uuid.UUID, actor_name: str, following_id: uuid.UUID):
+    await _upsert(session, following_id, actor_id, actor_name, NotificationType.follow, "follow")
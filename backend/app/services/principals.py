@@ -0,0 +1,100 @@
+"""Authenticated users without a database round trip per request.
+
+An access token carries the user's id (``sub``), name and token version
+(``tv``), so ``get_current_principal`` builds the ``Principal`` from its
+claims. Only the token version, which revokes old tokens, is checked
+against the database. It is cached per process in a bounded LRU for
+``principal_cache_ttl_seconds``. Committed ORM updates and deletes of a
+``User`` evict its entry here; other processes see a change within the
+TTL. A renamed user's tokens carry the old name until they expire.
+"""
+
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session, object_session
+
+from app.config import settings
+from app.metrics import Counter
+from app.models.user import User
+
+CACHE_LOOKUPS = Counter("principal_cache_lookups_total", "Token version cache lookups.", ("result",))
+
+_EVICT_KEY = "evict_principals"
+
+
+@dataclass(frozen=True)
+class Principal:
+    id: uuid.UUID
+    name: str
+    token_version: int
+
+
+class TokenVersionCache:
+    """Current token version per user."""
+
+    def __init__(self):
+        self._entries: OrderedDict[uuid.UUID, tuple[float, int]] = OrderedDict()
+        # Bumped by every eviction; see ``put``.
+        self._epoch = 0
+
+    @property
+    def epoch(self) -> int:
+        return self._epoch
+
+    def get(self, user_id: uuid.UUID) -> int | None:
+        entry = self._entries.get(user_id)
+        if entry is None or entry[0] <= time.monotonic():
+            CACHE_LOOKUPS.inc(result="miss")
+            return None
+        self._entries.move_to_end(user_id)
+        CACHE_LOOKUPS.inc(result="hit")
+        return entry[1]
+
+    def put(self, user_id: uuid.UUID, token_version: int, epoch: int):
+        """Cache a version read when ``epoch`` was current.
+
+        Skipped if anything was evicted since: the read may predate that
+        commit, and caching it would undo the eviction.
+        """
+        if epoch != self._epoch:
+            return
+        self._entries[user_id] = (time.monotonic() + settings.principal_cache_ttl_seconds, token_version)
+        self._entries.move_to_end(user_id)
+        while len(self._entries) > settings.principal_cache_size:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, user_id: uuid.UUID):
+        self._epoch += 1
+        self._entries.pop(user_id, None)
+
+    def clear(self):
+        self._epoch += 1
+        self._entries.clear()
+
+
+token_versions = TokenVersionCache()
+
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _mark_for_eviction(mapper, connection, target: User):
+    # Evicting now would let a concurrent request cache the old row again
+    # before this transaction commits.
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault(_EVICT_KEY, set()).add(target.id)
+
+
+@event.listens_for(Session, "after_commit")
+def _evict(session: Session):
+    for user_id in session.info.pop(_EVICT_KEY, ()):
+        token_versions.invalidate(user_id)
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget(session: Session):
+    session.info.pop(_EVICT_KEY, None)
@@ -0,0 +1,49 @@
+"""Fixed-window rate limits kept in memory, per process."""
+
+import math
+import time
+
+from app.metrics import Counter
+
+RATE_LIMITED = Counter("rate_limited_total", "Requests refused by a rate limit.", ("scope",))
+
+_PRUNE_THRESHOLD = 10_000
+
+
+class RateLimiter:
+    """At most ``limit`` hits per ``window`` seconds for each key."""
+
+    def __init__(self, scope: str):
+        self.scope = scope
+        self._windows: dict[str, tuple[float, int]] = {}
+
+    def _current(self, key: str, window: float, now: float) -> tuple[float, int]:
+        started, count = self._windows.get(key, (now, 0))
+        return (now, 0) if now - started >= window else (started, count)
+
+    def retry_after(self, key: str, limit: int, window: float) -> int | None:
+        """Seconds until ``key`` may try again, or ``None`` if it may now."""
+        now = time.monotonic()
+        started, count = self._current(key, window, now)
+        if count < limit:
+            return None
+        RATE_LIMITED.inc(scope=self.scope)
+        return max(1, math.ceil(started + window - now))
+
+    def hit(self, key: str, window: float):
+        now = time.monotonic()
+        started, count = self._current(key, window, now)
+        self._windows[key] = (started, count + 1)
+        if len(self._windows) > _PRUNE_THRESHOLD:
+            self._windows = {k: v for k, v in self._windows.items() if now - v[0] < window}
+
+    def reset(self, key: str):
+        self._windows.pop(key, None)
+
+    def clear(self):
+        self._windows.clear()
+
+
+login_ip_limiter = RateLimiter("login_ip")
+login_account_limiter = RateLimiter("login_account")
+register_ip_limiter = RateLimiter("register_ip")
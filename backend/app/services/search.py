@@ -0,0 +1,208 @@
+"""Full-text search over the caller's documents and all publications.
+
+Documents keep the plain text of their content in ``search_text`` (written
+with every content save), publications the text of their PDF (extracted
+at publish time). On PostgreSQL both tables carry a generated, GIN-indexed
+``search_vector`` (``app.database.add_search_vector``): matching uses
+``websearch_to_tsquery``, ranking ``ts_rank`` and snippets ``ts_headline``,
+which only runs for the rows on the returned page. Snippets are HTML: the
+text (other users' documents, PDF text layers) is escaped and only the
+``<mark>`` highlights are markup. Other dialects fall back
+to a case-insensitive substring match with unranked results.
+"""
+
+import asyncio
+import html
+import logging
+import re
+import uuid
+from typing import Any
+
+from sqlalchemy import String, bindparam, func, literal, literal_column, or_, select, tuple_, union_all, update
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.database import SEARCH_CONFIG
+from app.models.document import Document, DocumentContent
+from app.models.publication import Publication
+from app.telemetry import span
+from app.utils.tiptap import MAX_TEXT_LENGTH, extract_text
+
+logger = logging.getLogger(__name__)
+
+HIGHLIGHT_START = "<mark>"
+HIGHLIGHT_STOP = "</mark>"
+SNIPPET_CHARS = 160
+REINDEX_BATCH_SIZE = 200
+
+# ts_headline marks matches with these; they become tags after escaping.
+_START_SENTINEL = "\x02"
+_STOP_SENTINEL = "\x03"
+_HEADLINE_OPTIONS = (
+    f"StartSel={_START_SENTINEL}, StopSel={_STOP_SENTINEL}, MaxFragments=2, MaxWords=20, MinWords=8"
+)
+
+
+async def pdf_text(pdf_path: str) -> str:
+    """Text layer of a PDF via ``pdftotext`` (poppler); empty if unavailable."""
+    with span("pdftotext"):
+        try:
+            proc = await asyncio.create_subprocess_exec(
+                "pdftotext", "-enc", "UTF-8", pdf_path, "-",
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.DEVNULL,
+            )
+        except FileNotFoundError:
+            logger.warning("pdftotext not installed; publication text not indexed")
+            return ""
+        stdout, _ = await proc.communicate()
+    if proc.returncode != 0:
+        return ""
+    return stdout.decode("utf-8", errors="replace")[:MAX_TEXT_LENGTH]
+
+
+def _is_postgres(session: AsyncSession) -> bool:
+    return session.get_bind().dialect.name == "postgresql"
+
+
+def _sources(session: AsyncSession, user_id: uuid.UUID, q: str):
+    """One select per searchable table, all with the same columns."""
+    sources = []
+    for kind, model, timestamp, where in (
+        ("document", Document, Document.updated_at, Document.owner_id == user_id),
+        ("publication", Publication, Publication.created_at, None),
+    ):
+        if _is_postgres(session):
+            vector = literal_column(f"{model.__tablename__}.search_vector")
+            query = func.websearch_to_tsquery(SEARCH_CONFIG, q)
+            match = vector.op("@@")(query)
+            rank = func.ts_rank(vector, query)
+        else:
+            pattern = "%" + q.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+            match = or_(model.title.ilike(pattern, escape="\\"), model.search_text.ilike(pattern, escape="\\"))
+            rank = literal(0.0)
+        stmt = select(
+            literal(kind, String).label("kind"),
+            model.id.label("id"),
+            model.title.label("title"),
+            rank.label("rank"),
+            timestamp.label("updated_at"),
+        ).where(match)
+        if where is not None:
+            stmt = stmt.where(where)
+        sources.append(stmt)
+    return sources
+
+
+async def search(
+    session: AsyncSession,
+    user_id: uuid.UUID,
+    q: str,
+    limit: int,
+    after: tuple[float, uuid.UUID] | None = None,
+) -> list[dict[str, Any]]:
+    """A page of hits ordered by rank, then id; ``after`` is the last hit seen."""
+    hits = union_all(*_sources(session, user_id, q)).subquery()
+    query = select(hits).order_by(hits.c.rank.desc(), hits.c.id.desc()).limit(limit)
+    if after is not None:
+        query = query.where(tuple_(hits.c.rank, hits.c.id) < tuple_(*after))
+    rows = (await session.exec(query)).all()
+
+    snippets = await _snippets(session, q, rows)
+    return [
+        {
+            "kind": row.kind,
+            "id": row.id,
+            "title": row.title,
+            "snippet": snippets.get(row.id, ""),
+            "rank": row.rank,
+            "updated_at": row.updated_at,
+        }
+        for row in rows
+    ]
+
+
+async def _snippets(session: AsyncSession, q: str, rows) -> dict[uuid.UUID, str]:
+    snippets = {}
+    for model in (Document, Publication):
+        kind = "document" if model is Document else "publication"
+        ids = [row.id for row in rows if row.kind == kind]
+        if not ids:
+            continue
+        if _is_postgres(session):
+            headline = func.ts_headline(
+                SEARCH_CONFIG, model.search_text, func.websearch_to_tsquery(SEARCH_CONFIG, q), _HEADLINE_OPTIONS,
+            )
+            result = await session.exec(select(model.id, headline).where(model.id.in_(ids)))
+            snippets.update((row_id, _highlight(text)) for row_id, text in result.all())
+        else:
+            result = await session.exec(select(model.id, model.search_text).where(model.id.in_(ids)))
+            snippets.update((row_id, _snippet(text, q)) for row_id, text in result.all())
+    return snippets
+
+
+def _highlight(headline: str) -> str:
+    """Escape ``ts_headline`` output, then turn its sentinels into ``<mark>`` tags."""
+    return (
+        html.escape(headline)
+        .replace(_START_SENTINEL, HIGHLIGHT_START)
+        .replace(_STOP_SENTINEL, HIGHLIGHT_STOP)
+    )
+
+
+def _snippet(text: str, q: str) -> str:
+    """Plain substring highlight, mirroring ``_highlight`` output."""
+    match = re.search(re.escape(q), text, re.IGNORECASE)
+    if match is None:
+        return html.escape(text[:SNIPPET_CHARS])
+    start = max(0, match.start() - SNIPPET_CHARS // 2)
+    end = min(len(text), match.end() + SNIPPET_CHARS // 2)
+    return (
+        html.escape(text[start:match.start()])
+        + HIGHLIGHT_START + html.escape(match.group()) + HIGHLIGHT_STOP
+        + html.escape(text[match.end():end])
+    )
+
+
+async def reindex_search(session: AsyncSession) -> int:
+    """Backfill ``search_text`` for documents and publications. Returns rows updated."""
+    touched = 0
+    table = Document.__table__
+    stmt = (
+        update(table)
+        .where(table.c.id == bindparam("b_id"), table.c.search_text != bindparam("b_text"))
+        .values(search_text=bindparam("b_text"))
+    )
+    last_id: uuid.UUID | None = None
+    while True:
+        # Unedited copies keep their content in document_contents.
+        query = (
+            select(Document.id, Document.content, DocumentContent.content)
+            .outerjoin(DocumentContent, DocumentContent.hash == Document.content_hash)
+            .order_by(Document.id)
+            .limit(REINDEX_BATCH_SIZE)
+        )
+        if last_id is not None:
+            query = query.where(Document.id > last_id)
+        rows = (await session.exec(query)).all()
+        if not rows:
+            break
+        params = [
+            {"b_id": doc_id, "b_text": extract_text(shared if shared is not None else own)}
+            for doc_id, own, shared in rows
+        ]
+        conn = await session.connection()
+        result = await conn.execute(stmt, params)
+        touched += max(result.rowcount, 0)
+        await session.commit()
+        last_id = rows[-1][0]
+
+    result = await session.exec(
+        select(Publication.id, Publication.pdf_path).where(Publication.search_text == "")
+    )
+    for pub_id, path in result.all():
+        text = await pdf_text(path)
+        if text:
+            await session.exec(update(Publication).where(Publication.id == pub_id).values(search_text=text))
+            touched += 1
+    await session.commit()
+    return touched
@@ -0,0 +1,196 @@
+"""Incrementally maintained "who to follow" suggestions.
+
+A candidate for user A is scored from two signals:
+
+* second-degree follows: A follows B and B follows X, weighted by how many
+  of A's followings follow X (``mutual_count``);
+* likes: A liked publications authored by X (``like_count``).
+
+Follow and like events recompute the pairs they affect from the source
+tables, restricted to those pairs, so the read path never touches the
+follow graph and a row written by an event is always what
+``rebuild_suggestions`` would write. A follow or unfollow touches the
+follower's followers and the followee's followings; only the
+``SUGGESTION_FANOUT`` most recent of each are refreshed, so a pair further
+out keeps a stale score until the next ``python -m app.jobs
+rebuild-suggestions``. Every path trims the users it touched to
+``SUGGESTIONS_PER_USER`` rows.
+"""
+
+import uuid
+from datetime import datetime
+
+from sqlalchemy import delete, exists, func, literal, select, tuple_
+from sqlalchemy.orm import aliased
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.database import dialect_insert
+from app.models.follow import Follow
+from app.models.publication import Publication, PublicationLike
+from app.models.suggestion import FollowSuggestion
+
+MUTUAL_WEIGHT = 2
+LIKE_WEIGHT = 1
+SUGGESTIONS_PER_USER = 100
+# Most neighbours a follow or unfollow refreshes pairs for.
+SUGGESTION_FANOUT = 500
+
+_table = FollowSuggestion.__table__
+
+
+def _lit(value, column):
+    return literal(value, _table.c[column].type)
+
+
+def _not_following(user_column, candidate_column):
+    """``NOT EXISTS`` clause: ``user_column`` doesn't already follow ``candidate_column``."""
+    existing = aliased(Follow)
+    return ~exists().where(
+        existing.follower_id == user_column,
+        existing.following_id == candidate_column,
+    )
+
+
+async def _trim(session: AsyncSession, users=None):
+    """Keep each user's ``SUGGESTIONS_PER_USER`` best rows; ``users`` limits the users looked at."""
+    ranked = select(
+        FollowSuggestion.user_id,
+        FollowSuggestion.candidate_id,
+        func.row_number()
+        .over(
+            partition_by=FollowSuggestion.user_id,
+            order_by=(FollowSuggestion.score.desc(), FollowSuggestion.candidate_id),
+        )
+        .label("rank"),
+    )
+    if users is not None:
+        ranked = ranked.where(FollowSuggestion.user_id.in_(users))
+    ranked = ranked.subquery()
+    await session.exec(
+        delete(FollowSuggestion)
+        .where(
+            tuple_(FollowSuggestion.user_id, FollowSuggestion.candidate_id).in_(
+                select(ranked.c.user_id, ranked.c.candidate_id).where(ranked.c.rank > SUGGESTIONS_PER_USER)
+            )
+        )
+        .execution_options(synchronize_session=False)
+    )
+
+
+def _mutual_counts(users=None, candidates=None):
+    """``(user_id, candidate_id, mutual_count, like_count, score)`` from the follow graph."""
+    first, second = aliased(Follow), aliased(Follow)
+    mutual_count = func.count()
+    source = (
+        select(first.follower_id, second.following_id, mutual_count, _lit(0, "like_count"), mutual_count * MUTUAL_WEIGHT)
+        .join(second, second.follower_id == first.following_id)
+        .where(
+            second.following_id != first.follower_id,
+            _not_following(first.follower_id, second.following_id),
+        )
+        .group_by(first.follower_id, second.following_id)
+    )
+    if users is not None:
+        source = source.where(first.follower_id.in_(users), second.following_id.in_(candidates))
+    return source
+
+
+def _like_counts(users=None, candidates=None):
+    """``(user_id, candidate_id, mutual_count, like_count, score)`` from likes."""
+    like_count = func.count()
+    source = (
+        select(PublicationLike.user_id, Publication.author_id, _lit(0, "mutual_count"), like_count, like_count * LIKE_WEIGHT)
+        .join(Publication, Publication.id == PublicationLike.publication_id)
+        .where(
+            Publication.author_id != PublicationLike.user_id,
+            _not_following(PublicationLike.user_id, Publication.author_id),
+        )
+        .group_by(PublicationLike.user_id, Publication.author_id)
+    )
+    if users is not None:
+        source = source.where(PublicationLike.user_id.in_(users), Publication.author_id.in_(candidates))
+    return source
+
+
+async def _refresh(session: AsyncSession, users: list[uuid.UUID], candidates: list[uuid.UUID]):
+    """Set every ``users`` × ``candidates`` row to what ``rebuild_suggestions`` would write."""
+    if not users or not candidates:
+        return
+    await session.exec(
+        delete(FollowSuggestion)
+        .where(FollowSuggestion.user_id.in_(users), FollowSuggestion.candidate_id.in_(candidates))
+        .execution_options(synchronize_session=False)
+    )
+    await _upsert_aggregate(session, _mutual_counts(users, candidates))
+    await _upsert_aggregate(session, _like_counts(users, candidates))
+    await _trim(session, users)
+
+
+async def _refresh_follow(session: AsyncSession, follower_id: uuid.UUID, following_id: uuid.UUID):
+    """Refresh the pairs a follow between the two users scores."""
+    followings = (await session.exec(
+        select(Follow.following_id)
+        .where(Follow.follower_id == following_id)
+        .order_by(Follow.created_at.desc())
+        .limit(SUGGESTION_FANOUT)
+    )).scalars().all()
+    followers = (await session.exec(
+        select(Follow.follower_id)
+        .where(Follow.following_id == follower_id)
+        .order_by(Follow.created_at.desc())
+        .limit(SUGGESTION_FANOUT)
+    )).scalars().all()
+    # The followee's followings are candidates for the follower, and the
+    # followee itself is one unless followed; the followee is a candidate
+    # for the follower's followers.
+    await _refresh(session, [follower_id], [*followings, following_id])
+    await _refresh(session, list(followers), [following_id])
+
+
+async def on_follow(session: AsyncSession, follower_id: uuid.UUID, following_id: uuid.UUID):
+    """``follower_id`` just followed ``following_id`` (row already inserted)."""
+    await _refresh_follow(session, follower_id, following_id)
+
+
+async def on_unfollow(session: AsyncSession, follower_id: uuid.UUID, following_id: uuid.UUID):
+    """``follower_id`` just unfollowed ``following_id`` (row already deleted)."""
+    await _refresh_follow(session, follower_id, following_id)
+
+
+async def _author(session: AsyncSession, pub_id: uuid.UUID) -> list[uuid.UUID]:
+    return list((await session.exec(select(Publication.author_id).where(Publication.id == pub_id))).scalars().all())
+
+
+async def on_like(session: AsyncSession, user_id: uuid.UUID, pub_id: uuid.UUID):
+    await _refresh(session, [user_id], await _author(session, pub_id))
+
+
+async def on_unlike(session: AsyncSession, user_id: uuid.UUID, pub_id: uuid.UUID):
+    await _refresh(session, [user_id], await _author(session, pub_id))
+
+
+async def rebuild_suggestions(session: AsyncSession) -> int:
+    """Recompute every user's suggestions from scratch. Returns rows written."""
+    await session.exec(delete(FollowSuggestion))
+    await _upsert_aggregate(session, _mutual_counts())
+    await _upsert_aggregate(session, _like_counts())
+    await _trim(session)
+    total = await session.exec(select(func.count()).select_from(FollowSuggestion))
+    await session.commit()
+    return total.scalar_one()
+
+
+async def _upsert_aggregate(session: AsyncSession, source):
+    stmt = dialect_insert(session, FollowSuggestion).from_select(
+        ["user_id", "candidate_id", "mutual_count", "like_count", "score", "updated_at"],
+        source.add_columns(_lit(datetime.utcnow(), "updated_at")),
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["user_id", "candidate_id"],
+        set_={
+            "mutual_count": _table.c.mutual_count + stmt.excluded.mutual_count,
+            "like_count": _table.c.like_count + stmt.excluded.like_count,
+            "score": _table.c.score + stmt.excluded.score,
+        },
+    )
+    await session.exec(stmt)
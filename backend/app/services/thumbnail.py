@@ -1,7 +1,16 @@
 import os
+import time
 from pathlib import Path
 from pdf2image import convert_from_path
 
+from app.metrics import Histogram
+from app.telemetry import span
+
+THUMBNAIL_SECONDS = Histogram(
+    "thumbnail_render_seconds", "Time to render a PDF's first page to a PNG thumbnail.",
+    buckets=(0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0),
+)
+
 UPLOAD_DIR = Path("uploads/publications")
 
 def ensure_upload_dir():
@@ -17,9 +26,12 @@ def generate_thumbnail(publication_id: str) -> str:
     ensure_upload_dir()
     pdf_path = UPLOAD_DIR / f"{publication_id}.pdf"
     thumb_path = UPLOAD_DIR / f"{publication_id}_thumb.png"
-    images = convert_from_path(str(pdf_path), first_page=1, last_page=1, size=(400, None))
-    if images:
-        images[0].save(str(thumb_path), "PNG")
+    started = time.perf_counter()
+    with span("pdf2image"):
+        images = convert_from_path(str(pdf_path), first_page=1, last_page=1, size=(400, None))
+        if images:
+            images[0].save(str(thumb_path), "PNG")
+    THUMBNAIL_SECONDS.observe(time.perf_counter() - started)
     return str(thumb_path)
 
 def delete_publication_files(publication_id: str):
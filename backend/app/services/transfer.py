@@ -0,0 +1,299 @@
+"""Bulk export and import of a user's documents as ZIP archives.
+
+``export_documents`` streams a ZIP with one folder per document holding
+``document.json`` (title, timestamps and the raw content), ``document.tex``
+(see ``app.utils.latex``) and the images it references from the blob
+store. The archive is written to an in-memory sink that is drained after
+every entry, so memory use is bounded by one document and one file chunk,
+never by the size of the export.
+
+``import_projects`` is the matching job: every ``.tex`` file with a
+``\\documentclass`` becomes a LaTeX document (the form the editor saves),
+and the other files in its folder are stored as blobs and listed in the
+content's ``assets``. Only raster images keep their type; the blob
+store serves anything else as an opaque download. ``run_import`` wraps it
+in ``run_job`` and deletes the uploaded archive however the job ends.
+"""
+
+import asyncio
+import functools
+import json
+import mimetypes
+import re
+import shutil
+import tempfile
+import unicodedata
+import uuid
+import zipfile
+from collections.abc import AsyncIterator
+from datetime import datetime
+from pathlib import Path, PurePosixPath
+from typing import Any, BinaryIO
+
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.config import settings
+from app.database import async_session
+from app.models.blob import Blob
+from app.models.document import Document, DocumentContent
+from app.models.job import Job
+from app.services.blobs import BLOB_URL_PREFIX, blob_path, safe_mime_type, store_blob
+from app.services.documents import add_document
+from app.services.jobs import report_progress, run_job
+from app.utils.latex import generate_latex
+
+EXPORT_BATCH_SIZE = 20
+CHUNK_SIZE = 64 * 1024
+
+_TEX_SUFFIXES = {".tex", ".latex"}
+_SKIP_SUFFIXES = {".aux", ".log", ".out", ".toc", ".synctex", ".fls", ".fdb_latexmk", ".gz"}
+_TITLE_RE = re.compile(r"\\title\s*(?:\[[^\]]*\])?\s*\{([^{}]*)\}")
+
+
+class _ZipSink:
+    """Write-only, non-seekable file object that buffers until drained."""
+
+    def __init__(self):
+        self._chunks: list[bytes] = []
+        self._position = 0
+
+    def write(self, data: bytes) -> int:
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def _slug(title: str) -> str:
+    ascii_title = unicodedata.normalize("NFKD", title).encode("ascii", "ignore").decode()
+    return re.sub(r"[^a-zA-Z0-9]+", "-", ascii_title).strip("-").lower()[:50] or "documento"
+
+
+def _safe_name(name: str) -> str | None:
+    """A relative path without ``..`` or absolute parts, or ``None``."""
+    parts = [part for part in PurePosixPath(name.replace("\\", "/")).parts if part not in ("/", "", ".")]
+    if not parts or ".." in parts:
+        return None
+    return "/".join(parts)
+
+
+def _blob_refs(node: Any, found: dict[str, str | None]):
+    """Blob URLs in ``node``, with the file name the content gives them."""
+    if isinstance(node, dict):
+        src = node.get("src")
+        if isinstance(src, str) and src.startswith(BLOB_URL_PREFIX):
+            # Image node attrs carry ``assetFilename``; imported assets ``filename``.
+            name = node.get("assetFilename") or node.get("filename")
+            if found.get(src) is None:
+                found[src] = name if isinstance(name, str) else None
+        for value in node.values():
+            _blob_refs(value, found)
+    elif isinstance(node, list):
+        for value in node:
+            _blob_refs(value, found)
+
+
+async def _asset_names(session: AsyncSession, content: dict[str, Any]) -> dict[str, str]:
+    """Map each stored blob URL in ``content`` to its path in the archive."""
+    found: dict[str, str | None] = {}
+    _blob_refs(content, found)
+    if not found:
+        return {}
+    hashes = {src[len(BLOB_URL_PREFIX):]: src for src in found}
+    result = await session.exec(select(Blob.hash, Blob.mime_type).where(Blob.hash.in_(hashes)))
+    names = {}
+    for digest, mime_type in result.all():
+        src = hashes[digest]
+        name = _safe_name(found[src] or "")
+        if name is None or name in ("document.json", "document.tex"):
+            name = f"images/{digest[:16]}{mimetypes.guess_extension(mime_type) or ''}"
+        names[src] = name
+    return names
+
+
+async def export_documents(owner_id: uuid.UUID) -> AsyncIterator[bytes]:
+    """Yield a ZIP of all of ``owner_id``'s documents, a piece at a time.
+
+    Each batch is read in a short session of its own, so no connection
+    is held while the client downloads.
+    """
+    sink = _ZipSink()
+    with zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        last_id: uuid.UUID | None = None
+        while True:
+            query = (
+                select(
+                    Document.id, Document.title, Document.created_at, Document.updated_at,
+                    Document.content, DocumentContent.content,
+                )
+                .outerjoin(DocumentContent, DocumentContent.hash == Document.content_hash)
+                .where(Document.owner_id == owner_id)
+                .order_by(Document.id)
+                .limit(EXPORT_BATCH_SIZE)
+            )
+            if last_id is not None:
+                query = query.where(Document.id > last_id)
+            batch = []
+            async with async_session() as session:
+                for doc_id, title, created_at, updated_at, own, shared in (await session.exec(query)).all():
+                    content = shared if shared is not None else own
+                    assets = await _asset_names(session, content)
+                    batch.append((doc_id, title, created_at, updated_at, content, assets))
+            if not batch:
+                break
+            for doc_id, title, created_at, updated_at, content, assets in batch:
+                folder = f"{_slug(title)}-{doc_id.hex[:8]}"
+                meta = {
+                    "id": str(doc_id),
+                    "title": title,
+                    "created_at": created_at.isoformat(),
+                    "updated_at": updated_at.isoformat(),
+                    "content": content,
+                }
+                archive.writestr(f"{folder}/document.json", json.dumps(meta, ensure_ascii=False))
+                archive.writestr(f"{folder}/document.tex", generate_latex(content, assets.get))
+                yield sink.drain()
+                for src, name in assets.items():
+                    path = blob_path(src[len(BLOB_URL_PREFIX):])
+                    async for chunk in _write_file(archive, sink, path, f"{folder}/{name}"):
+                        yield chunk
+            last_id = batch[-1][0]
+    yield sink.drain()
+
+
+async def _write_file(archive: zipfile.ZipFile, sink: _ZipSink, path: Path, name: str) -> AsyncIterator[bytes]:
+    # Images are already compressed; store them as they are.
+    info = zipfile.ZipInfo(name, date_time=datetime.utcnow().timetuple()[:6])
+    info.compress_type = zipfile.ZIP_STORED
+    try:
+        source = await asyncio.to_thread(path.open, "rb")
+    except FileNotFoundError:
+        return
+    try:
+        with archive.open(info, "w") as dest:
+            while chunk := await asyncio.to_thread(source.read, CHUNK_SIZE):
+                dest.write(chunk)
+                yield sink.drain()
+    finally:
+        source.close()
+    yield sink.drain()
+
+
+def _relative(name: str, folder: PurePosixPath) -> str | None:
+    """``name`` relative to ``folder``, or ``None`` if it is outside it."""
+    if folder == PurePosixPath("."):
+        return name
+    path = PurePosixPath(name)
+    return str(path.relative_to(folder)) if path.is_relative_to(folder) else None
+
+
+def _scan(path: Path) -> list[tuple[str, str, dict[str, str]]]:
+    """``(title, source, {member: asset name})`` per project in the ZIP.
+
+    Each non-TeX file belongs to the project in the innermost folder that
+    contains it.
+    """
+    with zipfile.ZipFile(path) as archive:
+        entries = [
+            info for info in archive.infolist()
+            if not info.is_dir()
+            and not info.filename.startswith("__MACOSX/")
+            and not PurePosixPath(info.filename).name.startswith(".")
+            and PurePosixPath(info.filename).suffix.lower() not in _SKIP_SUFFIXES
+            and _safe_name(info.filename) == info.filename
+        ]
+        if sum(info.file_size for info in entries) > settings.import_max_bytes:
+            raise ValueError("Archive is too large")
+        tex = {
+            info.filename: archive.read(info).decode("utf-8", errors="replace")
+            for info in entries
+            if PurePosixPath(info.filename).suffix.lower() in _TEX_SUFFIXES
+        }
+    # Included files (\input{...}) have no \documentclass of their own.
+    mains = sorted(name for name, source in tex.items() if "\\documentclass" in source) or sorted(tex)
+    assets: dict[str, dict[str, str]] = {name: {} for name in mains}
+    for info in entries:
+        if info.filename in tex:
+            continue
+        owners = [
+            (len(PurePosixPath(main).parent.parts), main, relative)
+            for main in mains
+            if (relative := _relative(info.filename, PurePosixPath(main).parent)) is not None
+        ]
+        if owners:
+            _, main, relative = max(owners)
+            assets[main][info.filename] = relative
+
+    projects = []
+    for name in mains:
+        folder, stem = PurePosixPath(name).parent, PurePosixPath(name).stem
+        match = _TITLE_RE.search(tex[name])
+        fallback = folder.name if stem in ("main", "document") and folder.name else stem
+        title = (match.group(1).strip() if match else "") or fallback
+        projects.append((title[:255], tex[name], assets[name]))
+    return projects
+
+
+def _copy_upload(upload: BinaryIO) -> Path:
+    with tempfile.NamedTemporaryFile(prefix="violeta_import_", suffix=".zip", delete=False) as tmp:
+        shutil.copyfileobj(upload, tmp)
+    path = Path(tmp.name)
+    if not zipfile.is_zipfile(path):
+        path.unlink()
+        raise ValueError("Not a ZIP archive")
+    return path
+
+
+async def save_upload(upload: BinaryIO) -> Path:
+    """Copy an uploaded ZIP to a file ``run_import`` deletes when done."""
+    return await asyncio.to_thread(_copy_upload, upload)
+
+
+def _read_members(path: Path, members: list[str]) -> list[bytes]:
+    with zipfile.ZipFile(path) as archive:
+        return [archive.read(member) for member in members]
+
+
+async def import_projects(session: AsyncSession, job: Job, path: Path) -> dict[str, Any]:
+    """Create one document per LaTeX project in the ZIP at ``path``."""
+    projects = await asyncio.to_thread(_scan, path)
+    await report_progress(session, job, 0, total=len(projects))
+
+    document_ids = []
+    for done, (title, source, members) in enumerate(projects, start=1):
+        # One project's files in memory at a time.
+        files = await asyncio.to_thread(_read_members, path, list(members))
+        assets = []
+        for name, data in zip(members.values(), files):
+            digest = await store_blob(session, data, safe_mime_type(mimetypes.guess_type(name)[0]))
+            assets.append({"filename": name, "src": BLOB_URL_PREFIX + digest})
+        content: dict[str, Any] = {"type": "latex", "source": source}
+        if assets:
+            content["assets"] = assets
+        doc = await add_document(session, job.owner_id, title, content)
+        document_ids.append(str(doc.id))
+        await report_progress(session, job, done)
+    return {"document_ids": document_ids}
+
+
+async def run_import(job_id: uuid.UUID, path: Path):
+    """Run the import job for the archive at ``path``, then delete it.
+
+    The archive goes even if the job never starts (``run_job`` skips jobs
+    that are no longer pending) or fails.
+    """
+    try:
+        await run_job(job_id, functools.partial(import_projects, path=path))
+    finally:
+        await asyncio.to_thread(path.unlink, missing_ok=True)
@@ -0,0 +1,184 @@
+"""Request, database and event-loop instrumentation on top of ``app.metrics``.
+
+``MetricsMiddleware`` times every HTTP request by route template and
+counts the requests in flight. While a request runs, a context variable
+holds its ``RequestStats``; the SQLAlchemy cursor hooks installed by
+``instrument_engine`` add each query's count and time to it, so the
+request's total database work is reported per route. Work done after the
+response is sent (background tasks) is not attributed to the request.
+
+``monitor_event_loop`` measures how late the loop wakes a sleeping task:
+anything blocking the loop (a synchronous call, a CPU-heavy handler)
+shows up as lag for every request on the worker.
+
+With ``settings.otel_enabled`` and the ``opentelemetry`` packages
+installed, ``span`` opens OpenTelemetry spans: one per request, with
+child spans for its queries and subprocesses. Exporting them is left to
+the SDK configuration (e.g. ``opentelemetry-instrument``); without it the
+API's tracer is a no-op.
+"""
+
+import asyncio
+import contextlib
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Any, Iterator
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.config import settings
+from app.metrics import Gauge, Histogram
+
+try:
+    from opentelemetry import trace
+except ImportError:  # optional
+    trace = None
+
+REQUEST_SECONDS = Histogram(
+    "http_request_seconds", "Time from request start to the end of the response body.",
+    ("method", "route", "status"),
+)
+REQUESTS_IN_FLIGHT = Gauge("http_requests_in_flight", "HTTP requests being handled.")
+REQUEST_DB_QUERIES = Histogram(
+    "http_request_db_queries", "Database queries run while handling one request.", ("route",),
+    buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100),
+)
+REQUEST_DB_SECONDS = Histogram(
+    "http_request_db_seconds", "Time one request spent waiting on database queries.", ("route",),
+)
+DB_QUERY_SECONDS = Histogram("db_query_seconds", "Time per database query.", ("pool",))
+EVENT_LOOP_LAG = Histogram(
+    "event_loop_lag_seconds", "How late the event loop woke a sleeping task.",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0),
+)
+
+# Requests that matched no route share one label, so scanners can't add series.
+UNMATCHED_ROUTE = "unmatched"
+
+
+@dataclass
+class RequestStats:
+    queries: int = 0
+    query_seconds: float = 0.0
+
+
+_request_stats: ContextVar[RequestStats | None] = ContextVar("request_stats", default=None)
+
+
+def current_request_stats() -> RequestStats | None:
+    return _request_stats.get()
+
+
+@contextlib.contextmanager
+def span(name: str, **attributes: Any) -> Iterator[Any]:
+    """An OpenTelemetry span around the block, or nothing if tracing is off."""
+    if trace is None or not settings.otel_enabled:
+        yield None
+        return
+    with trace.get_tracer(__name__).start_as_current_span(name, attributes=attributes) as current:
+        yield current
+
+
+def _route(scope: Scope) -> str:
+    route = scope.get("route")
+    return getattr(route, "path", None) or UNMATCHED_ROUTE
+
+
+class MetricsMiddleware:
+    """Per-route latency, requests in flight and database work per request."""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or scope["path"] == "/metrics":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = _request_stats.set(stats)
+        started = time.perf_counter()
+        status = 500
+        finished = False
+
+        def record():
+            nonlocal finished
+            finished = True
+            route = _route(scope)
+            REQUEST_SECONDS.observe(
+                time.perf_counter() - started, method=scope["method"], route=route, status=str(status),
+            )
+            REQUEST_DB_QUERIES.observe(stats.queries, route=route)
+            REQUEST_DB_SECONDS.observe(stats.query_seconds, route=route)
+            REQUESTS_IN_FLIGHT.dec()
+
+        async def send_with_metrics(message: Message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+            if message["type"] == "http.response.body" and not message.get("more_body") and not finished:
+                record()
+                # Background tasks run after this; their queries aren't the request's.
+                _request_stats.set(None)
+
+        REQUESTS_IN_FLIGHT.inc()
+        try:
+            with span(f"{scope['method']} {scope['path']}", **{"http.method": scope["method"]}) as current:
+                await self.app(scope, receive, send_with_metrics)
+                if current is not None:
+                    current.update_name(f"{scope['method']} {_route(scope)}")
+                    current.set_attribute("http.route", _route(scope))
+                    current.set_attribute("http.status_code", status)
+        finally:
+            if not finished:
+                record()
+            _request_stats.reset(token)
+
+
+def instrument_engine(engine: AsyncEngine, name: str):
+    """Time every query on ``engine`` and add it to the current request's stats."""
+
+    @event.listens_for(engine.sync_engine, "before_cursor_execute")
+    def before(conn, cursor, statement, parameters, context, executemany):
+        context._telemetry_span = None
+        if trace is not None and settings.otel_enabled:
+            context._telemetry_span = trace.get_tracer(__name__).start_span(
+                "db.query", attributes={"db.system": engine.dialect.name, "db.statement": statement[:1000]},
+            )
+        context._telemetry_started = time.perf_counter()
+
+    def after(context):
+        started = getattr(context, "_telemetry_started", None)
+        if started is None:
+            return
+        elapsed = time.perf_counter() - started
+        context._telemetry_started = None
+        DB_QUERY_SECONDS.observe(elapsed, pool=name)
+        stats = _request_stats.get()
+        if stats is not None:
+            stats.queries += 1
+            stats.query_seconds += elapsed
+        if context._telemetry_span is not None:
+            context._telemetry_span.end()
+
+    @event.listens_for(engine.sync_engine, "after_cursor_execute")
+    def after_execute(conn, cursor, statement, parameters, context, executemany):
+        after(context)
+
+    @event.listens_for(engine.sync_engine, "handle_error")
+    def on_error(exception_context):
+        if exception_context.execution_context is not None:
+            after(exception_context.execution_context)
+
+
+async def monitor_event_loop(interval: float):
+    """Record event-loop lag every ``interval`` seconds, until cancelled."""
+    loop = asyncio.get_running_loop()
+    while True:
+        expected = loop.time() + interval
+        await asyncio.sleep(interval)
+        EVENT_LOOP_LAG.observe(max(0.0, loop.time() - expected))
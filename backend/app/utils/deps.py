@@ -2,24 +2,62 @@ import uuid
 
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from sqlmodel import select
 from sqlmodel.ext.asyncio.session import AsyncSession
 
 from app.database import get_session
 from app.models.user import User
+from app.services.principals import Principal, token_versions
 from app.utils.security import decode_token
 
 security = HTTPBearer()
 
 
-async def get_current_user(
-    credentials: HTTPAuthorizationCredentials = Depends(security),
-    session: AsyncSession = Depends(get_session),
-) -> User:
-    payload = decode_token(credentials.credentials)
+async def principal_from_token(session: AsyncSession, token: str) -> Principal | None:
+    """The principal for a valid, unrevoked access token, else ``None``.
+
+    Built from the token's claims; the database is read only for the token
+    version on a cache miss, and for the name of tokens issued without one.
+    """
+    payload = decode_token(token)
     user_id = payload.get("sub")
     if not user_id or payload.get("type") != "access":
+        return None
+    user_id = uuid.UUID(user_id)
+    name = payload.get("name")
+    token_version = token_versions.get(user_id)
+    if token_version is None or name is None:
+        epoch = token_versions.epoch
+        result = await session.exec(select(User.name, User.token_version).where(User.id == user_id))
+        row = result.first()
+        if row is None:
+            return None
+        token_version = row.token_version
+        token_versions.put(user_id, token_version, epoch)
+        name = name if name is not None else row.name
+    if payload.get("tv", 0) != token_version:
+        return None
+    return Principal(id=user_id, name=name, token_version=token_version)
+
+
+async def get_current_principal(
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    session: AsyncSession = Depends(get_session),
+) -> Principal:
+    """The caller's id and name; the database is only read on a cache miss."""
+    principal = await principal_from_token(session, credentials.credentials)
+    if principal is None:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
-    user = await session.get(User, uuid.UUID(user_id))
+    return principal
+
+
+async def get_current_user(
+    principal: Principal = Depends(get_current_principal),
+    session: AsyncSession = Depends(get_session),
+) -> User:
+    """The full ``User`` row, for the few handlers that need more than
+    ``get_current_principal`` gives."""
+    user = await session.get(User, principal.id)
     if not user:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found")
     return user
@@ -1,8 +1,7 @@
 from google_auth_oauthlib.flow import Flow
-from google.oauth2.credentials import Credentials
-from google.auth.transport.requests import Request
 
 from app.config import settings
+from app.services.google_drive import TOKEN_URI
 
 SCOPES = [
     "https://www.googleapis.com/auth/drive.file",
@@ -17,7 +16,7 @@ def create_oauth_flow() -> Flow:
                 "client_id": settings.google_client_id,
                 "client_secret": settings.google_client_secret,
                 "auth_uri": "https://accounts.google.com/o/oauth2/auth",
-                "token_uri": "https://oauth2.googleapis.com/token",
+                "token_uri": TOKEN_URI,
             }
         },
         scopes=SCOPES,
@@ -25,15 +24,3 @@ def create_oauth_flow() -> Flow:
     )
     return flow
 
-
-def get_credentials(refresh_token: str) -> Credentials:
-    creds = Credentials(
-        token=None,
-        refresh_token=refresh_token,
-        token_uri="https://oauth2.googleapis.com/token",
-        client_id=settings.google_client_id,
-        client_secret=settings.google_client_secret,
-        scopes=SCOPES,
-    )
-    creds.refresh(Request())
-    return creds
@@ -0,0 +1,255 @@
+"""TipTap JSON from the HTML that Google Docs exports.
+
+``DocHtmlParser`` is fed the HTML piece by piece as it is downloaded and
+builds the document as it goes, so no copy of the whole page is kept.
+Google styles text through classes in the ``<style>`` block (``.c3
+{font-weight:700}``) rather than ``<b>``; the parser reads those rules
+into marks, unwraps ``google.com/url?q=`` links and maps the "title"
+paragraph to a top-level heading. Constructs the editor has no node for
+(tables, nested list levels) are flattened into paragraphs and lists.
+"""
+
+import re
+from html.parser import HTMLParser
+from typing import Any
+from urllib.parse import parse_qs, urlparse
+
+_VOID = {"br", "img", "hr", "meta", "link", "input", "col", "wbr"}
+_SKIP = {"head", "title", "script", "style"}
+_CONTAINERS = {"doc", "blockquote", "listItem"}
+_TEXTBLOCKS = {"paragraph", "heading", "codeBlock"}
+_HEADINGS = {"h1": 1, "h2": 2, "h3": 3, "h4": 4, "h5": 4, "h6": 4}
+_TAG_MARKS = {
+    "b": "bold", "strong": "bold",
+    "i": "italic", "em": "italic",
+    "u": "underline",
+    "s": "strike", "strike": "strike", "del": "strike",
+    "code": "code",
+}
+_CSS_RULE = re.compile(r"\.([\w-]+)\s*\{([^}]*)\}")
+_WHITESPACE = re.compile(r"[ \t\r\n\f]+")
+
+
+def _style_marks(declarations: str) -> set[str]:
+    style = {
+        name.strip().lower(): value.strip().lower()
+        for name, _, value in (part.partition(":") for part in declarations.split(";"))
+    }
+    marks = set()
+    weight = style.get("font-weight", "")
+    if weight == "bold" or (weight.isdigit() and int(weight) >= 600):
+        marks.add("bold")
+    if style.get("font-style") == "italic":
+        marks.add("italic")
+    decoration = style.get("text-decoration", "") + " " + style.get("text-decoration-line", "")
+    if "underline" in decoration:
+        marks.add("underline")
+    if "line-through" in decoration:
+        marks.add("strike")
+    return marks
+
+
+def _unwrap_href(href: str) -> str:
+    """Google routes links through ``https://www.google.com/url?q=<target>``."""
+    parsed = urlparse(href)
+    if parsed.netloc.endswith("google.com") and parsed.path == "/url":
+        target = parse_qs(parsed.query).get("q")
+        if target:
+            return target[0]
+    return href
+
+
+class DocHtmlParser(HTMLParser):
+    """Call ``feed`` with each chunk of HTML, then ``close`` for the document."""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.doc: dict[str, Any] = {"type": "doc", "content": []}
+        self._nodes: list[dict[str, Any]] = [self.doc]
+        # Per open element: (tag, marks it adds, node it opened or None).
+        self._elements: list[tuple[str, dict[str, dict[str, Any]], dict[str, Any] | None]] = []
+        self._class_marks: dict[str, set[str]] = {}
+        self._skipping = 0
+        self._in_style = False
+        self._css: list[str] = []
+
+    # -- building ------------------------------------------------------
+
+    def _open(self, node: dict[str, Any]) -> dict[str, Any]:
+        parent = self._nodes[-1]
+        if parent["type"] in _TEXTBLOCKS:
+            # A block inside a paragraph (Google nests none, but be lenient).
+            self._close(parent)
+            parent = self._nodes[-1]
+        if parent["type"] in ("bulletList", "orderedList") and node["type"] != "listItem":
+            parent = self._open({"type": "listItem", "content": []})
+        parent["content"].append(node)
+        self._nodes.append(node)
+        return node
+
+    def _close(self, node: dict[str, Any]):
+        # By identity: two empty paragraphs compare equal.
+        for index in range(len(self._nodes) - 1, 0, -1):
+            if self._nodes[index] is node:
+                del self._nodes[index:]
+                return
+
+    def _textblock(self) -> dict[str, Any]:
+        top = self._nodes[-1]
+        if top["type"] in _TEXTBLOCKS:
+            return top
+        return self._open({"type": "paragraph", "content": []})
+
+    def _marks(self) -> list[dict[str, Any]]:
+        merged: dict[str, dict[str, Any]] = {}
+        for _, marks, _ in self._elements:
+            merged.update(marks)
+        return [merged[name] for name in sorted(merged)]
+
+    def _add_inline(self, node: dict[str, Any]):
+        content = self._textblock()["content"]
+        if node["type"] == "text" and content and content[-1]["type"] == "text" \
+                and content[-1].get("marks") == node.get("marks"):
+            content[-1]["text"] += node["text"]
+        else:
+            content.append(node)
+
+    # -- HTMLParser hooks ----------------------------------------------
+
+    def handle_starttag(self, tag: str, attrs: list[tuple[str, str | None]]):
+        attributes = {name: value or "" for name, value in attrs}
+        if tag in _SKIP:
+            self._skipping += 1
+            self._in_style = tag == "style"
+            return
+        if self._skipping:
+            return
+        if tag in _VOID:
+            self._void(tag, attributes)
+            return
+
+        marks: dict[str, dict[str, Any]] = {}
+        names = set()
+        for cls in attributes.get("class", "").split():
+            names |= self._class_marks.get(cls, set())
+        names |= _style_marks(attributes.get("style", ""))
+        if tag in _TAG_MARKS:
+            names.add(_TAG_MARKS[tag])
+        for name in names:
+            marks[name] = {"type": name}
+        if tag == "a" and attributes.get("href"):
+            marks["link"] = {"type": "link", "attrs": {"href": _unwrap_href(attributes["href"])}}
+
+        node = None
+        classes = attributes.get("class", "").split()
+        if tag in _HEADINGS:
+            node = self._open({"type": "heading", "attrs": {"level": _HEADINGS[tag]}, "content": []})
+        elif tag == "p" and "title" in classes:
+            node = self._open({"type": "heading", "attrs": {"level": 1}, "content": []})
+        elif tag in ("p", "div", "td", "th", "dt", "dd"):
+            if self._nodes[-1]["type"] not in _TEXTBLOCKS:
+                node = self._open({"type": "paragraph", "content": []})
+        elif tag in ("ul", "ol"):
+            node = self._open({"type": "bulletList" if tag == "ul" else "orderedList", "content": []})
+        elif tag == "li":
+            node = self._open({"type": "listItem", "content": []})
+        elif tag == "blockquote":
+            node = self._open({"type": "blockquote", "content": []})
+        elif tag == "pre":
+            node = self._open({"type": "codeBlock", "content": []})
+        self._elements.append((tag, marks, node))
+
+    def handle_endtag(self, tag: str):
+        if tag in _SKIP:
+            self._skipping = max(0, self._skipping - 1)
+            if tag == "style":
+                self._in_style = False
+                for name, declarations in _CSS_RULE.findall("".join(self._css)):
+                    self._class_marks[name] = _style_marks(declarations)
+                self._css.clear()
+            return
+        if self._skipping or tag in _VOID:
+            return
+        for index in range(len(self._elements) - 1, -1, -1):
+            if self._elements[index][0] == tag:
+                for _, _, node in self._elements[index:]:
+                    if node is not None:
+                        self._close(node)
+                del self._elements[index:]
+                return
+
+    def handle_data(self, data: str):
+        if self._skipping:
+            if self._in_style:
+                self._css.append(data)
+            return
+        top = self._nodes[-1]
+        if top["type"] == "codeBlock":
+            text = data
+        else:
+            text = _WHITESPACE.sub(" ", data)
+            if top["type"] not in _TEXTBLOCKS:
+                text = text.strip()
+            elif not top["content"] or top["content"][-1].get("text", "").endswith(" "):
+                text = text.lstrip(" ")
+        if not text:
+            return
+        node: dict[str, Any] = {"type": "text", "text": text}
+        marks = self._marks() if top["type"] != "codeBlock" else []
+        if marks:
+            node["marks"] = marks
+        self._add_inline(node)
+
+    def _void(self, tag: str, attributes: dict[str, str]):
+        if tag == "br":
+            self._add_inline({"type": "hardBreak"})
+        elif tag == "hr":
+            self._open({"type": "horizontalRule"})
+            self._nodes.pop()
+        elif tag == "img" and attributes.get("src"):
+            node = {"type": "image", "attrs": {"src": attributes["src"], "alt": attributes.get("alt") or None}}
+            top = self._nodes[-1]
+            if top["type"] in _TEXTBLOCKS:
+                # Images are blocks in the editor: split the paragraph around it.
+                self._close(top)
+            self._open(node)
+            self._nodes.pop()
+
+    def close(self) -> dict[str, Any]:
+        super().close()
+        self.doc["content"] = _tidy(self.doc["content"])
+        if not self.doc["content"]:
+            self.doc["content"] = [{"type": "paragraph"}]
+        return self.doc
+
+
+def _tidy(nodes: list[dict[str, Any]]) -> list[dict[str, Any]]:
+    """Drop empty ``content`` and empty lists; give containers a paragraph."""
+    tidy = []
+    for node in nodes:
+        if "content" in node:
+            node["content"] = _tidy(node["content"])
+            if node["type"] in ("paragraph", "heading"):
+                _strip_trailing_space(node["content"])
+            if not node["content"]:
+                if node["type"] in ("bulletList", "orderedList"):
+                    continue
+                if node["type"] in _CONTAINERS:
+                    node["content"] = [{"type": "paragraph"}]
+                else:
+                    del node["content"]
+        tidy.append(node)
+    return tidy
+
+
+def _strip_trailing_space(content: list[dict[str, Any]]):
+    if content and content[-1]["type"] == "text":
+        content[-1]["text"] = content[-1]["text"].rstrip(" ")
+        if not content[-1]["text"]:
+            content.pop()
+
+
+def html_to_tiptap(html: str) -> dict[str, Any]:
+    parser = DocHtmlParser()
+    parser.feed(html)
+    return parser.close()
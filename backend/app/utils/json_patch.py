@@ -0,0 +1,171 @@
+"""Minimal RFC 6902 JSON Patch.
+
+Operations are applied in place to an already-loaded document, so only the
+touched containers are rewritten. JSON columns do not track in-place
+mutation, so callers write the result back explicitly.
+"""
+
+import copy
+from typing import Any
+
+
+class JsonPatchError(ValueError):
+    pass
+
+
+def _parse_pointer(pointer: str) -> list[str]:
+    if pointer == "":
+        return []
+    if not pointer.startswith("/"):
+        raise JsonPatchError(f"Invalid JSON pointer: {pointer!r}")
+    return [token.replace("~1", "/").replace("~0", "~") for token in pointer[1:].split("/")]
+
+
+def _index(container: list, token: str, allow_end: bool = False) -> int:
+    if allow_end and token == "-":
+        return len(container)
+    if not token.isdigit() or (token != "0" and token.startswith("0")):
+        raise JsonPatchError(f"Invalid array index: {token!r}")
+    index = int(token)
+    if index > len(container) or (index == len(container) and not allow_end):
+        raise JsonPatchError(f"Array index out of range: {index}")
+    return index
+
+
+def _resolve(doc: Any, tokens: list[str]) -> Any:
+    for token in tokens:
+        if isinstance(doc, dict):
+            if token not in doc:
+                raise JsonPatchError(f"Path not found: {token!r}")
+            doc = doc[token]
+        elif isinstance(doc, list):
+            doc = doc[_index(doc, token)]
+        else:
+            raise JsonPatchError(f"Cannot descend into scalar at {token!r}")
+    return doc
+
+
+def _add(doc: Any, tokens: list[str], value: Any) -> Any:
+    if not tokens:
+        return value
+    parent = _resolve(doc, tokens[:-1])
+    last = tokens[-1]
+    if isinstance(parent, dict):
+        parent[last] = value
+    elif isinstance(parent, list):
+        parent.insert(_index(parent, last, allow_end=True), value)
+    else:
+        raise JsonPatchError("Cannot add to a scalar")
+    return doc
+
+
+def _remove(doc: Any, tokens: list[str]) -> tuple[Any, Any]:
+    if not tokens:
+        raise JsonPatchError("Cannot remove the document root")
+    parent = _resolve(doc, tokens[:-1])
+    last = tokens[-1]
+    if isinstance(parent, dict):
+        if last not in parent:
+            raise JsonPatchError(f"Path not found: {last!r}")
+        return doc, parent.pop(last)
+    if isinstance(parent, list):
+        return doc, parent.pop(_index(parent, last))
+    raise JsonPatchError("Cannot remove from a scalar")
+
+
+def apply_patch(doc: Any, operations: list[dict[str, Any]]) -> Any:
+    """Apply ``operations`` to ``doc`` and return the result.
+
+    ``doc`` is modified in place where possible. Raises ``JsonPatchError``
+    on any invalid operation; the document may then be partially patched,
+    so callers must discard it.
+    """
+    try:
+        for operation in operations:
+            doc = _apply_one(doc, operation)
+    except KeyError as exc:
+        raise JsonPatchError(f"Missing member {exc} in operation")
+    return doc
+
+
+def _apply_one(doc: Any, operation: dict[str, Any]) -> Any:
+    op = operation.get("op")
+    tokens = _parse_pointer(operation.get("path", ""))
+    if op == "add":
+        doc = _add(doc, tokens, operation["value"])
+    elif op == "remove":
+        doc, _ = _remove(doc, tokens)
+    elif op == "replace":
+        doc, _ = _remove(doc, tokens) if tokens else (doc, None)
+        doc = _add(doc, tokens, operation["value"])
+    elif op == "move":
+        source = _parse_pointer(operation["from"])
+        if tokens[: len(source)] == source and tokens != source:
+            raise JsonPatchError("Cannot move a value into itself")
+        doc, value = _remove(doc, source)
+        doc = _add(doc, tokens, value)
+    elif op == "copy":
+        value = copy.deepcopy(_resolve(doc, _parse_pointer(operation["from"])))
+        doc = _add(doc, tokens, value)
+    elif op == "test":
+        if _resolve(doc, tokens) != operation["value"]:
+            raise JsonPatchError(f"Test failed at {operation.get('path')!r}")
+    else:
+        raise JsonPatchError(f"Unknown operation: {op!r}")
+    return doc
+
+
+def _escape(token: str) -> str:
+    return token.replace("~", "~0").replace("/", "~1")
+
+
+def make_patch(src: Any, dst: Any) -> list[dict[str, Any]]:
+    """Operations that turn ``src`` into ``dst`` (``apply_patch`` inverse).
+
+    Objects are diffed key by key and arrays after trimming their common
+    prefix and suffix, so inserting a paragraph into a long document costs
+    one ``add`` rather than rewriting every paragraph after it.
+    """
+    operations: list[dict[str, Any]] = []
+    _diff(src, dst, "", operations)
+    return operations
+
+
+def _diff(src: Any, dst: Any, path: str, operations: list[dict[str, Any]]):
+    if type(src) is not type(dst):
+        operations.append({"op": "replace", "path": path, "value": copy.deepcopy(dst)})
+    elif isinstance(src, dict):
+        for key in src.keys() - dst.keys():
+            operations.append({"op": "remove", "path": f"{path}/{_escape(key)}"})
+        for key, value in dst.items():
+            child = f"{path}/{_escape(key)}"
+            if key not in src:
+                operations.append({"op": "add", "path": child, "value": copy.deepcopy(value)})
+            else:
+                _diff(src[key], value, child, operations)
+    elif isinstance(src, list):
+        _diff_list(src, dst, path, operations)
+    elif src != dst:
+        operations.append({"op": "replace", "path": path, "value": dst})
+
+
+def _diff_list(src: list, dst: list, path: str, operations: list[dict[str, Any]]):
+    prefix = 0
+    while prefix < min(len(src), len(dst)) and src[prefix] == dst[prefix]:
+        prefix += 1
+    suffix = 0
+    while (
+        suffix < min(len(src), len(dst)) - prefix
+        and src[len(src) - 1 - suffix] == dst[len(dst) - 1 - suffix]
+    ):
+        suffix += 1
+    old = src[prefix:len(src) - suffix]
+    new = dst[prefix:len(dst) - suffix]
+    common = min(len(old), len(new))
+    for i in range(common):
+        _diff(old[i], new[i], f"{path}/{prefix + i}", operations)
+    # Remove from the end so earlier indices stay valid.
+    for i in reversed(range(common, len(old))):
+        operations.append({"op": "remove", "path": f"{path}/{prefix + i}"})
+    for i in range(common, len(new)):
+        operations.append({"op": "add", "path": f"{path}/{prefix + i}", "value": copy.deepcopy(new[i])})
@@ -0,0 +1,254 @@
+"""LaTeX source for document content, for exports.
+
+The editor saves documents as ``{"type": "latex", "source": ...}`` with the
+source it generated itself (``frontend/src/latex/generateLatex.ts``), so
+that source is used as is. Older documents hold bare TipTap JSON; for
+those this module is a port of the same generator, covering the nodes
+and marks the editor produces, with the default document settings.
+"""
+
+import re
+from typing import Any, Callable
+
+_UNICODE_MATH = {
+    "α": r"\alpha", "β": r"\beta", "γ": r"\gamma", "δ": r"\delta", "ε": r"\varepsilon",
+    "ζ": r"\zeta", "η": r"\eta", "θ": r"\theta", "κ": r"\kappa", "λ": r"\lambda",
+    "μ": r"\mu", "ν": r"\nu", "ξ": r"\xi", "π": r"\pi", "ρ": r"\rho", "σ": r"\sigma",
+    "τ": r"\tau", "φ": r"\varphi", "χ": r"\chi", "ψ": r"\psi", "ω": r"\omega",
+    "Γ": r"\Gamma", "Δ": r"\Delta", "Θ": r"\Theta", "Λ": r"\Lambda", "Π": r"\Pi",
+    "Σ": r"\Sigma", "Φ": r"\Phi", "Ψ": r"\Psi", "Ω": r"\Omega",
+    "∞": r"\infty", "∂": r"\partial", "∇": r"\nabla", "±": r"\pm", "×": r"\times",
+    "·": r"\cdot", "≤": r"\leq", "≥": r"\geq", "≠": r"\neq", "≈": r"\approx",
+    "≡": r"\equiv", "⊂": r"\subset", "⊆": r"\subseteq", "∈": r"\in", "∉": r"\notin",
+    "∅": r"\emptyset", "∪": r"\cup", "∩": r"\cap", "→": r"\to", "⇒": r"\Rightarrow",
+    "⇔": r"\Leftrightarrow", "↦": r"\mapsto", "∀": r"\forall", "∃": r"\exists",
+    "∫": r"\int", "∑": r"\sum", "∏": r"\prod", "…": r"\ldots",
+    "ℕ": r"\mathbb{N}", "ℤ": r"\mathbb{Z}", "ℚ": r"\mathbb{Q}", "ℝ": r"\mathbb{R}", "ℂ": r"\mathbb{C}",
+}
+_UNICODE_MATH_RE = re.compile("[" + "".join(_UNICODE_MATH) + "]")
+_SPECIAL_RE = re.compile(r"([#$%&_{}])")
+
+_HEADINGS = {0: "chapter", 1: "section", 2: "subsection", 3: "subsubsection", 4: "paragraph"}
+_THEOREMS = {
+    "theorem": "Teorema", "definition": "Definição", "lemma": "Lema", "corollary": "Corolário",
+    "remark": "Observação", "example": "Exemplo", "exercise": "Exercício",
+    "proposition": "Proposição", "conjecture": "Conjectura", "note": "Nota", "questao": "Questão",
+}
+
+_PREAMBLE = r"""\documentclass[12pt,a4paper]{article}
+
+\usepackage[utf8]{inputenc}
+\usepackage[T1]{fontenc}
+\usepackage[brazilian]{babel}
+\usepackage{amsmath,amssymb,amsfonts}
+\usepackage{graphicx}
+\usepackage{hyperref}
+\usepackage{geometry}
+\usepackage{xspace}
+\geometry{margin=2.5cm}
+"""
+
+
+def _math(latex: str) -> str:
+    return _UNICODE_MATH_RE.sub(lambda match: _UNICODE_MATH[match.group()], latex)
+
+
+def _escape(text: str) -> str:
+    # Backslashes are kept: text may hold LaTeX commands typed by the user.
+    text = text.replace("~", r"\textasciitilde{}").replace("^", r"\textasciicircum{}")
+    return _SPECIAL_RE.sub(r"\\\1", text)
+
+
+def _marks(text: str, marks: list[dict[str, Any]]) -> str:
+    for mark in marks:
+        attrs = mark.get("attrs") or {}
+        kind = mark.get("type")
+        if kind == "bold":
+            text = rf"\textbf{{{text}}}"
+        elif kind == "italic":
+            text = rf"\textit{{{text}}}"
+        elif kind == "underline":
+            text = rf"\underline{{{text}}}"
+        elif kind == "code":
+            text = rf"\texttt{{{text}}}"
+        elif kind == "link":
+            text = rf"\href{{{attrs.get('href', '')}}}{{{text}}}"
+        elif kind == "sourceCommand":
+            text = rf"\{attrs.get('command', '')}{{{text}}}"
+        elif kind == "textStyle" and attrs.get("color"):
+            text = rf"\textcolor{{{attrs['color']}}}{{{text}}}"
+    return text
+
+
+def _inline(node: dict[str, Any]) -> str:
+    parts = []
+    for child in node.get("content") or []:
+        kind, attrs = child.get("type"), child.get("attrs") or {}
+        if kind == "text":
+            parts.append(_marks(_escape(child.get("text", "")), child.get("marks") or []))
+        elif kind == "inlineMath":
+            parts.append("$" + _math(attrs.get("latex", "")).replace("\n", " ") + "$")
+        elif kind == "latexSpacing":
+            parts.append(attrs.get("command", r"\quad"))
+        elif kind == "hardBreak":
+            parts.append(f" \\\\[{attrs['spacing']}]\n" if attrs.get("spacing") else " \\\\\n")
+        elif kind == "rawLatex":
+            parts.append(attrs.get("content", ""))
+        elif kind == "footnote":
+            parts.append(rf"\footnote{{{attrs.get('content', '')}}}")
+    return "".join(parts)
+
+
+def _align(text: str, node: dict[str, Any]) -> str:
+    align = (node.get("attrs") or {}).get("textAlign")
+    if align == "center":
+        return f"\\begin{{center}}\n{text}\n\\end{{center}}"
+    if align == "right":
+        return f"\\begin{{flushright}}\n{text}\n\\end{{flushright}}"
+    return text
+
+
+def _env(name: str, body: str, options: str = "") -> str:
+    return f"\\begin{{{name}}}{options}\n{body}\n\\end{{{name}}}"
+
+
+def _node(node: dict[str, Any], image_name: Callable[[str], str | None]) -> str:
+    kind, attrs = node.get("type"), node.get("attrs") or {}
+    children = node.get("content") or []
+    if kind == "heading":
+        command = _HEADINGS.get(attrs.get("level", 1), "section")
+        return rf"\{command}{'*' if attrs.get('starred') else ''}{{{_inline(node)}}}"
+    if kind == "paragraph":
+        text = _inline(node)
+        return _align(text, node) if text.strip() else ""
+    if kind in ("bulletList", "orderedList"):
+        if kind == "orderedList":
+            env = "enumerate"
+        else:
+            env = "description" if attrs.get("environment") == "description" else "itemize"
+        items = []
+        for item in children:
+            label = (item.get("attrs") or {}).get("label")
+            inner = "\n".join(filter(None, (_node(child, image_name) for child in item.get("content") or [])))
+            items.append(f"  \\item{f'[{label}]' if label and kind == 'bulletList' else ''} {inner}")
+        return _env(env, "\n".join(items), attrs.get("options") or "")
+    if kind == "blockquote":
+        return _env(attrs.get("environment") or "quote", _nodes(children, image_name))
+    if kind == "codeBlock":
+        return _env(attrs.get("environment") or "verbatim", "".join(c.get("text", "") for c in children))
+    if kind == "horizontalRule":
+        return r"\noindent\rule{\textwidth}{0.4pt}"
+    if kind == "image":
+        return _image(attrs, image_name)
+    if kind in ("math", "blockMath"):
+        latex = _math(attrs.get("latex", ""))
+        if attrs.get("environment"):
+            return _env(attrs["environment"], latex)
+        return f"$$\n{latex}\n$$" if attrs.get("format") == "dollars" else f"\\[\n{latex}\n\\]"
+    if kind == "inlineMath":
+        return "$" + _math(attrs.get("latex", "")) + "$"
+    if kind == "mathEnvironment":
+        return _env(attrs.get("environment") or "equation", _math(attrs.get("latex", "")))
+    if kind in ("rawLatex", "tikzFigure", "pgfplotBlock"):
+        key = {"rawLatex": "content", "tikzFigure": "tikzCode", "pgfplotBlock": "pgfCode"}[kind]
+        return _align(attrs.get(key, ""), node)
+    if kind == "latexComment":
+        return attrs.get("content", "")
+    if kind == "layoutBlock":
+        return attrs.get("command", "")
+    if kind == "latexSpacing":
+        return attrs.get("command", r"\quad")
+    if kind == "latexTable":
+        return _table(attrs)
+    if kind == "calloutBlock":
+        title = attrs.get("title") or ""
+        options = f"[{_escape(title)}]" if title.strip() else ""
+        return _env(attrs.get("calloutType") or "theorem", _nodes(children, image_name), options)
+    return _nodes(children, image_name)
+
+
+def _nodes(nodes: list[dict[str, Any]], image_name: Callable[[str], str | None]) -> str:
+    return "\n\n".join(filter(None, (_node(node, image_name) for node in nodes)))
+
+
+def _image(attrs: dict[str, Any], image_name: Callable[[str], str | None]) -> str:
+    src = attrs.get("src") or ""
+    options = attrs.get("options") or r"width=0.8\textwidth"
+    starred = "*" if attrs.get("starred") else ""
+    align ={"left": r"\raggedright", "right": r"\raggedleft"}.get(attrs.get("alignment"), r"\centering")
+    lines = [f"\\begin{{figure{starred}}}[{attrs.get('position') or 'h'}]", f"  {align}"]
+    filename = image_name(src)
+    if filename:
+        lines.append(f"  \\includegraphics[{options}]{{{filename}}}")
+    else:
+        lines.append(f"  % \\includegraphics[{options}]{{imagem.png}}")
+    if attrs.get("alt"):
+        lines.append(f"  \\caption{{{_escape(attrs['alt'])}}}")
+    if attrs.get("label"):
+        lines.append(f"  \\label{{{attrs['label']}}}")
+    lines.append(f"\\end{{figure{starred}}}")
+    return "\n".join(lines)
+
+
+def _table(attrs: dict[str, Any]) -> str:
+    headers = attrs.get("headers") or []
+    rows = attrs.get("rows") or []
+    style = attrs.get("ruleStyle") or "hline"
+    top, mid, bottom = (r"\toprule", r"\midrule", r"\bottomrule") if style == "booktabs" else (r"\hline",) * 3
+    spec = attrs.get("columnSpec") or "{|" + "|".join("c" * len(headers)) + "|}"
+    separator = " \\\\\n    " + ("" if style == "none" else mid + "\n    ")
+    lines = [r"\begin{table}[h]", r"  \centering", f"  \\begin{{tabular}}{spec}"]
+    if style != "none":
+        lines.append(f"    {top}")
+    lines.append("    " + " & ".join(_escape(h) for h in headers) + r" \\")
+    if style != "none":
+        lines.append(f"    {mid}")
+    lines.append("    " + separator.join(" & ".join(_escape(c) for c in row) for row in rows) + r" \\")
+    if style != "none":
+        lines.append(f"    {bottom}")
+    lines.append(r"  \end{tabular}")
+    if (attrs.get("caption") or "").strip():
+        lines.append(f"  \\caption{{{_escape(attrs['caption'])}}}")
+    lines.append(r"\end{table}")
+    return "\n".join(lines)
+
+
+def _walk_types(node: Any, found: set[str]):
+    if isinstance(node, dict):
+        if node.get("type") == "calloutBlock":
+            found.add((node.get("attrs") or {}).get("calloutType") or "theorem")
+        if node.get("type") in ("tikzFigure", "pgfplotBlock"):
+            found.add(node["type"])
+        for child in node.get("content") or []:
+            _walk_types(child, found)
+
+
+def generate_latex(content: dict[str, Any], image_name: Callable[[str], str | None] = lambda src: None) -> str:
+    """Complete ``.tex`` source for ``content``.
+
+    ``image_name`` maps an image ``src`` to the file name it is exported
+    under, or ``None`` when the image is not included.
+    """
+    if content.get("type") == "latex":
+        return str(content.get("source", ""))
+    body = _nodes(content.get("content") or [], image_name)
+
+    found: set[str] = set()
+    _walk_types(content, found)
+    extra = []
+    if r"\textcolor{" in body:
+        extra.append(r"\usepackage{xcolor}")
+    if "tikzFigure" in found or r"\begin{tikzpicture}" in body:
+        extra += [r"\usepackage{tikz}", r"\usetikzlibrary{shapes.geometric}"]
+    if "pgfplotBlock" in found or r"\begin{axis}" in body:
+        extra += [r"\usepackage{pgfplots}", r"\pgfplotsset{compat=1.18}"]
+    theorems = sorted(found - {"tikzFigure", "pgfplotBlock"})
+    if theorems:
+        extra.append(r"\usepackage{amsthm}")
+        for name in theorems:
+            if name == "proof":
+                extra.append(r"\renewcommand{\qedsymbol}{$\blacksquare$}")
+            else:
+                extra.append(rf"\newtheorem{{{name}}}{{{_THEOREMS.get(name, name.capitalize())}}}")
+    preamble = _PREAMBLE + ("\n" + "\n".join(extra) + "\n" if extra else "")
+    return f"{preamble}\n\\begin{{document}}\n\n{body}\n\n\\end{{document}}"
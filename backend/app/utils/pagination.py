@@ -0,0 +1,51 @@
+"""Opaque keyset cursors over ``(created_at, id)``, or ``(rank, id)`` for search.
+
+List endpoints return a plain JSON array and, when the page is full, put
+the cursor for the next page in the ``X-Next-Cursor`` response header.
+"""
+
+import base64
+import math
+import uuid
+from datetime import datetime
+from typing import Callable, Sequence, TypeVar
+
+from fastapi import HTTPException, Response
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+T = TypeVar("T")
+K = TypeVar("K", datetime, float)
+
+
+def _parse_float(value: str) -> float:
+    parsed = float(value)
+    if not math.isfinite(parsed):
+        raise ValueError(value)
+    return parsed
+
+
+def encode_cursor(key: datetime | float, row_id: uuid.UUID) -> str:
+    raw = f"{key.isoformat() if isinstance(key, datetime) else repr(float(key))}|{row_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, key_type: type[K] = datetime) -> tuple[K, uuid.UUID]:
+    """The cursor's key, read as ``key_type``, and row id."""
+    parse = datetime.fromisoformat if key_type is datetime else _parse_float
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        key, row_id = base64.urlsafe_b64decode(padded).decode().split("|")
+        return parse(key), uuid.UUID(row_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def set_next_cursor(
+    response: Response,
+    rows: Sequence[T],
+    limit: int,
+    key: Callable[[T], tuple[datetime | float, uuid.UUID]],
+) -> None:
+    if rows and len(rows) == limit:
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(*key(rows[-1]))
@@ -6,9 +6,13 @@ from jose import jwt, JWTError
 from app.config import settings
 
 
-def hash_password(password: str) -> str:
+# bcrypt is CPU-bound (~100-300 ms): call these through
+# ``app.services.passwords.password_hasher`` from async code.
+
+
+def hash_password(password: str, rounds: int | None = None) -> str:
     password_bytes = password.encode("utf-8")
-    salt = bcrypt.gensalt()
+    salt = bcrypt.gensalt(rounds or settings.bcrypt_rounds)
     return bcrypt.hashpw(password_bytes, salt).decode("utf-8")
 
 
@@ -16,19 +20,33 @@ def verify_password(plain: str, hashed: str) -> bool:
     return bcrypt.checkpw(plain.encode("utf-8"), hashed.encode("utf-8"))
 
 
-def create_access_token(subject: str) -> str:
+def needs_rehash(hashed: str) -> bool:
+    """Whether ``hashed`` was made with a different cost than configured."""
+    try:
+        rounds = int(hashed.split("$")[2])
+    except (IndexError, ValueError):
+        return True
+    return rounds != settings.bcrypt_rounds
+
+
+def create_access_token(subject: str, name: str | None = None, token_version: int = 0) -> str:
+    """``name`` and ``tv`` (token version) let handlers identify the caller
+    without loading the user; see ``app.utils.deps.get_current_principal``."""
     expire = datetime.now(timezone.utc) + timedelta(minutes=settings.access_token_expire_minutes)
+    claims = {"sub": subject, "type": "access", "tv": token_version, "exp": expire}
+    if name is not None:
+        claims["name"] = name
     return jwt.encode(
-        {"sub": subject, "type": "access", "exp": expire},
+        claims,
         settings.jwt_secret,
         algorithm=settings.jwt_algorithm,
     )
 
 
-def create_refresh_token(subject: str) -> str:
+def create_refresh_token(subject: str, token_version: int = 0) -> str:
     expire = datetime.now(timezone.utc) + timedelta(days=settings.refresh_token_expire_days)
     return jwt.encode(
-        {"sub": subject, "type": "refresh", "exp": expire},
+        {"sub": subject, "type": "refresh", "tv": token_version, "exp": expire},
         settings.jwt_secret,
         algorithm=settings.jwt_algorithm,
     )
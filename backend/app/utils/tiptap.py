@@ -0,0 +1,40 @@
+"""Plain text from TipTap/ProseMirror JSON, for indexing."""
+
+import re
+from typing import Any
+
+MAX_TEXT_LENGTH = 500_000
+
+_INLINE_ATTRS = ("latex", "alt")
+_BLANK_LINES = re.compile(r"\n\s*\n+")
+
+
+def extract_text(content: dict[str, Any]) -> str:
+    """Text of every node, one line per block, math as its LaTeX source.
+
+    Documents created from a LaTeX template (``{"type": "latex"}``) are
+    indexed by their source.
+    """
+    if content.get("type") == "latex":
+        return str(content.get("source", ""))[:MAX_TEXT_LENGTH]
+    parts: list[str] = []
+    _walk(content, parts)
+    return _BLANK_LINES.sub("\n", "".join(parts)).strip()[:MAX_TEXT_LENGTH]
+
+
+def _walk(node: Any, parts: list[str]):
+    if not isinstance(node, dict):
+        return
+    text = node.get("text")
+    if isinstance(text, str):
+        parts.append(text)
+    attrs = node.get("attrs")
+    if isinstance(attrs, dict):
+        for name in _INLINE_ATTRS:
+            if isinstance(attrs.get(name), str) and attrs[name]:
+                parts.append(f" {attrs[name]} ")
+    children = node.get("content")
+    if isinstance(children, list):
+        for child in children:
+            _walk(child, parts)
+        parts.append("\n")
@@ -9,7 +9,7 @@ from alembic import context
 from sqlmodel import SQLModel
 
 from app.config import settings
-from app.models import User, Document  # noqa: F401 — ensure models are registered
+import app.models  # noqa: F401 — ensure models are registered
 
 # this is the Alembic Config object, which provides
 # access to the values within the .ini file in use.
@@ -40,7 +40,9 @@ def run_migrations_offline() -> None:
 
 
 def do_run_migrations(connection: Connection) -> None:
-    context.configure(connection=connection, target_metadata=target_metadata)
+    # One transaction per revision, so a revision can step out of it
+    # (``autocommit_block``) for CREATE INDEX CONCURRENTLY.
+    context.configure(connection=connection, target_metadata=target_metadata, transaction_per_migration=True)
 
     with context.begin_transaction():
         context.run_migrations()
@@ -0,0 +1,134 @@
+"""Baseline: the schema the app's startup ``create_all`` first built.
+
+The six original tables with their keys and the indexes that enforce
+uniqueness or back foreign keys. Everything added since is in the next
+revision.
+
+Databases created before migrations existed have no ``alembic_version``
+and some or all of these tables. Tables that already exist are left as
+they are, so such a database needs no ``alembic stamp``: ``alembic upgrade
+head`` brings it to the current schema like an empty one.
+
+Revision ID: 0001_baseline
+Revises:
+Create Date: 2026-10-18
+"""
+from typing import Sequence, Union
+
+from alembic import context, op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "0001_baseline"
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _missing(table: str) -> bool:
+    # ``--sql`` output is for an empty database.
+    return context.is_offline_mode() or not sa.inspect(op.get_bind()).has_table(table)
+
+
+def upgrade() -> None:
+    if _missing("users"):
+        op.create_table("users",
+        sa.Column("id", sa.Uuid(), nullable=False),
+        sa.Column("name", sa.String(length=100), nullable=False),
+        sa.Column("email", sa.String(length=255), nullable=False),
+        sa.Column("password_hash", sa.String(length=255), nullable=False),
+        sa.Column("google_refresh_token", sa.String(), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint("id")
+        )
+        op.create_index(op.f("ix_users_email"), "users", ["email"], unique=True)
+    if _missing("documents"):
+        op.create_table("documents",
+        sa.Column("id", sa.Uuid(), nullable=False),
+        sa.Column("owner_id", sa.Uuid(), nullable=False),
+        sa.Column("title", sa.String(length=255), nullable=False),
+        sa.Column("content", sa.JSON(), nullable=True),
+        sa.Column("is_public", sa.Boolean(), nullable=False),
+        sa.Column("share_token", sa.String(length=64), nullable=True),
+        sa.Column("copied_from_id", sa.Uuid(), nullable=True),
+        sa.Column("google_drive_file_id", sa.String(length=255), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(["copied_from_id"], ["documents.id"], ),
+        sa.ForeignKeyConstraint(["owner_id"], ["users.id"], ),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("share_token")
+        )
+        op.create_index(op.f("ix_documents_owner_id"), "documents", ["owner_id"], unique=False)
+    if _missing("follows"):
+        op.create_table("follows",
+        sa.Column("id", sa.Uuid(), nullable=False),
+        sa.Column("follower_id", sa.Uuid(), nullable=False),
+        sa.Column("following_id", sa.Uuid(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(["follower_id"], ["users.id"], ),
+        sa.ForeignKeyConstraint(["following_id"], ["users.id"], ),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("follower_id", "following_id")
+        )
+        op.create_index(op.f("ix_follows_follower_id"), "follows", ["follower_id"], unique=False)
+        op.create_index(op.f("ix_follows_following_id"), "follows", ["following_id"], unique=False)
+    if _missing("publications"):
+        op.create_table("publications",
+        sa.Column("id", sa.Uuid(), nullable=False),
+        sa.Column("author_id", sa.Uuid(), nullable=False),
+        sa.Column("document_id", sa.Uuid(), nullable=True),
+        sa.Column("title", sa.String(length=255), nullable=False),
+        sa.Column("abstract", sa.String(), nullable=True),
+        sa.Column("type", sa.Enum("article", "exercise_list", "study_material", "proof", name="publicationtype"), nullable=False),
+        sa.Column("pdf_path", sa.String(length=500), nullable=False),
+        sa.Column("thumbnail_path", sa.String(length=500), nullable=False),
+        sa.Column("share_token", sa.String(length=32), nullable=False),
+        sa.Column("like_count", sa.Integer(), nullable=False),
+        sa.Column("comment_count", sa.Integer(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(["author_id"], ["users.id"], ),
+        sa.ForeignKeyConstraint(["document_id"], ["documents.id"], ),
+        sa.PrimaryKeyConstraint("id")
+        )
+        op.create_index(op.f("ix_publications_author_id"), "publications", ["author_id"], unique=False)
+        op.create_index(op.f("ix_publications_share_token"), "publications", ["share_token"], unique=True)
+    if _missing("publication_comments"):
+        op.create_table("publication_comments",
+        sa.Column("id", sa.Uuid(), nullable=False),
+        sa.Column("publication_id", sa.Uuid(), nullable=False),
+        sa.Column("author_id", sa.Uuid(), nullable=False),
+        sa.Column("parent_id", sa.Uuid(), nullable=True),
+        sa.Column("content", sa.String(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(["author_id"], ["users.id"], ),
+        sa.ForeignKeyConstraint(["parent_id"], ["publication_comments.id"], ),
+        sa.ForeignKeyConstraint(["publication_id"], ["publications.id"], ),
+        sa.PrimaryKeyConstraint("id")
+        )
+        op.create_index(op.f("ix_publication_comments_publication_id"), "publication_comments", ["publication_id"], unique=False)
+    if _missing("publication_likes"):
+        op.create_table("publication_likes",
+        sa.Column("id", sa.Uuid(), nullable=False),
+        sa.Column("publication_id", sa.Uuid(), nullable=False),
+        sa.Column("user_id", sa.Uuid(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(["publication_id"], ["publications.id"], ),
+        sa.ForeignKeyConstraint(["user_id"], ["users.id"], ),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("publication_id", "user_id")
+        )
+        op.create_index(op.f("ix_publication_likes_publication_id"), "publication_likes", ["publication_id"], unique=False)
+        op.create_index(op.f("ix_publication_likes_user_id"), "publication_likes", ["user_id"], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_table("publication_likes")
+    op.drop_table("publication_comments")
+    op.drop_table("publications")
+    op.drop_table("follows")
+    op.drop_table("documents")
+    op.drop_table("users")
+    if op.get_bind().dialect.name == "postgresql":
+        op.execute("DROP TYPE IF EXISTS publicationtype")
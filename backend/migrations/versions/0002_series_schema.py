@@ -0,0 +1,246 @@
+"""Tables and columns added to the baseline before migrations existed.
+
+Until then ``create_all`` built the schema at startup: it created tables
+that were missing but never added columns to existing ones. A database
+from that time can therefore be at any point between the baseline and
+this revision. Each table below is created only if it is missing, and
+each column only if its table lacks it. Columns added to tables that
+already have rows get server defaults. The user counters are then counted
+from their source tables.
+
+Two jobs finish upgrading an old database; both may run while the API
+serves traffic:
+
+* ``search_text`` starts out empty on existing rows; fill it with
+  ``python -m app.jobs reindex-search``;
+* images are still inlined as data URLs in old content; move them to the
+  blob store with ``python -m app.jobs extract-blobs``. It writes files
+  under ``BLOB_DIR``, which a migration shouldn't, so it is not done here.
+
+Revision ID: 0002_series_schema
+Revises: 0001_baseline
+Create Date: 2026-10-18
+"""
+from typing import Sequence, Union
+
+from alembic import context, op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "0002_series_schema"
+down_revision: Union[str, None] = "0001_baseline"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+SEARCH_CONFIG = "portuguese"
+
+# Mirrors ``add_search_vector`` in app.database.
+SEARCH_VECTORS = {
+    "documents": {"title": "A", "search_text": "B"},
+    "publications": {"title": "A", "abstract": "B", "search_text": "C"},
+}
+
+ENUMS = ("jobstatus", "notificationtype", "revisionkind")
+
+USER_COUNTERS = ("follower_count", "following_count", "publication_count")
+
+
+def _added_columns() -> dict[str, list[sa.Column]]:
+    """Columns added to the baseline tables, in the order they are added."""
+    return {
+        "users": [
+            sa.Column("token_version", sa.Integer(), server_default="0", nullable=False),
+            sa.Column("follower_count", sa.Integer(), server_default="0", nullable=False),
+            sa.Column("following_count", sa.Integer(), server_default="0", nullable=False),
+            sa.Column("publication_count", sa.Integer(), server_default="0", nullable=False),
+        ],
+        "documents": [
+            # Batch mode needs the constraint named; this is PostgreSQL's default name.
+            sa.Column(
+                "content_hash", sa.String(length=64),
+                sa.ForeignKey("document_contents.hash", name="documents_content_hash_fkey"), nullable=True,
+            ),
+            sa.Column("search_text", sa.Text(), server_default="", nullable=False),
+            sa.Column("version", sa.Integer(), server_default="1", nullable=False),
+        ],
+        "publications": [
+            sa.Column("search_text", sa.Text(), server_default="", nullable=False),
+        ],
+    }
+
+
+def _columns(table: str) -> set[str] | None:
+    """Names of ``table``'s columns, or ``None`` if it doesn't exist.
+
+    ``--sql`` output is for a database at the baseline.
+    """
+    if context.is_offline_mode():
+        return set() if table in _added_columns() else None
+    inspector = sa.inspect(op.get_bind())
+    if not inspector.has_table(table):
+        return None
+    return {column["name"] for column in inspector.get_columns(table)}
+
+
+def _create_tables() -> None:
+    if _columns("blobs") is None:
+        op.create_table("blobs",
+        sa.Column("hash", sa.String(length=64), nullable=False),
+        sa.Column("mime_type", sa.String(length=255), nullable=False),
+        sa.Column("size", sa.Integer(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint("hash")
+        )
+    if _columns("document_contents") is None:
+        op.create_table("document_contents",
+        sa.Column("hash", sa.String(length=64), nullable=False),
+        sa.Column("content", sa.JSON(), nullable=True),
+        sa.Column("ref_count", sa.Integer(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint("hash")
+        )
+    if _columns("drive_files") is None:
+        op.create_table("drive_files",
+        sa.Column("id", sa.Uuid(), nullable=False),
+        sa.Column("owner_id", sa.Uuid(), nullable=False),
+        sa.Column("file_id", sa.String(length=255), nullable=False),
+        sa.Column("name", sa.String(length=1024), nullable=False),
+        sa.Column("modified_time", sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(["owner_id"], ["users.id"], ),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("owner_id", "file_id")
+        )
+    if _columns("drive_sync_states") is None:
+        op.create_table("drive_sync_states",
+        sa.Column("owner_id", sa.Uuid(), nullable=False),
+        sa.Column("page_token", sa.String(length=255), nullable=False),
+        sa.Column("synced_at", sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(["owner_id"], ["users.id"], ),
+        sa.PrimaryKeyConstraint("owner_id")
+        )
+    if _columns("follow_suggestions") is None:
+        op.create_table("follow_suggestions",
+        sa.Column("user_id", sa.Uuid(), nullable=False),
+        sa.Column("candidate_id", sa.Uuid(), nullable=False),
+        sa.Column("mutual_count", sa.Integer(), nullable=False),
+        sa.Column("like_count", sa.Integer(), nullable=False),
+        sa.Column("score", sa.Integer(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(["candidate_id"], ["users.id"], ),
+        sa.ForeignKeyConstraint(["user_id"], ["users.id"], ),
+        sa.PrimaryKeyConstraint("user_id", "candidate_id")
+        )
+    if _columns("jobs") is None:
+        op.create_table("jobs",
+        sa.Column("id", sa.Uuid(), nullable=False),
+        sa.Column("owner_id", sa.Uuid(), nullable=False),
+        sa.Column("kind", sa.String(length=50), nullable=False),
+        sa.Column("status", sa.Enum("pending", "running", "succeeded", "failed", name="jobstatus"), nullable=False),
+        sa.Column("total", sa.Integer(), nullable=False),
+        sa.Column("processed", sa.Integer(), nullable=False),
+        sa.Column("result", sa.JSON(), nullable=True),
+        sa.Column("error", sa.String(), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(["owner_id"], ["users.id"], ),
+        sa.PrimaryKeyConstraint("id")
+        )
+        op.create_index(op.f("ix_jobs_owner_id"), "jobs", ["owner_id"], unique=False)
+    if _columns("notifications") is None:
+        op.create_table("notifications",
+        sa.Column("id", sa.Uuid(), nullable=False),
+        sa.Column("recipient_id", sa.Uuid(), nullable=False),
+        sa.Column("actor_id", sa.Uuid(), nullable=False),
+        sa.Column("type", sa.Enum("like", "comment", "reply", "follow", name="notificationtype"), nullable=False),
+        sa.Column("group_key", sa.String(length=100), nullable=False),
+        sa.Column("publication_id", sa.Uuid(), nullable=True),
+        sa.Column("comment_id", sa.Uuid(), nullable=True),
+        sa.Column("actor_count", sa.Integer(), nullable=False),
+        sa.Column("read_at", sa.DateTime(), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(["actor_id"], ["users.id"], ),
+        sa.ForeignKeyConstraint(["recipient_id"], ["users.id"], ),
+        sa.PrimaryKeyConstraint("id")
+        )
+        op.create_index("uq_notifications_unread_group", "notifications", ["recipient_id", "group_key"], unique=True, postgresql_where=sa.text("read_at IS NULL"), sqlite_where=sa.text("read_at IS NULL"))
+    if _columns("document_revisions") is None:
+        op.create_table("document_revisions",
+        sa.Column("id", sa.Uuid(), nullable=False),
+        sa.Column("document_id", sa.Uuid(), nullable=False),
+        sa.Column("owner_id", sa.Uuid(), nullable=False),
+        sa.Column("version", sa.Integer(), nullable=False),
+        sa.Column("kind", sa.Enum("snapshot", "delta", name="revisionkind"), nullable=False),
+        sa.Column("title", sa.String(length=255), nullable=False),
+        sa.Column("data", sa.LargeBinary(), nullable=False),
+        sa.Column("size", sa.Integer(), nullable=False),
+        sa.Column("chain_length", sa.Integer(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(["document_id"], ["documents.id"], ),
+        sa.ForeignKeyConstraint(["owner_id"], ["users.id"], ),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("document_id", "version", name="uq_document_revisions_document_id_version")
+        )
+
+
+def upgrade() -> None:
+    is_postgres = op.get_bind().dialect.name == "postgresql"
+    if is_postgres:
+        op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+
+    _create_tables()
+
+    # Batch mode: SQLite can only add the foreign key column by rebuilding the table.
+    added: set[tuple[str, str]] = set()
+    for table, columns in _added_columns().items():
+        existing = _columns(table)
+        missing = [column for column in columns if column.name not in existing]
+        if not missing:
+            continue
+        with op.batch_alter_table(table) as batch:
+            for column in missing:
+                batch.add_column(column)
+                added.add((table, column.name))
+
+    if any(("users", name) in added for name in USER_COUNTERS):
+        op.execute(
+            "UPDATE users SET "
+            "follower_count = (SELECT count(*) FROM follows WHERE follows.following_id = users.id), "
+            "following_count = (SELECT count(*) FROM follows WHERE follows.follower_id = users.id), "
+            "publication_count = (SELECT count(*) FROM publications WHERE publications.author_id = users.id)"
+        )
+
+    if is_postgres:
+        for table, weights in SEARCH_VECTORS.items():
+            if "search_vector" in _columns(table):
+                continue
+            expression = " || ".join(
+                f"setweight(to_tsvector('{SEARCH_CONFIG}', coalesce({column}, '')), '{weight}')"
+                for column, weight in weights.items()
+            )
+            op.execute(
+                f"ALTER TABLE {table} ADD COLUMN search_vector tsvector GENERATED ALWAYS AS ({expression}) STORED"
+            )
+
+
+def downgrade() -> None:
+    is_postgres = op.get_bind().dialect.name == "postgresql"
+    if is_postgres:
+        for table in SEARCH_VECTORS:
+            op.drop_column(table, "search_vector")
+    for table, columns in reversed(list(_added_columns().items())):
+        with op.batch_alter_table(table) as batch:
+            for column in reversed(columns):
+                batch.drop_column(column.name)
+
+    op.drop_table("document_revisions")
+    op.drop_table("notifications")
+    op.drop_table("jobs")
+    op.drop_table("follow_suggestions")
+    op.drop_table("drive_sync_states")
+    op.drop_table("drive_files")
+    op.drop_table("document_contents")
+    op.drop_table("blobs")
+    if is_postgres:
+        for name in ENUMS:
+            op.execute(f"DROP TYPE IF EXISTS {name}")
@@ -0,0 +1,95 @@
+"""Indexes for the hot queries.
+
+Each index matches the filter and the sort order of one read path, so the
+query is answered by an index range scan rather than a scan and a sort:
+
+- feeds and explore: publications by ``created_at`` (everyone's and per author)
+- comments: by ``(publication_id, created_at)``, by thread and by parent
+- followers and following lists: follows by either side and ``created_at``
+- shared documents: ``documents(share_token) WHERE is_public``
+- the document list, revisions, notifications, suggestions and Drive index
+- search: the trigram title index and the ``search_vector`` GIN indexes
+
+On PostgreSQL they are built with ``CREATE INDEX CONCURRENTLY``, which does
+not block writes to the table but cannot run inside a transaction. Each
+statement therefore runs in autocommit. A concurrent build that fails leaves
+an INVALID index behind, so it is dropped before the build is retried
+(online only: ``--sql`` output cannot look at the catalog).
+
+Revision ID: 0003_performance_indexes
+Revises: 0002_series_schema
+Create Date: 2026-10-18
+"""
+from typing import Sequence, Union
+
+from alembic import context, op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "0003_performance_indexes"
+down_revision: Union[str, None] = "0002_series_schema"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# name -> (table, columns, extra ``create_index`` options)
+INDEXES: dict[str, tuple[str, list[str], dict]] = {
+    "ix_publications_created_at": ("publications", ["created_at", "id"], {}),
+    "ix_publications_author_id_created_at": ("publications", ["author_id", "created_at", "id"], {}),
+    "ix_publication_comments_publication_id_created_at": (
+        "publication_comments", ["publication_id", "created_at"], {},
+    ),
+    "ix_publication_comments_thread_page": (
+        "publication_comments", ["publication_id", "parent_id", "created_at"], {},
+    ),
+    "ix_publication_comments_parent_id_created_at": ("publication_comments", ["parent_id", "created_at"], {}),
+    "ix_follows_follower_id_created_at": ("follows", ["follower_id", "created_at"], {}),
+    "ix_follows_following_id_created_at": ("follows", ["following_id", "created_at"], {}),
+    "ix_documents_share_token_public": ("documents", ["share_token"], {
+        "postgresql_where": sa.text("is_public"),
+        "sqlite_where": sa.text("is_public"),
+    }),
+    "ix_documents_owner_id_updated_at": ("documents", ["owner_id", "updated_at", "id"], {}),
+    "ix_document_revisions_owner_id_created_at": ("document_revisions", ["owner_id", "created_at"], {}),
+    "ix_notifications_recipient_id_updated_at": ("notifications", ["recipient_id", "updated_at"], {}),
+    "ix_follow_suggestions_user_id_score": ("follow_suggestions", ["user_id", "score"], {}),
+    "ix_drive_files_owner_id_modified_time": ("drive_files", ["owner_id", "modified_time"], {}),
+}
+
+# Only PostgreSQL has these column types and operator classes.
+POSTGRES_INDEXES: dict[str, tuple[str, list[str], dict]] = {
+    "ix_documents_title_trgm": ("documents", ["title"], {
+        "postgresql_using": "gin",
+        "postgresql_ops": {"title": "gin_trgm_ops"},
+    }),
+    "ix_documents_search_vector": ("documents", ["search_vector"], {"postgresql_using": "gin"}),
+    "ix_publications_search_vector": ("publications", ["search_vector"], {"postgresql_using": "gin"}),
+}
+
+_INVALID_INDEX = sa.text(
+    "SELECT 1 FROM pg_index JOIN pg_class ON pg_class.oid = pg_index.indexrelid "
+    "WHERE pg_class.relname = :name AND NOT pg_index.indisvalid"
+)
+
+
+def _indexes(is_postgres: bool) -> dict[str, tuple[str, list[str], dict]]:
+    return {**INDEXES, **POSTGRES_INDEXES} if is_postgres else INDEXES
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    is_postgres = bind.dialect.name == "postgresql"
+    check_invalid = is_postgres and not context.is_offline_mode()
+    with op.get_context().autocommit_block():
+        for name, (table, columns, options) in _indexes(is_postgres).items():
+            if check_invalid and bind.execute(_INVALID_INDEX, {"name": name}).first():
+                op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
+            op.create_index(
+                name, table, columns, postgresql_concurrently=True, if_not_exists=True, **options,
+            )
+
+
+def downgrade() -> None:
+    is_postgres = op.get_bind().dialect.name == "postgresql"
+    with op.get_context().autocommit_block():
+        for name, (table, _, _) in reversed(list(_indexes(is_postgres).items())):
+            op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
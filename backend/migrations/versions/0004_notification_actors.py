@@ -0,0 +1,46 @@
+"""Distinct actors per notification.
+
+``actor_count`` is now counted from this set, so an actor who likes,
+unlikes and likes again counts once. Unread rows get their current actor
+as the only member, and the rest of their count is kept in
+``uncounted_actors``, which later counts add to: "5 people liked" stays at
+least 5 and a retraction never drops the row while others remain.
+
+Revision ID: 0004_notification_actors
+Revises: 0003_performance_indexes
+Create Date: 2026-10-18
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "0004_notification_actors"
+down_revision: Union[str, None] = "0003_performance_indexes"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table("notification_actors",
+    sa.Column("notification_id", sa.Uuid(), nullable=False),
+    sa.Column("actor_id", sa.Uuid(), nullable=False),
+    sa.Column("created_at", sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(["actor_id"], ["users.id"], ),
+    sa.ForeignKeyConstraint(["notification_id"], ["notifications.id"], ),
+    sa.PrimaryKeyConstraint("notification_id", "actor_id")
+    )
+    with op.batch_alter_table("notifications") as batch:
+        batch.add_column(sa.Column("uncounted_actors", sa.Integer(), server_default="0", nullable=False))
+    op.execute(
+        "INSERT INTO notification_actors (notification_id, actor_id, created_at) "
+        "SELECT id, actor_id, updated_at FROM notifications WHERE read_at IS NULL"
+    )
+    op.execute("UPDATE notifications SET uncounted_actors = actor_count - 1 WHERE read_at IS NULL AND actor_count > 1")
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("notifications") as batch:
+        batch.drop_column("uncounted_actors")
+    op.drop_table("notification_actors")
@@ -1,3 +1,6 @@
+import sys
+import uuid
+
 import pytest
 from httpx import AsyncClient, ASGITransport
 from sqlalchemy.ext.asyncio import create_async_engine
@@ -6,12 +9,17 @@ from sqlmodel.ext.asyncio.session import AsyncSession
 from sqlalchemy.orm import sessionmaker
 
 from app.main import app
-from app.database import get_session
+from app import database
+from app.database import get_read_session, get_session
+from app.models.publication import Publication, PublicationType
+from app.services.ratelimit import login_account_limiter, login_ip_limiter, register_ip_limiter
+from app.telemetry import instrument_engine
 
 # Use SQLite for tests
 TEST_DATABASE_URL = "sqlite+aiosqlite:///./test.db"
 test_engine = create_async_engine(TEST_DATABASE_URL, echo=False)
 test_session_maker = sessionmaker(test_engine, class_=AsyncSession, expire_on_commit=False)
+instrument_engine(test_engine, "test")
 
 
 async def get_test_session():
@@ -21,6 +29,7 @@ async def get_test_session():
 
 # Override the dependency
 app.dependency_overrides[get_session] = get_test_session
+app.dependency_overrides[get_read_session] = get_test_session
 
 
 @pytest.fixture(autouse=True)
@@ -32,6 +41,22 @@ async def setup_db():
         await conn.run_sync(SQLModel.metadata.drop_all)
 
 
+@pytest.fixture(autouse=True)
+def use_test_sessions(monkeypatch):
+    """Sessions that the app opens itself (background work) use the test database too."""
+    app_maker = database.async_session
+    for name, module in list(sys.modules.items()):
+        if name.startswith("app.") and getattr(module, "async_session", None) is app_maker:
+            monkeypatch.setattr(module, "async_session", test_session_maker)
+
+
+@pytest.fixture(autouse=True)
+def reset_rate_limits():
+    # Every test client connects from the same address.
+    for limiter in (login_ip_limiter, login_account_limiter, register_ip_limiter):
+        limiter.clear()
+
+
 @pytest.fixture
 async def client():
     transport = ASGITransport(app=app)
@@ -49,3 +74,33 @@ async def auth_headers(client):
     })
     token = login.json()["access_token"]
     return {"Authorization": f"Bearer {token}"}
+
+
+@pytest.fixture
+async def publication(client, auth_headers):
+    """A publication authored by the ``auth_headers`` user, inserted directly
+    so tests don't need poppler to render a thumbnail."""
+    me = await client.get("/api/auth/me", headers=auth_headers)
+    pub = Publication(
+        author_id=uuid.UUID(me.json()["id"]),
+        title="Test Publication",
+        type=PublicationType.article,
+        pdf_path="uploads/publications/test.pdf",
+        thumbnail_path="uploads/publications/test_thumb.png",
+        share_token=uuid.uuid4().hex,
+    )
+    async with test_session_maker() as session:
+        session.add(pub)
+        await session.commit()
+        await session.refresh(pub)
+    return pub
+
+
+async def register_and_login(client, name: str, email: str) -> dict:
+    await client.post("/api/auth/register", json={
+        "name": name, "email": email, "password": "secret123"
+    })
+    login = await client.post("/api/auth/login", json={
+        "email": email, "password": "secret123"
+    })
+    return {"Authorization": f"Bearer {login.json()['access_token']}"}
@@ -1,4 +1,16 @@
+import asyncio
+import uuid
+
 import pytest
+from sqlmodel import select
+
+from app.config import settings
+from app.models.user import User
+from app.services.passwords import HasherBusy, PasswordHasher
+from app.services.principals import CACHE_LOOKUPS, token_versions
+from app.utils.deps import principal_from_token
+from app.utils.security import decode_token
+from tests.conftest import register_and_login, test_session_maker as session_maker
 
 
 @pytest.mark.asyncio
@@ -59,3 +71,153 @@ async def test_me(client):
     resp = await client.get("/api/auth/me", headers={"Authorization": f"Bearer {token}"})
     assert resp.status_code == 200
     assert resp.json()["email"] == "me@example.com"
+
+
+@pytest.mark.asyncio
+async def test_login_rate_limited_per_account(client, monkeypatch):
+    monkeypatch.setattr(settings, "login_account_limit", 2)
+    await client.post("/api/auth/register", json={
+        "name": "Test", "email": "limited@example.com", "password": "secret123"
+    })
+    for _ in range(2):
+        resp = await client.post("/api/auth/login", json={
+            "email": "limited@example.com", "password": "badpassword"
+        })
+        assert resp.status_code == 401
+    resp = await client.post("/api/auth/login", json={
+        "email": "limited@example.com", "password": "secret123"
+    })
+    assert resp.status_code == 429
+    assert int(resp.headers["Retry-After"]) > 0
+
+
+@pytest.mark.asyncio
+async def test_login_ip_limit_counts_clients_behind_the_proxy_apart(client, monkeypatch):
+    monkeypatch.setattr(settings, "login_ip_limit", 1)
+    credentials = {"email": "nobody@example.com", "password": "badpassword"}
+
+    # The test client connects from 127.0.0.1, which is not a trusted proxy.
+    first = await client.post("/api/auth/login", json=credentials, headers={"X-Real-IP": "203.0.113.1"})
+    spoofed = await client.post("/api/auth/login", json=credentials, headers={"X-Real-IP": "203.0.113.2"})
+    assert (first.status_code, spoofed.status_code) == (401, 429)
+
+    monkeypatch.setattr(settings, "trusted_proxies", ["127.0.0.0/8"])
+    alice = await client.post("/api/auth/login", json=credentials, headers={"X-Real-IP": "203.0.113.1"})
+    bob = await client.post("/api/auth/login", json=credentials, headers={"X-Real-IP": "203.0.113.2"})
+    again = await client.post("/api/auth/login", json=credentials, headers={"X-Real-IP": "203.0.113.1"})
+    assert (alice.status_code, bob.status_code, again.status_code) == (401, 401, 429)
+
+
+@pytest.mark.asyncio
+async def test_login_rehashes_with_configured_cost(client, monkeypatch):
+    monkeypatch.setattr(settings, "bcrypt_rounds", 4)
+    await client.post("/api/auth/register", json={
+        "name": "Test", "email": "rehash@example.com", "password": "secret123"
+    })
+    monkeypatch.setattr(settings, "bcrypt_rounds", 5)
+    resp = await client.post("/api/auth/login", json={
+        "email": "rehash@example.com", "password": "secret123"
+    })
+    assert resp.status_code == 200
+    async with session_maker() as session:
+        user = (await session.exec(select(User).where(User.email == "rehash@example.com"))).one()
+    assert user.password_hash.startswith("$2b$05$")
+
+
+@pytest.mark.asyncio
+async def test_password_hasher_refuses_work_beyond_queue_limit(monkeypatch):
+    monkeypatch.setattr(settings, "password_hash_workers", 1)
+    monkeypatch.setattr(settings, "password_hash_queue_limit", 0)
+    monkeypatch.setattr(settings, "bcrypt_rounds", 4)
+    hasher = PasswordHasher()
+    try:
+        first = asyncio.ensure_future(hasher.hash("one"))
+        await asyncio.sleep(0)
+        with pytest.raises(HasherBusy):
+            await hasher.hash("two")
+        assert await hasher.verify("one", await first)
+    finally:
+        hasher.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_metrics_report_hash_latency(client):
+    await client.post("/api/auth/register", json={
+        "name": "Test", "email": "metrics@example.com", "password": "secret123"
+    })
+    resp = await client.get("/metrics")
+    assert resp.status_code == 200
+    assert 'password_hash_seconds_count{operation="hash"}' in resp.text
+    assert "password_hash_in_flight 0" in resp.text
+
+
+@pytest.mark.asyncio
+async def test_access_token_claims_and_principal_cache(client):
+    await client.post("/api/auth/register", json={
+        "name": "Claims", "email": "claims@example.com", "password": "secret123"
+    })
+    login = await client.post("/api/auth/login", json={
+        "email": "claims@example.com", "password": "secret123"
+    })
+    token = login.json()["access_token"]
+    payload = decode_token(token)
+    assert payload["name"] == "Claims" and payload["tv"] == 0
+
+    headers = {"Authorization": f"Bearer {token}"}
+    hits = CACHE_LOOKUPS.value(result="hit")
+    for _ in range(3):
+        assert (await client.get("/api/documents/", headers=headers)).status_code == 200
+    assert CACHE_LOOKUPS.value(result="hit") >= hits + 2
+
+
+@pytest.mark.asyncio
+async def test_principal_comes_from_claims_and_cache_is_evicted_on_commit(client):
+    headers = await register_and_login(client, "Claims", "claims@example.com")
+    token = headers["Authorization"].removeprefix("Bearer ")
+    user_id = uuid.UUID(decode_token(token)["sub"])
+    assert (await client.get("/api/documents/", headers=headers)).status_code == 200
+
+    class NoQueries:
+        async def exec(self, statement):
+            raise AssertionError("queried the database")
+
+    principal = await principal_from_token(NoQueries(), token)
+    assert (principal.id, principal.name, principal.token_version) == (user_id, "Claims", 0)
+
+    async with session_maker() as session:
+        user = await session.get(User, user_id)
+        user.token_version += 1
+        session.add(user)
+        await session.flush()
+        # Not committed yet: other requests must still see the cached version.
+        assert token_versions.get(user_id) == 0
+        await session.commit()
+    assert token_versions.get(user_id) is None
+    async with session_maker() as session:
+        assert await principal_from_token(session, token) is None
+
+
+def test_token_version_read_before_an_eviction_is_not_cached():
+    user_id = uuid.uuid4()
+    epoch = token_versions.epoch
+    token_versions.invalidate(user_id)
+    token_versions.put(user_id, 0, epoch)
+    assert token_versions.get(user_id) is None
+
+
+@pytest.mark.asyncio
+async def test_logout_all_revokes_tokens(client):
+    await client.post("/api/auth/register", json={
+        "name": "Revoke", "email": "revoke@example.com", "password": "secret123"
+    })
+    login = await client.post("/api/auth/login", json={
+        "email": "revoke@example.com", "password": "secret123"
+    })
+    headers = {"Authorization": f"Bearer {login.json()['access_token']}"}
+    refresh_cookie = login.cookies["refresh_token"]
+    assert (await client.get("/api/documents/", headers=headers)).status_code == 200
+
+    assert (await client.post("/api/auth/logout-all", headers=headers)).status_code == 200
+    assert (await client.get("/api/documents/", headers=headers)).status_code == 401
+    client.cookies.set("refresh_token", refresh_cookie)
+    assert (await client.post("/api/auth/refresh")).status_code == 401
@@ -0,0 +1,128 @@
+import copy
+import uuid
+
+import pytest
+
+from app.models.document import Document
+from app.services.collab import CollabRoom, collab_hub as hub
+from app.utils.json_patch import JsonPatchError
+from tests.conftest import test_session_maker as session_maker
+
+
+class FakeSocket:
+    def __init__(self):
+        self.sent = []
+
+    async def send_json(self, message):
+        self.sent.append(message)
+
+
+def _paragraph(text):
+    return {"type": "paragraph", "content": [{"type": "text", "text": text}]}
+
+
+def _room():
+    return CollabRoom(uuid.uuid4(), uuid.uuid4(), {"type": "doc", "content": [_paragraph("a")]})
+
+
+def test_room_applies_steps_in_order_and_rejects_stale_ones():
+    room = _room()
+    add = [{"op": "add", "path": "/content/-", "value": _paragraph("b")}]
+
+    message = room.receive(0, "alice", add)
+    assert message["version"] == 1
+    assert message["steps"] == [{"version": 1, "client_id": "alice", "ops": add}]
+    assert len(room.content["content"]) == 2
+
+    # Bob edited version 0 too; he has to catch up and rebase first.
+    assert room.receive(0, "bob", add) is None
+    assert room.version == 1
+
+
+def test_room_failed_patch_leaves_state_unchanged():
+    room = _room()
+    room.receive(0, "alice", [{"op": "add", "path": "/content/-", "value": _paragraph("b")}])
+    before = [block["content"][0]["text"] for block in room.content["content"]]
+
+    with pytest.raises(JsonPatchError):
+        room.receive(1, "alice", [
+            {"op": "add", "path": "/content/-", "value": _paragraph("c")},
+            {"op": "remove", "path": "/missing"},
+        ])
+
+    assert [block["content"][0]["text"] for block in room.content["content"]] == before
+    assert room.version == 1
+
+
+def test_room_replay_after_bad_op_does_not_repeat_nested_edits():
+    room = _room()
+    add = [{"op": "add", "path": "/content/-", "value": {"type": "paragraph", "content": []}}]
+    room.receive(0, "alice", add)
+    room.receive(1, "alice", [{"op": "add", "path": "/content/1/content/-", "value": {"type": "text", "text": "x"}}])
+    expected = copy.deepcopy(room.content)
+
+    with pytest.raises(JsonPatchError):
+        room.receive(2, "alice", [{"op": "remove", "path": "/missing"}])
+    assert room.content == expected
+    # Logged steps are what the clients sent, for reconnecting clients too.
+    assert room.hello(room.id, 0)["steps"][0]["ops"] == [
+        {"op": "add", "path": "/content/-", "value": {"type": "paragraph", "content": []}},
+    ]
+
+
+def test_reconnect_gets_only_missed_steps():
+    room = _room()
+    for version in range(3):
+        room.receive(version, "alice", [{"op": "add", "path": "/content/-", "value": _paragraph(str(version))}])
+
+    hello = room.hello(room.id, 1)
+    assert hello["type"] == "steps"
+    assert [step["version"] for step in hello["steps"]] == [2, 3]
+    assert room.hello(room.id, 3)["steps"] == []
+
+    # Unknown room (e.g. the server restarted) or no position: full snapshot.
+    assert room.hello("other", 1)["type"] == "snapshot"
+    snapshot = room.hello(None, None)
+    assert snapshot["version"] == 3 and len(snapshot["content"]["content"]) == 4
+
+
+async def test_room_checkpoints_to_document(client, auth_headers):
+    created = await client.post("/api/documents/", json={
+        "title": "Live", "content": {"type": "doc", "content": [_paragraph("a")]},
+    }, headers=auth_headers)
+    doc_id = uuid.UUID(created.json()["id"])
+    alice, bob = FakeSocket(), FakeSocket()
+
+    async with session_maker() as session:
+        doc = await session.get(Document, doc_id)
+        room = await hub.join(session, doc, alice)
+        assert await hub.join(session, doc, bob) is room
+        assert doc_id in hub
+
+        message = room.receive(0, "alice", [{"op": "add", "path": "/content/-", "value": _paragraph("hi")}])
+        await room.broadcast(message)
+        assert alice.sent == bob.sent == [message]
+
+        # Content edits over REST wait until the live session ends.
+        conflict = await client.patch(
+            f"/api/documents/{doc_id}",
+            json=[{"op": "add", "path": "/content/-", "value": _paragraph("x")}],
+            headers={**auth_headers, "If-Match": '"1"'},
+        )
+        assert conflict.status_code == 409
+
+        # Reads see the live state.
+        fetched = await client.get(f"/api/documents/{doc_id}", headers=auth_headers)
+        assert fetched.json()["content"]["content"][-1] == _paragraph("hi")
+        assert fetched.json()["version"] == 2
+        assert not await room.checkpoint(session)
+
+        room.receive(1, "bob", [{"op": "add", "path": "/content/-", "value": _paragraph("bye")}])
+        await hub.leave(session, room, alice)
+        assert doc_id in hub
+        await hub.leave(session, room, bob)
+        assert doc_id not in hub
+
+    fetched = await client.get(f"/api/documents/{doc_id}", headers=auth_headers)
+    assert fetched.json()["content"]["content"][-1] == _paragraph("bye")
+    assert fetched.json()["version"] == 3
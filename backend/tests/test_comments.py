@@ -0,0 +1,60 @@
+import pytest
+
+
+async def _comment(client, headers, pub_id, content, parent_id=None):
+    payload = {"content": content}
+    if parent_id:
+        payload["parent_id"] = parent_id
+    resp = await client.post(f"/api/publications/{pub_id}/comments", json=payload, headers=headers)
+    assert resp.status_code == 201
+    return resp.json()["id"]
+
+
+@pytest.mark.asyncio
+async def test_threads_with_batched_replies(client, auth_headers, publication):
+    first = await _comment(client, auth_headers, publication.id, "first")
+    second = await _comment(client, auth_headers, publication.id, "second")
+    third = await _comment(client, auth_headers, publication.id, "third")
+    for i in range(4):
+        await _comment(client, auth_headers, publication.id, f"reply {i}", parent_id=first)
+
+    resp = await client.get(
+        f"/api/publications/{publication.id}/threads?limit=2&replies=2", headers=auth_headers
+    )
+    assert resp.status_code == 200
+    threads = resp.json()
+    assert [t["id"] for t in threads] == [first, second]
+    assert threads[0]["reply_count"] == 4
+    assert [r["content"] for r in threads[0]["replies"]] == ["reply 0", "reply 1"]
+    assert threads[1]["reply_count"] == 0
+
+    cursor = resp.headers["X-Next-Cursor"]
+    resp = await client.get(
+        f"/api/publications/{publication.id}/threads?limit=2&cursor={cursor}", headers=auth_headers
+    )
+    assert [t["id"] for t in resp.json()] == [third]
+
+
+@pytest.mark.asyncio
+async def test_list_replies_paginated(client, auth_headers, publication):
+    parent = await _comment(client, auth_headers, publication.id, "parent")
+    for i in range(3):
+        await _comment(client, auth_headers, publication.id, f"reply {i}", parent_id=parent)
+
+    resp = await client.get(f"/api/comments/{parent}/replies?limit=2", headers=auth_headers)
+    assert [r["content"] for r in resp.json()] == ["reply 0", "reply 1"]
+    cursor = resp.headers["X-Next-Cursor"]
+    resp = await client.get(f"/api/comments/{parent}/replies?limit=2&cursor={cursor}", headers=auth_headers)
+    assert [r["content"] for r in resp.json()] == ["reply 2"]
+
+
+@pytest.mark.asyncio
+async def test_cannot_reply_to_reply(client, auth_headers, publication):
+    parent = await _comment(client, auth_headers, publication.id, "parent")
+    reply = await _comment(client, auth_headers, publication.id, "reply", parent_id=parent)
+    resp = await client.post(
+        f"/api/publications/{publication.id}/comments",
+        json={"content": "nested", "parent_id": reply},
+        headers=auth_headers,
+    )
+    assert resp.status_code == 400
@@ -1,4 +1,24 @@
+import asyncio
+import base64
+import hashlib
+import uuid
+from datetime import datetime, timedelta
+
 import pytest
+from sqlalchemy import update
+from sqlmodel import select
+
+from app.config import settings
+from app.models.blob import Blob
+from app.models.document import Document, DocumentContent
+from app.models.revision import DocumentRevision
+from app.services import autosave
+from app.services.autosave import DocumentSaveBuffer, VersionConflict, document_saves
+from app.services.blobs import BLOB_GRACE, blob_path, extract_document_blobs, prune_blobs, store_blob
+from app.services.collab import collab_hub
+from app.services.contents import store_content
+from app.services.history import prune_history
+from tests.conftest import test_session_maker as session_maker
 
 
 @pytest.mark.asyncio
@@ -35,6 +55,8 @@ async def test_update_document(client, auth_headers):
     doc_id = create.json()["id"]
     resp = await client.put(f"/api/documents/{doc_id}", json={"title": "New"}, headers=auth_headers)
     assert resp.status_code == 200
+    assert resp.json() == {"version": 2}
+    resp = await client.get(f"/api/documents/{doc_id}", headers=auth_headers)
     assert resp.json()["title"] == "New"
 
 
@@ -49,7 +71,13 @@ async def test_delete_document(client, auth_headers):
 
 
 @pytest.mark.asyncio
-async def test_cannot_access_other_users_document(client, auth_headers):
+async def test_cannot_access_other_users_document(client, auth_headers, monkeypatch):
+    checkpoints = []
+
+    async def checkpoint(session, doc_id):
+        checkpoints.append(doc_id)
+
+    monkeypatch.setattr(collab_hub, "checkpoint", checkpoint)
     create = await client.post("/api/documents/", json={"title": "Private"}, headers=auth_headers)
     doc_id = create.json()["id"]
     await client.post("/api/auth/register", json={
@@ -61,3 +89,338 @@ async def test_cannot_access_other_users_document(client, auth_headers):
     other_headers = {"Authorization": f"Bearer {login.json()['access_token']}"}
     resp = await client.get(f"/api/documents/{doc_id}", headers=other_headers)
     assert resp.status_code == 404
+    # Nobody else's read writes the owner's live edits back.
+    assert checkpoints == []
+
+
+@pytest.mark.asyncio
+async def test_patch_document_with_version(client, auth_headers):
+    create = await client.post("/api/documents/", json={
+        "title": "Patch Me",
+        "content": {"type": "doc", "content": [{"type": "paragraph", "content": [{"type": "text", "text": "a"}]}]}
+    }, headers=auth_headers)
+    doc_id = create.json()["id"]
+    assert create.json()["version"] == 1
+
+    resp = await client.patch(f"/api/documents/{doc_id}", json=[
+        {"op": "replace", "path": "/content/0/content/0/text", "value": "ab"},
+        {"op": "add", "path": "/content/-", "value": {"type": "paragraph"}},
+    ], headers={**auth_headers, "If-Match": '"1"'})
+    assert resp.status_code == 200
+    assert resp.json() == {"version": 2}
+    assert resp.headers["ETag"] == '"2"'
+
+    doc = (await client.get(f"/api/documents/{doc_id}", headers=auth_headers)).json()
+    assert doc["content"]["content"][0]["content"][0]["text"] == "ab"
+    assert doc["content"]["content"][1] == {"type": "paragraph"}
+
+    stale = await client.patch(f"/api/documents/{doc_id}", json=[
+        {"op": "remove", "path": "/content/1"},
+    ], headers={**auth_headers, "If-Match": '"1"'})
+    assert stale.status_code == 409
+
+
+@pytest.mark.asyncio
+async def test_patch_document_requires_valid_patch(client, auth_headers):
+    create = await client.post("/api/documents/", json={"title": "P"}, headers=auth_headers)
+    doc_id = create.json()["id"]
+    resp = await client.patch(f"/api/documents/{doc_id}", json=[], headers=auth_headers)
+    assert resp.status_code == 428
+    resp = await client.patch(f"/api/documents/{doc_id}", json=[
+        {"op": "remove", "path": "/missing"},
+    ], headers={**auth_headers, "If-Match": '"1"'})
+    assert resp.status_code == 422
+
+
+@pytest.mark.asyncio
+async def test_autosave_coalesces_writes(client, auth_headers, monkeypatch):
+    monkeypatch.setattr(settings, "document_write_behind", True)
+    create = await client.post("/api/documents/", json={"title": "Draft"}, headers=auth_headers)
+    doc_id = create.json()["id"]
+
+    for i in range(3):
+        resp = await client.put(f"/api/documents/{doc_id}", json={
+            "content": {"type": "doc", "content": [{"type": "text", "text": str(i)}]}
+        }, headers=auth_headers)
+        assert resp.json() == {"version": i + 2}
+    resp = await client.patch(f"/api/documents/{doc_id}", json=[
+        {"op": "replace", "path": "/content/0/text", "value": "3"},
+    ], headers={**auth_headers, "If-Match": '"4"'})
+    assert resp.json() == {"version": 5}
+
+    # Nothing written yet
+    async with session_maker() as session:
+        doc = await session.get(Document, uuid.UUID(doc_id))
+        assert doc.version == 1
+
+    # Reads force a flush
+    resp = await client.get(f"/api/documents/{doc_id}", headers=auth_headers)
+    assert resp.json()["version"] == 5
+    assert resp.json()["content"]["content"][0]["text"] == "3"
+    assert uuid.UUID(doc_id) not in document_saves
+
+
+@pytest.mark.asyncio
+async def test_embedded_images_move_to_blob_store(client, auth_headers, tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "blob_dir", str(tmp_path))
+    png = b"\x89PNG\r\n\x1a\nfake image bytes"
+    data_url = "data:image/png;base64," + base64.b64encode(png).decode()
+    image = {"type": "image", "attrs": {"src": data_url, "assetFilename": "a.png"}}
+
+    create = await client.post("/api/documents/", json={
+        "title": "Figures", "content": {"type": "doc", "content": [image, image]},
+    }, headers=auth_headers)
+    nodes = create.json()["content"]["content"]
+    src = nodes[0]["attrs"]["src"]
+    assert src == "/api/blobs/" + hashlib.sha256(png).hexdigest()
+    assert nodes[1]["attrs"]["src"] == src
+
+    # Same image in another document is stored once
+    other = await client.post("/api/documents/", json={"title": "Other"}, headers=auth_headers)
+    resp = await client.put(f"/api/documents/{other.json()['id']}", json={
+        "content": {"type": "doc", "content": [image]},
+    }, headers=auth_headers)
+    assert resp.status_code == 200
+    assert len(list(tmp_path.rglob("*"))) == 2  # one shard dir, one file
+
+    blob = await client.get(src)
+    assert blob.status_code == 200
+    assert blob.content == png
+    assert blob.headers["content-type"] == "image/png"
+    assert "immutable" in blob.headers["cache-control"]
+    assert (await client.get("/api/blobs/" + "0" * 64)).status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_only_raster_images_become_blobs(client, auth_headers, tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "blob_dir", str(tmp_path))
+    html = "data:text/html;base64," + base64.b64encode(b"<script>alert(1)</script>").decode()
+    svg = "data:image/svg+xml;base64," + base64.b64encode(b"<svg onload='alert(1)'/>").decode()
+    create = await client.post("/api/documents/", json={"title": "Evil", "content": {"type": "doc", "content": [
+        {"type": "image", "attrs": {"src": html}}, {"type": "image", "attrs": {"src": svg}},
+    ]}}, headers=auth_headers)
+    assert [node["attrs"]["src"] for node in create.json()["content"]["content"]] == [html, svg]
+    assert not list(tmp_path.rglob("*"))
+
+    # A blob stored with an unsafe type before the allowlist is only a download.
+    async with session_maker() as session:
+        digest = await store_blob(session, b"<script>alert(1)</script>", "image/png")
+        await session.exec(update(Blob).where(Blob.hash == digest).values(mime_type="text/html"))
+        await session.commit()
+    resp = await client.get(f"/api/blobs/{digest}")
+    assert resp.headers["content-type"] == "application/octet-stream"
+    assert resp.headers["content-disposition"].startswith("attachment")
+    assert resp.headers["x-content-type-options"] == "nosniff"
+    assert "sandbox" in resp.headers["content-security-policy"]
+
+
+@pytest.mark.asyncio
+async def test_extract_blobs_job(client, auth_headers, tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "blob_dir", str(tmp_path))
+    create = await client.post("/api/documents/", json={"title": "Legacy"}, headers=auth_headers)
+    doc_id = uuid.UUID(create.json()["id"])
+    data_url = "data:image/gif;base64," + base64.b64encode(b"GIF89a").decode()
+    legacy = {"type": "doc", "content": [{"type": "image", "attrs": {"src": data_url}}]}
+    async with session_maker() as session:
+        doc = await session.get(Document, doc_id)
+        doc.content = legacy
+        session.add(doc)
+        # Two copies sharing legacy content from before blobs.
+        shared_hash = await store_content(session, {**legacy, "shared": True}, references=2)
+        copies = [
+            Document(owner_id=doc.owner_id, title=f"Copy {n}", content=None, content_hash=shared_hash) for n in range(2)
+        ]
+        session.add_all(copies)
+        await session.commit()
+        copy_ids = [copy.id for copy in copies]
+
+        assert await extract_document_blobs(session) == 3
+        assert await extract_document_blobs(session) == 0
+        stored = (await session.exec(select(DocumentContent.hash, DocumentContent.ref_count))).all()
+    assert len(stored) == 1 and stored[0][0] != shared_hash and stored[0][1] == 2
+
+    for id_ in (doc_id, *copy_ids):
+        resp = await client.get(f"/api/documents/{id_}", headers=auth_headers)
+        assert resp.json()["content"]["content"][0]["attrs"]["src"].startswith("/api/blobs/")
+        assert resp.headers["ETag"] == '"2"'
+    versions = (await client.get(f"/api/documents/{doc_id}/versions", headers=auth_headers)).json()
+    assert [version["version"] for version in versions] == [2, 1]
+
+
+@pytest.mark.asyncio
+async def test_prune_blobs_keeps_referenced_and_recent_blobs(client, auth_headers, tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "blob_dir", str(tmp_path))
+    image = "data:image/png;base64," + base64.b64encode(b"\x89PNG kept").decode()
+    create = await client.post("/api/documents/", json={
+        "title": "Images", "content": {"type": "doc", "content": [{"type": "image", "attrs": {"src": image}}]},
+    }, headers=auth_headers)
+    doc_id = create.json()["id"]
+    # Only the first revision still refers to the image.
+    await client.put(f"/api/documents/{doc_id}", json={"content": _paragraphs("a")}, headers=auth_headers)
+    async with session_maker() as session:
+        in_history = (await session.exec(select(Blob.hash))).one()
+        orphan = await store_blob(session, b"\x89PNG orphan", "image/png")
+        recent = await store_blob(session, b"\x89PNG recent", "image/png")
+        old = datetime.utcnow() - BLOB_GRACE - timedelta(minutes=1)
+        await session.exec(update(Blob).where(Blob.hash != recent).values(created_at=old))
+        await session.commit()
+
+        assert await prune_blobs(session) == 1
+        remaining = set((await session.exec(select(Blob.hash))).all())
+    assert remaining == {in_history, recent}
+    assert not blob_path(orphan).exists()
+    assert blob_path(in_history).exists()
+
+
+def _paragraphs(*texts):
+    return {"type": "doc", "content": [{"type": "paragraph", "text": t} for t in texts]}
+
+
+@pytest.mark.asyncio
+async def test_version_history_and_restore(client, auth_headers, monkeypatch):
+    monkeypatch.setattr(settings, "history_snapshot_interval", 2)
+    create = await client.post("/api/documents/", json={
+        "title": "History", "content": _paragraphs("a"),
+    }, headers=auth_headers)
+    doc_id = create.json()["id"]
+    for texts in [("a", "b"), ("a", "b", "c"), ("x", "b", "c"), ("x", "c")]:
+        await client.put(f"/api/documents/{doc_id}", json={"content": _paragraphs(*texts)}, headers=auth_headers)
+
+    resp = await client.get(f"/api/documents/{doc_id}/versions", headers=auth_headers)
+    assert [v["version"] for v in resp.json()] == [5, 4, 3, 2, 1]
+
+    async with session_maker() as session:
+        result = await session.exec(
+            select(DocumentRevision.version, DocumentRevision.kind)
+            .where(DocumentRevision.document_id == uuid.UUID(doc_id))
+            .order_by(DocumentRevision.version)
+        )
+        kinds = [kind.value for _, kind in result.all()]
+    assert kinds == ["snapshot", "delta", "delta", "snapshot", "delta"]
+
+    resp = await client.get(f"/api/documents/{doc_id}/versions/3", headers=auth_headers)
+    assert resp.json()["content"] == _paragraphs("a", "b", "c")
+
+    resp = await client.post(f"/api/documents/{doc_id}/versions/2/restore", headers=auth_headers)
+    assert resp.json() == {"version": 6}
+    doc = (await client.get(f"/api/documents/{doc_id}", headers=auth_headers)).json()
+    assert doc["content"] == _paragraphs("a", "b")
+
+    # A size cap drops whole chains, oldest first, keeping the current one
+    monkeypatch.setattr(settings, "history_max_bytes_per_user", 1)
+    async with session_maker() as session:
+        assert await prune_history(session) == 3
+    resp = await client.get(f"/api/documents/{doc_id}/versions", headers=auth_headers)
+    assert [v["version"] for v in resp.json()] == [6, 5, 4]
+    resp = await client.get(f"/api/documents/{doc_id}/versions/5", headers=auth_headers)
+    assert resp.json()["content"] == _paragraphs("x", "c")
+    resp = await client.get(f"/api/documents/{doc_id}/versions/1", headers=auth_headers)
+    assert resp.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_list_documents_paginates_and_searches(client, auth_headers):
+    for title in ["Algebra notes", "Linear algebra", "Calculus", "100% done", "Physics"]:
+        await client.post("/api/documents/", json={"title": title}, headers=auth_headers)
+
+    first = await client.get("/api/documents/?limit=3", headers=auth_headers)
+    assert [d["title"] for d in first.json()] == ["Physics", "100% done", "Calculus"]
+    assert "content" not in first.json()[0]
+    cursor = first.headers["X-Next-Cursor"]
+    second = await client.get(f"/api/documents/?limit=3&cursor={cursor}", headers=auth_headers)
+    assert [d["title"] for d in second.json()] == ["Linear algebra", "Algebra notes"]
+    assert "X-Next-Cursor" not in second.headers
+
+    resp = await client.get("/api/documents/?q=ALGEBRA", headers=auth_headers)
+    assert [d["title"] for d in resp.json()] == ["Linear algebra", "Algebra notes"]
+    resp = await client.get("/api/documents/?q=%25", headers=auth_headers)
+    assert [d["title"] for d in resp.json()] == ["100% done"]
+
+
+@pytest.mark.asyncio
+async def test_buffered_saves_from_two_workers_conflict(client, auth_headers, monkeypatch):
+    monkeypatch.setattr(settings, "document_write_behind", True)
+    create = await client.post("/api/documents/", json={"title": "Draft"}, headers=auth_headers)
+    doc_id = uuid.UUID(create.json()["id"])
+    owner_id = (await client.get("/api/auth/me", headers=auth_headers)).json()["id"]
+
+    def retitle(title):
+        def edit(entry):
+            entry.title = title
+        return edit
+
+    # Two workers each buffer a save on version 1; both acknowledge version 2.
+    first, second = DocumentSaveBuffer(), DocumentSaveBuffer()
+    async with session_maker() as session:
+        assert await first.stage(session, doc_id, uuid.UUID(owner_id), 1, retitle("First")) == 2
+        assert await second.stage(session, doc_id, uuid.UUID(owner_id), 1, retitle("Second")) == 2
+        assert await first.flush(session) == 1
+        with pytest.raises(VersionConflict):
+            await second.flush(session, raise_on_conflict=True)
+        assert doc_id not in second
+
+        doc = await session.get(Document, doc_id, populate_existing=True)
+        assert (doc.title, doc.version) == ("First", 2)
+        revisions = await session.exec(select(DocumentRevision).where(DocumentRevision.document_id == doc_id))
+        assert [revision.version for revision in revisions.all()] == [1, 2]
+
+    # Lost in the background: the next save on that worker is told to reload.
+    third = DocumentSaveBuffer()
+    async with session_maker() as session:
+        await third.stage(session, doc_id, uuid.UUID(owner_id), 2, retitle("Third"))
+        await first.stage(session, doc_id, uuid.UUID(owner_id), 2, retitle("Again"))
+        await first.flush(session)
+        assert await third.flush(session) == 0
+        with pytest.raises(VersionConflict):
+            await third.stage(session, doc_id, uuid.UUID(owner_id), 2, retitle("Third"))
+        assert await third.stage(session, doc_id, uuid.UUID(owner_id), 3, retitle("Third")) == 4
+
+
+@pytest.mark.asyncio
+async def test_flushing_one_document_does_not_wait_for_another(client, auth_headers):
+    owner_id = uuid.UUID((await client.get("/api/auth/me", headers=auth_headers)).json()["id"])
+    ids = []
+    for title in ("Busy", "Free"):
+        create = await client.post("/api/documents/", json={"title": title}, headers=auth_headers)
+        ids.append(uuid.UUID(create.json()["id"]))
+    busy, free = ids
+
+    def retitle(entry):
+        entry.title = entry.title + "!"
+
+    buffer = DocumentSaveBuffer()
+    async with session_maker() as session:
+        for doc_id in ids:
+            await buffer.stage(session, doc_id, owner_id, None, retitle)
+    # A flush of "Busy" is in flight; "Free" is written without waiting for it.
+    async with buffer._locked([busy]):
+        async with session_maker() as session:
+            assert await asyncio.wait_for(buffer.flush(session, [free]), timeout=5) == 1
+            assert await buffer.flush(session, []) == 0
+    assert free not in buffer and busy in buffer
+    assert buffer._locks == {}
+
+
+@pytest.mark.asyncio
+async def test_failed_write_through_leaves_no_staged_save(client, auth_headers, monkeypatch):
+    create = await client.post("/api/documents/", json={"title": "Fragile"}, headers=auth_headers)
+    doc_id = create.json()["id"]
+
+    async def broken(session, saves):
+        raise RuntimeError("database went away")
+
+    monkeypatch.setattr(autosave, "record_revisions", broken)
+    with pytest.raises(RuntimeError):
+        await client.patch(f"/api/documents/{doc_id}", json=[
+            {"op": "add", "path": "/note", "value": "lost"},
+        ], headers={**auth_headers, "If-Match": '"1"'})
+    assert uuid.UUID(doc_id) not in document_saves
+    monkeypatch.undo()
+
+    # The client retries the same save on the same version.
+    retry = await client.patch(f"/api/documents/{doc_id}", json=[
+        {"op": "add", "path": "/other", "value": "kept"},
+    ], headers={**auth_headers, "If-Match": '"1"'})
+    assert retry.json() == {"version": 2}
+    doc = (await client.get(f"/api/documents/{doc_id}", headers=auth_headers)).json()
+    assert (doc["content"], doc["version"]) == ({"other": "kept"}, 2)
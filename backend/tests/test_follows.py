@@ -0,0 +1,196 @@
+import pytest
+
+from app.models.user import User
+from app.services.counters import reconcile_user_counters
+from app.services.suggestions import rebuild_suggestions
+from tests.conftest import register_and_login, test_session_maker as session_maker
+
+
+async def _user_id(client, headers) -> str:
+    return (await client.get("/api/auth/me", headers=headers)).json()["id"]
+
+
+@pytest.mark.asyncio
+async def test_follow_updates_profile_counts(client, auth_headers):
+    other = await register_and_login(client, "Other", "other@example.com")
+    other_id = await _user_id(client, other)
+    me_id = await _user_id(client, auth_headers)
+
+    resp = await client.post(f"/api/users/{other_id}/follow", headers=auth_headers)
+    assert resp.json() == {"following": True}
+
+    profile = (await client.get(f"/api/users/{other_id}/profile", headers=auth_headers)).json()
+    assert profile["follower_count"] == 1
+    assert profile["following_count"] == 0
+    assert profile["is_following"] is True
+
+    mine = (await client.get(f"/api/users/{me_id}/profile", headers=auth_headers)).json()
+    assert mine["following_count"] == 1
+
+    resp = await client.post(f"/api/users/{other_id}/follow", headers=auth_headers)
+    assert resp.json() == {"following": False}
+    profile = (await client.get(f"/api/users/{other_id}/profile", headers=auth_headers)).json()
+    assert profile["follower_count"] == 0
+    assert profile["is_following"] is False
+
+
+@pytest.mark.asyncio
+async def test_follow_self_and_missing_user(client, auth_headers):
+    me_id = await _user_id(client, auth_headers)
+    resp = await client.post(f"/api/users/{me_id}/follow", headers=auth_headers)
+    assert resp.status_code == 400
+    resp = await client.post(
+        "/api/users/00000000-0000-0000-0000-000000000000/follow", headers=auth_headers
+    )
+    assert resp.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_reconcile_user_counters(client, auth_headers, publication):
+    me_id = await _user_id(client, auth_headers)
+    async with session_maker() as session:
+        user = await session.get(User, publication.author_id)
+        user.follower_count = 7
+        session.add(user)
+        await session.commit()
+
+        assert await reconcile_user_counters(session) == 1
+
+    profile = (await client.get(f"/api/users/{me_id}/profile", headers=auth_headers)).json()
+    assert profile["follower_count"] == 0
+    assert profile["publication_count"] == 1
+
+
+@pytest.mark.asyncio
+async def test_followers_paginated_with_viewer_flag(client, auth_headers):
+    me_id = await _user_id(client, auth_headers)
+    follower_ids = []
+    for i in range(3):
+        headers = await register_and_login(client, f"F{i}", f"f{i}@example.com")
+        follower_ids.append(await _user_id(client, headers))
+        await client.post(f"/api/users/{me_id}/follow", headers=headers)
+    # I follow back only the first follower
+    await client.post(f"/api/users/{follower_ids[0]}/follow", headers=auth_headers)
+
+    page1 = await client.get(f"/api/users/{me_id}/followers?limit=2", headers=auth_headers)
+    assert page1.status_code == 200
+    assert [row["id"] for row in page1.json()] == [follower_ids[2], follower_ids[1]]
+    cursor = page1.headers["X-Next-Cursor"]
+
+    page2 = await client.get(
+        f"/api/users/{me_id}/followers?limit=2&cursor={cursor}", headers=auth_headers
+    )
+    rows = page2.json()
+    assert [row["id"] for row in rows] == [follower_ids[0]]
+    assert rows[0]["is_following"] is True
+    assert "X-Next-Cursor" not in page2.headers
+
+    following = await client.get(f"/api/users/{me_id}/following", headers=auth_headers)
+    assert [row["id"] for row in following.json()] == [follower_ids[0]]
+
+
+@pytest.mark.asyncio
+async def test_followers_invalid_cursor(client, auth_headers):
+    me_id = await _user_id(client, auth_headers)
+    resp = await client.get(f"/api/users/{me_id}/followers?cursor=bogus", headers=auth_headers)
+    assert resp.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_suggestions_from_follow_graph_and_likes(client, auth_headers, publication):
+    # auth_headers user ("Test") authored ``publication``.
+    author_id = await _user_id(client, auth_headers)
+    alice = await register_and_login(client, "Alice", "alice@example.com")
+    bob = await register_and_login(client, "Bob", "bob@example.com")
+    carol = await register_and_login(client, "Carol", "carol@example.com")
+    bob_id = await _user_id(client, bob)
+    carol_id = await _user_id(client, carol)
+
+    # Bob follows Carol; Alice then follows Bob -> Carol suggested to Alice.
+    await client.post(f"/api/users/{carol_id}/follow", headers=bob)
+    await client.post(f"/api/users/{bob_id}/follow", headers=alice)
+    # Alice likes the author's publication -> author suggested too.
+    await client.post(f"/api/publications/{publication.id}/like", headers=alice)
+
+    resp = await client.get("/api/users/suggestions", headers=alice)
+    assert resp.status_code == 200
+    rows = {row["id"]: row for row in resp.json()}
+    assert rows[carol_id]["mutual_count"] == 1
+    assert rows[author_id]["like_count"] == 1
+    assert bob_id not in rows
+
+    # Following a suggestion removes it; unliking drops the like signal.
+    await client.post(f"/api/users/{carol_id}/follow", headers=alice)
+    await client.post(f"/api/publications/{publication.id}/like", headers=alice)
+    resp = await client.get("/api/users/suggestions", headers=alice)
+    assert resp.json() == []
+
+
+@pytest.mark.asyncio
+async def test_rebuild_suggestions_matches_incremental(client, auth_headers):
+    alice = await register_and_login(client, "Alice", "alice@example.com")
+    bob = await register_and_login(client, "Bob", "bob@example.com")
+    bob_id = await _user_id(client, bob)
+    me_id = await _user_id(client, auth_headers)
+    await client.post(f"/api/users/{me_id}/follow", headers=bob)
+    await client.post(f"/api/users/{bob_id}/follow", headers=alice)
+    before = (await client.get("/api/users/suggestions", headers=alice)).json()
+
+    async with session_maker() as session:
+        assert await rebuild_suggestions(session) == 1
+
+    after = (await client.get("/api/users/suggestions", headers=alice)).json()
+    assert after == before
+
+
+@pytest.mark.asyncio
+async def test_unfollow_restores_candidate_and_cap_applies(client, auth_headers, publication, monkeypatch):
+    author_id = await _user_id(client, auth_headers)
+    alice = await register_and_login(client, "Alice", "alice@example.com")
+    dave = await register_and_login(client, "Dave", "dave@example.com")
+    bob = await register_and_login(client, "Bob", "bob@example.com")
+    dave_id = await _user_id(client, dave)
+    bob_id = await _user_id(client, bob)
+
+    # Dave follows Bob; Alice follows Dave and Bob, then unfollows Bob.
+    await client.post(f"/api/users/{bob_id}/follow", headers=dave)
+    await client.post(f"/api/users/{dave_id}/follow", headers=alice)
+    await client.post(f"/api/users/{bob_id}/follow", headers=alice)
+    assert (await client.get("/api/users/suggestions", headers=alice)).json() == []
+    await client.post(f"/api/users/{bob_id}/follow", headers=alice)
+    incremental = (await client.get("/api/users/suggestions", headers=alice)).json()
+    assert [(row["id"], row["mutual_count"]) for row in incremental] == [(bob_id, 1)]
+
+    async with session_maker() as session:
+        await rebuild_suggestions(session)
+    assert (await client.get("/api/users/suggestions", headers=alice)).json() == incremental
+
+    # With room for one suggestion, the weaker new like signal is trimmed.
+    monkeypatch.setattr("app.services.suggestions.SUGGESTIONS_PER_USER", 1)
+    await client.post(f"/api/publications/{publication.id}/like", headers=alice)
+    rows = (await client.get("/api/users/suggestions", headers=alice)).json()
+    assert [row["id"] for row in rows] == [bob_id]
+    assert author_id not in {row["id"] for row in rows}
+
+
+@pytest.mark.asyncio
+async def test_trimmed_candidate_comes_back_with_its_full_count(client, monkeypatch):
+    monkeypatch.setattr("app.services.suggestions.SUGGESTIONS_PER_USER", 1)
+    alice = await register_and_login(client, "Alice", "alice@example.com")
+    bob_id = await _user_id(client, await register_and_login(client, "Bob", "bob@example.com"))
+    carol_id = await _user_id(client, await register_and_login(client, "Carol", "carol@example.com"))
+    friends = [await register_and_login(client, name, f"{name.lower()}@example.com") for name in ("Dave", "Erin", "Fred")]
+    for friend in friends:
+        await client.post(f"/api/users/{await _user_id(client, friend)}/follow", headers=alice)
+
+    # Bob leads with two mutuals, so each single follow of Carol is trimmed.
+    for friend in friends[:2]:
+        await client.post(f"/api/users/{bob_id}/follow", headers=friend)
+    for friend in friends:
+        await client.post(f"/api/users/{carol_id}/follow", headers=friend)
+
+    rows = (await client.get("/api/users/suggestions", headers=alice)).json()
+    assert [(row["id"], row["mutual_count"]) for row in rows] == [(carol_id, 3)]
+    async with session_maker() as session:
+        await rebuild_suggestions(session)
+    assert (await client.get("/api/users/suggestions", headers=alice)).json() == rows
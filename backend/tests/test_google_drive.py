@@ -0,0 +1,302 @@
+import asyncio
+import base64
+import json
+
+import httpx
+import pytest
+from sqlmodel import select
+
+from app.config import settings
+from app.models.drive_file import DriveFile, DriveSyncState
+from app.models.user import User
+from app.routers import google_drive as google_drive_router
+from app.services import drive_import, drive_index
+from app.services.blobs import BLOB_URL_PREFIX
+from app.services.google_drive import TOKEN_URI, DriveAuthError, DriveClient
+from app.utils.google_html import DocHtmlParser
+from tests.conftest import test_session_maker as session_maker
+
+
+DOC_HTML = (
+    '<html><head><style type="text/css">.c1{font-weight:700}</style></head><body>'
+    '<p class="title"><span>{name}</span></p>'
+    '<p><span>Texto </span><span class="c1">forte</span></p>'
+    '<ul class="lst-kix_a-0"><li><span>um</span></li></ul></body></html>'
+)
+
+
+class FakeGoogle:
+    """Stands in for Google: the token endpoint and the Drive calls we use."""
+
+    def __init__(self, delay: float = 0):
+        self.files = {"f1": "Notas", "f2": "Aula 2", "f3": "Aula 3"}
+        self.html = DOC_HTML
+        # The changes feed: a page token is an index into this list.
+        self.changes: list[dict] = []
+        self.delay = delay
+        self.requests: list[httpx.Request] = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.revoked = False
+        # ``list_files`` fails for the page starting at this index.
+        self.failing_page: int | None = None
+
+    async def __call__(self, request: httpx.Request) -> httpx.Response:
+        self.requests.append(request)
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.delay)
+            if str(request.url) == TOKEN_URI:
+                if self.revoked:
+                    return httpx.Response(400, json={"error": "invalid_grant"})
+                return httpx.Response(200, json={"access_token": "access-1", "expires_in": 3600})
+            assert request.headers["Authorization"] == "Bearer access-1"
+            if request.url.path == "/batch/drive/v3":
+                return self.batch(request)
+            if request.url.path.endswith("/export"):
+                file_id = request.url.path.split("/")[-2]
+                if file_id not in self.files:
+                    return httpx.Response(404)
+                return httpx.Response(200, text=self.html.replace("{name}", self.files[file_id]))
+            if request.url.path.startswith("/upload/"):
+                assert request.headers["Content-Type"].startswith("multipart/related; boundary=")
+                return httpx.Response(200, json={"id": "new-file"})
+            if request.url.path == "/drive/v3/files":
+                return self.list_files(request)
+            if request.url.path == "/drive/v3/changes/startPageToken":
+                return httpx.Response(200, json={"startPageToken": str(len(self.changes))})
+            if request.url.path == "/drive/v3/changes":
+                return self.list_changes(request)
+            return httpx.Response(200, json={"name": self.files[request.url.path.split("/")[-1]]})
+        finally:
+            self.in_flight -= 1
+
+    def batch(self, request: httpx.Request) -> httpx.Response:
+        boundary = request.headers["Content-Type"].split("boundary=")[1]
+        parts = []
+        for part in request.content.decode().split(f"--{boundary}")[1:-1]:
+            content_id = part.split("Content-ID: <")[1].split(">")[0]
+            file_id = part.split("GET /drive/v3/files/")[1].split("?")[0]
+            if file_id in self.files:
+                status, body = "200 OK", json.dumps({"id": file_id, "name": self.files[file_id]})
+            else:
+                status, body = "404 Not Found", json.dumps({"error": {"code": 404}})
+            parts.append(
+                f"--batch_x\r\nContent-Type: application/http\r\nContent-ID: <response-{content_id}>\r\n\r\n"
+                f"HTTP/1.1 {status}\r\nContent-Type: application/json\r\n\r\n{body}\r\n"
+            )
+        return httpx.Response(
+            200, content=("".join(parts) + "--batch_x--\r\n").encode(),
+            headers={"Content-Type": "multipart/mixed; boundary=batch_x"},
+        )
+
+    def list_files(self, request: httpx.Request) -> httpx.Response:
+        # Two per page, to exercise pagination.
+        ids = sorted(self.files)
+        start = int(request.url.params.get("pageToken", 0))
+        if start == self.failing_page:
+            return httpx.Response(500)
+        page = {"files": [
+            {"id": file_id, "name": self.files[file_id], "modifiedTime": f"2024-01-0{index + 1}T10:00:00.000Z"}
+            for index, file_id in enumerate(ids) if start <= index < start + 2
+        ]}
+        if start + 2 < len(ids):
+            page["nextPageToken"] = str(start + 2)
+        return httpx.Response(200, json=page)
+
+    def list_changes(self, request: httpx.Request) -> httpx.Response:
+        token = request.url.params["pageToken"]
+        if not token.isdigit() or int(token) > len(self.changes):
+            return httpx.Response(404, json={"error": {"code": 404}})
+        return httpx.Response(200, json={
+            "changes": self.changes[int(token):], "newStartPageToken": str(len(self.changes)),
+        })
+
+    def token_refreshes(self) -> int:
+        return sum(1 for request in self.requests if str(request.url) == TOKEN_URI)
+
+
+@pytest.fixture
+def google(monkeypatch):
+    fake = FakeGoogle(delay=0.01)
+    drive = DriveClient(transport=httpx.MockTransport(fake))
+    monkeypatch.setattr(google_drive_router, "drive_client", drive)
+    monkeypatch.setattr(drive_import, "drive_client", drive)
+    monkeypatch.setattr(drive_index, "drive_client", drive)
+    return fake
+
+
+async def connect_drive(email: str = "doc@example.com"):
+    async with session_maker() as session:
+        user = (await session.exec(select(User).where(User.email == email))).one()
+        user.google_refresh_token = "refresh-1"
+        session.add(user)
+        await session.commit()
+
+
+async def test_access_token_is_cached_and_refreshed_once():
+    fake = FakeGoogle(delay=0.01)
+    drive = DriveClient(transport=httpx.MockTransport(fake))
+    tokens = await asyncio.gather(*(drive.access_token("refresh-1") for _ in range(5)))
+    assert tokens == ["access-1"] * 5
+    await drive.start_page_token("refresh-1")
+    assert fake.token_refreshes() == 1
+
+    fake.revoked = True
+    with pytest.raises(DriveAuthError):
+        await drive.access_token("other-refresh-token")
+    await drive.aclose()
+
+
+async def test_import_fetches_html_and_name_concurrently(client, auth_headers, google):
+    await connect_drive()
+    response = await client.post("/api/google/import/f1", headers=auth_headers)
+    assert response.status_code == 200
+    assert response.json()["title"] == "Notas"
+    assert response.json()["google_drive_file_id"] == "f1"
+    assert response.json()["content"]["content"][0] == {
+        "type": "heading", "attrs": {"level": 1}, "content": [{"type": "text", "text": "Notas"}],
+    }
+    assert google.max_in_flight == 2
+    assert google.token_refreshes() == 1
+
+    exported = await client.post(f"/api/google/export/{response.json()['id']}", headers=auth_headers)
+    assert exported.json() == {"google_drive_file_id": "new-file"}
+    assert google.token_refreshes() == 1
+
+
+async def test_revoked_drive_access_asks_to_reconnect(client, auth_headers, google):
+    not_connected = await client.get("/api/google/files", headers=auth_headers)
+    assert not_connected.status_code == 400
+    await connect_drive()
+    google.revoked = True
+    response = await client.get("/api/google/files", headers=auth_headers)
+    assert response.status_code == 400
+    assert "reconnect" in response.json()["detail"]
+
+
+def test_html_parser_builds_editor_json_from_chunks():
+    html = DOC_HTML.replace("{name}", "Aula")
+    parser = DocHtmlParser()
+    for start in range(0, len(html), 5):
+        parser.feed(html[start:start + 5])
+    assert parser.close()["content"][1:] == [
+        {"type": "paragraph", "content": [
+            {"type": "text", "text": "Texto "},
+            {"type": "text", "text": "forte", "marks": [{"type": "bold"}]},
+        ]},
+        {"type": "bulletList", "content": [
+            {"type": "listItem", "content": [{"type": "paragraph", "content": [{"type": "text", "text": "um"}]}]},
+        ]},
+    ]
+
+
+async def test_batch_import_job_reports_each_file(client, auth_headers, google, monkeypatch):
+    monkeypatch.setattr(settings, "drive_import_concurrency", 2)
+    await connect_drive()
+    response = await client.post(
+        "/api/google/import", json={"file_ids": ["f1", "f2", "missing", "f3", "f1"]}, headers=auth_headers,
+    )
+    assert response.status_code == 202
+    job = (await client.get(f"/api/jobs/{response.json()['id']}", headers=auth_headers)).json()
+    assert job["kind"] == "drive_import"
+    assert job["status"] == "succeeded"
+    assert job["processed"] == job["total"] == 4
+    outcomes = {entry["file_id"]: entry for entry in job["result"]["files"]}
+    assert outcomes["missing"]["error"] == "File not found"
+    assert len(job["result"]["document_ids"]) == 3
+    # One batch request for the names; exports never exceed the limit.
+    assert sum(1 for request in google.requests if request.url.path == "/batch/drive/v3") == 1
+    assert google.max_in_flight <= 2
+
+    doc = (await client.get(f"/api/documents/{outcomes['f2']['document_id']}", headers=auth_headers)).json()
+    assert doc["title"] == "Aula 2"
+    assert doc["google_drive_file_id"] == "f2"
+
+    too_many = await client.post(
+        "/api/google/import", json={"file_ids": [f"f{i}" for i in range(201)]}, headers=auth_headers,
+    )
+    assert too_many.status_code == 400
+
+
+async def test_full_sync_commits_pages_and_writes_state_last(client, auth_headers, google):
+    await connect_drive()
+    google.failing_page = 2
+    failed = await client.get("/api/google/files", headers=auth_headers)
+    assert failed.status_code == 502
+    async with session_maker() as session:
+        indexed = (await session.exec(select(DriveFile.file_id))).all()
+        assert sorted(indexed) == ["f1", "f2"]
+        assert (await session.exec(select(DriveSyncState))).first() is None
+
+    google.failing_page = None
+    listed = await client.get("/api/google/files", headers=auth_headers)
+    assert [file["id"] for file in listed.json()] == ["f3", "f2", "f1"]
+    assert drive_index._locks == {}
+
+
+async def test_drive_imports_store_images_as_blobs_and_record_a_revision(
+    client, auth_headers, google, tmp_path, monkeypatch,
+):
+    monkeypatch.setattr(settings, "blob_dir", str(tmp_path))
+    image = base64.b64encode(b"\x89PNG drive image").decode()
+    google.html = DOC_HTML.replace("</body>", f'<p><img src="data:image/png;base64,{image}"></p></body>')
+    await connect_drive()
+    single = (await client.post("/api/google/import/f1", headers=auth_headers)).json()
+    job = await client.post("/api/google/import", json={"file_ids": ["f2"]}, headers=auth_headers)
+    job = (await client.get(f"/api/jobs/{job.json()['id']}", headers=auth_headers)).json()
+
+    for doc_id in (single["id"], job["result"]["document_ids"][0]):
+        doc = (await client.get(f"/api/documents/{doc_id}", headers=auth_headers)).json()
+        src = doc["content"]["content"][-1]["attrs"]["src"]
+        assert src.startswith(BLOB_URL_PREFIX)
+        versions = (await client.get(f"/api/documents/{doc_id}/versions", headers=auth_headers)).json()
+        assert [version["version"] for version in versions] == [1]
+
+
+async def test_file_listing_serves_from_index_kept_current_by_changes(client, auth_headers, google, monkeypatch):
+    await connect_drive()
+    first = await client.get("/api/google/files", params={"limit": 2}, headers=auth_headers)
+    assert first.status_code == 200
+    assert [file["id"] for file in first.json()] == ["f3", "f2"]
+    assert first.json()[0]["modifiedTime"] == "2024-01-03T10:00:00"
+    rest = await client.get(
+        "/api/google/files", params={"cursor": first.headers["X-Next-Cursor"]}, headers=auth_headers,
+    )
+    assert [file["id"] for file in rest.json()] == ["f1"]
+    listed = sum(1 for request in google.requests if request.url.path == "/drive/v3/files")
+    assert listed == 2
+
+    # Fresh index: answered without calling Google.
+    before = len(google.requests)
+    search = await client.get("/api/google/files", params={"q": "aula"}, headers=auth_headers)
+    assert {file["id"] for file in search.json()} == {"f2", "f3"}
+    assert len(google.requests) == before
+
+    google.changes += [
+        {"changeType": "file", "fileId": "f2", "removed": True},
+        {"changeType": "file", "fileId": "f4", "file": {
+            "id": "f4", "name": "Aula 4", "mimeType": "application/vnd.google-apps.document",
+            "modifiedTime": "2024-02-01T10:00:00Z",
+        }},
+        {"changeType": "file", "fileId": "f5", "file": {
+            "id": "f5", "name": "planilha", "mimeType": "application/vnd.google-apps.spreadsheet",
+        }},
+    ]
+    monkeypatch.setattr(settings, "drive_sync_interval_seconds", 0)
+    # Stale: this answer comes from the index, the sync runs after it.
+    stale = await client.get("/api/google/files", headers=auth_headers)
+    assert [file["id"] for file in stale.json()] == ["f3", "f2", "f1"]
+    synced = await client.get("/api/google/files", headers=auth_headers)
+    assert [file["id"] for file in synced.json()] == ["f4", "f3", "f1"]
+    assert sum(1 for request in google.requests if request.url.path == "/drive/v3/files") == 2
+
+    # An expired page token rebuilds the index from a full listing.
+    async with session_maker() as session:
+        state = (await session.exec(select(drive_index.DriveSyncState))).one()
+        state.page_token = "expired"
+        session.add(state)
+        await session.commit()
+    rebuilt = await client.get("/api/google/files", params={"refresh": True}, headers=auth_headers)
+    assert [file["id"] for file in rebuilt.json()] == ["f3", "f2", "f1"]
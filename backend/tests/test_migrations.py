@@ -0,0 +1,109 @@
+import uuid
+from pathlib import Path
+
+import sqlalchemy as sa
+from alembic import command
+from alembic.autogenerate import compare_metadata
+from alembic.config import Config
+from alembic.migration import MigrationContext
+from sqlmodel import SQLModel
+
+from app.config import settings
+
+BACKEND = Path(__file__).resolve().parent.parent
+
+
+def alembic_config(path: Path, monkeypatch) -> Config:
+    monkeypatch.setattr(settings, "database_url", f"sqlite+aiosqlite:///{path}")
+    config = Config(str(BACKEND / "alembic.ini"))
+    config.set_main_option("script_location", str(BACKEND / "migrations"))
+    return config
+
+
+def schema_diffs(conn: sa.Connection) -> list[str]:
+    diffs = compare_metadata(MigrationContext.configure(conn), SQLModel.metadata)
+    return [diff[1].name for diff in diffs]
+
+
+def test_migrations_build_the_schema_the_models_describe(tmp_path, monkeypatch):
+    path = tmp_path / "migrated.db"
+    config = alembic_config(path, monkeypatch)
+
+    command.upgrade(config, "head")
+    engine = sa.create_engine(f"sqlite:///{path}")
+    with engine.connect() as conn:
+        diffs = schema_diffs(conn)
+        indexes = {index["name"] for index in sa.inspect(conn).get_indexes("documents")}
+    # The trigram index is PostgreSQL-only.
+    assert diffs == ["ix_documents_title_trgm"]
+    assert "ix_documents_share_token_public" in indexes
+
+    command.downgrade(config, "base")
+    with engine.connect() as conn:
+        assert sa.inspect(conn).get_table_names() == ["alembic_version"]
+    engine.dispose()
+
+
+def test_database_from_before_migrations_upgrades_without_a_stamp(tmp_path, monkeypatch):
+    path = tmp_path / "old.db"
+    config = alembic_config(path, monkeypatch)
+    # What the original startup create_all left: the baseline tables, no version.
+    command.upgrade(config, "0001_baseline")
+    engine = sa.create_engine(f"sqlite:///{path}")
+    alice, bob = uuid.uuid4().hex, uuid.uuid4().hex
+    with engine.begin() as conn:
+        conn.execute(sa.text("DROP TABLE alembic_version"))
+        for user_id, name in ((alice, "Alice"), (bob, "Bob")):
+            conn.execute(sa.text(
+                "INSERT INTO users (id, name, email, password_hash, created_at, updated_at) "
+                "VALUES (:id, :name, :email, 'x', CURRENT_TIMESTAMP, CURRENT_TIMESTAMP)"
+            ), {"id": user_id, "name": name, "email": f"{name}@example.com"})
+        conn.execute(sa.text(
+            "INSERT INTO follows (id, follower_id, following_id, created_at) "
+            "VALUES (:id, :alice, :bob, CURRENT_TIMESTAMP)"
+        ), {"id": uuid.uuid4().hex, "alice": alice, "bob": bob})
+        conn.execute(sa.text(
+            "INSERT INTO documents (id, owner_id, title, content, is_public, created_at, updated_at) "
+            "VALUES (:id, :alice, 'Notas', '{}', 0, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP)"
+        ), {"id": uuid.uuid4().hex, "alice": alice})
+
+    command.upgrade(config, "head")
+    with engine.connect() as conn:
+        assert schema_diffs(conn) == ["ix_documents_title_trgm"]
+        counts = conn.execute(sa.text(
+            "SELECT name, follower_count, following_count, token_version FROM users ORDER BY name"
+        )).all()
+        doc = conn.execute(sa.text("SELECT version, search_text, content_hash FROM documents")).one()
+    assert counts == [("Alice", 0, 1, 0), ("Bob", 1, 0, 0)]
+    assert tuple(doc) == (1, "", None)
+    engine.dispose()
+
+
+def test_unread_notifications_keep_their_counts(tmp_path, monkeypatch):
+    path = tmp_path / "notified.db"
+    config = alembic_config(path, monkeypatch)
+    command.upgrade(config, "0003_performance_indexes")
+    engine = sa.create_engine(f"sqlite:///{path}")
+    alice, bob = uuid.uuid4().hex, uuid.uuid4().hex
+    with engine.begin() as conn:
+        for user_id, name in ((alice, "Alice"), (bob, "Bob")):
+            conn.execute(sa.text(
+                "INSERT INTO users (id, name, email, password_hash, created_at, updated_at) "
+                "VALUES (:id, :name, :email, 'x', CURRENT_TIMESTAMP, CURRENT_TIMESTAMP)"
+            ), {"id": user_id, "name": name, "email": f"{name}@example.com"})
+        for read_at in (None, "2026-01-01 00:00:00"):
+            conn.execute(sa.text(
+                "INSERT INTO notifications (id, recipient_id, actor_id, type, group_key, actor_count, "
+                "read_at, created_at, updated_at) VALUES (:id, :alice, :bob, 'like', 'like:x', 5, "
+                ":read_at, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP)"
+            ), {"id": uuid.uuid4().hex, "alice": alice, "bob": bob, "read_at": read_at})
+
+    command.upgrade(config, "head")
+    with engine.connect() as conn:
+        rows = conn.execute(sa.text(
+            "SELECT read_at IS NULL, actor_count, uncounted_actors, "
+            "(SELECT count(*) FROM notification_actors WHERE notification_id = notifications.id) "
+            "FROM notifications ORDER BY read_at IS NULL"
+        )).all()
+    assert [tuple(row) for row in rows] == [(0, 5, 0, 0), (1, 5, 4, 1)]
+    engine.dispose()
@@ -0,0 +1,96 @@
+import pytest
+from sqlalchemy import update
+
+from app.models.notification import Notification
+from app.services.notifications import notification_hub
+from tests.conftest import register_and_login, test_session_maker as session_maker
+
+
+@pytest.mark.asyncio
+async def test_likes_coalesce_into_one_notification(client, auth_headers, publication):
+    for i in range(3):
+        headers = await register_and_login(client, f"Liker{i}", f"liker{i}@example.com")
+        await client.post(f"/api/publications/{publication.id}/like", headers=headers)
+
+    resp = await client.get("/api/notifications/", headers=auth_headers)
+    assert resp.status_code == 200
+    notifications = resp.json()
+    assert len(notifications) == 1
+    assert notifications[0]["type"] == "like"
+    assert notifications[0]["actor_count"] == 3
+    assert notifications[0]["actor_name"] == "Liker2"
+
+    # Once read, the next like starts a fresh notification.
+    await client.post("/api/notifications/read", json={}, headers=auth_headers)
+    headers = await register_and_login(client, "Late", "late@example.com")
+    await client.post(f"/api/publications/{publication.id}/like", headers=headers)
+    unread = await client.get("/api/notifications/?unread_only=true", headers=auth_headers)
+    assert [n["actor_count"] for n in unread.json()] == [1]
+
+
+@pytest.mark.asyncio
+async def test_like_toggles_count_each_actor_once(client, auth_headers, publication):
+    like = f"/api/publications/{publication.id}/like"
+    first = await register_and_login(client, "First", "first@example.com")
+    second = await register_and_login(client, "Second", "second@example.com")
+    for _ in range(3):
+        await client.post(like, headers=first)  # like, unlike, like
+    await client.post(like, headers=second)
+    notifications = (await client.get("/api/notifications/", headers=auth_headers)).json()
+    assert [(n["actor_count"], n["actor_name"]) for n in notifications] == [(2, "Second")]
+
+    # Unliking takes the actor back out; the last one out removes the row.
+    await client.post(like, headers=second)
+    notifications = (await client.get("/api/notifications/", headers=auth_headers)).json()
+    assert [(n["actor_count"], n["actor_name"]) for n in notifications] == [(1, "First")]
+    await client.post(like, headers=first)
+    assert (await client.get("/api/notifications/", headers=auth_headers)).json() == []
+
+
+@pytest.mark.asyncio
+async def test_migrated_notification_keeps_its_uncounted_actors(client, auth_headers, publication):
+    like = f"/api/publications/{publication.id}/like"
+    first = await register_and_login(client, "First", "first@example.com")
+    second = await register_and_login(client, "Second", "second@example.com")
+    await client.post(like, headers=first)
+    # What 0004 leaves on a row that stood for five likers: one in the set.
+    async with session_maker() as session:
+        await session.exec(update(Notification).values(actor_count=5, uncounted_actors=4))
+        await session.commit()
+
+    await client.post(like, headers=second)
+    notifications = (await client.get("/api/notifications/", headers=auth_headers)).json()
+    assert [n["actor_count"] for n in notifications] == [6]
+    await client.post(like, headers=second)
+    await client.post(like, headers=first)
+    notifications = (await client.get("/api/notifications/", headers=auth_headers)).json()
+    assert [n["actor_count"] for n in notifications] == [4]
+
+
+@pytest.mark.asyncio
+async def test_own_actions_do_not_notify(client, auth_headers, publication):
+    await client.post(f"/api/publications/{publication.id}/like", headers=auth_headers)
+    await client.post(
+        f"/api/publications/{publication.id}/comments", json={"content": "me"}, headers=auth_headers
+    )
+    resp = await client.get("/api/notifications/", headers=auth_headers)
+    assert resp.json() == []
+
+
+@pytest.mark.asyncio
+async def test_follow_and_comment_delivered_to_subscriber(client, auth_headers, publication):
+    queue = notification_hub.subscribe(publication.author_id)
+    try:
+        other = await register_and_login(client, "Other", "other@example.com")
+        await client.post(f"/api/users/{publication.author_id}/follow", headers=other)
+        await client.post(
+            f"/api/publications/{publication.id}/comments", json={"content": "hi"}, headers=other
+        )
+        first, second = queue.get_nowait(), queue.get_nowait()
+    finally:
+        notification_hub.unsubscribe(publication.author_id, queue)
+
+    assert first["type"] == "follow"
+    assert first["actor_name"] == "Other"
+    assert second["type"] == "comment"
+    assert second["publication_id"] == str(publication.id)
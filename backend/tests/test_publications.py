@@ -0,0 +1,134 @@
+import asyncio
+import uuid
+
+import pytest
+
+from app.config import settings
+from app.models.publication import Publication
+from app.services.counters import CounterBuffer, counter_buffer, reconcile_publication_counters
+from app.telemetry import REQUEST_DB_QUERIES
+from tests.conftest import register_and_login, test_session_maker as session_maker
+
+
+@pytest.mark.asyncio
+async def test_toggle_like_updates_count(client, auth_headers, publication):
+    resp = await client.post(f"/api/publications/{publication.id}/like", headers=auth_headers)
+    assert resp.json() == {"liked": True, "like_count": 1}
+
+    other = await register_and_login(client, "Other", "other@example.com")
+    resp = await client.post(f"/api/publications/{publication.id}/like", headers=other)
+    assert resp.json() == {"liked": True, "like_count": 2}
+
+    resp = await client.post(f"/api/publications/{publication.id}/like", headers=auth_headers)
+    assert resp.json() == {"liked": False, "like_count": 1}
+
+
+@pytest.mark.asyncio
+async def test_like_missing_publication(client, auth_headers):
+    resp = await client.post(
+        "/api/publications/00000000-0000-0000-0000-000000000000/like", headers=auth_headers
+    )
+    assert resp.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_comment_count(client, auth_headers, publication):
+    resp = await client.post(
+        f"/api/publications/{publication.id}/comments",
+        json={"content": "Nice"},
+        headers=auth_headers,
+    )
+    assert resp.status_code == 201
+    comment_id = resp.json()["id"]
+    pub = await client.get(f"/api/publications/{publication.id}", headers=auth_headers)
+    assert pub.json()["comment_count"] == 1
+
+    await client.delete(f"/api/comments/{comment_id}", headers=auth_headers)
+    pub = await client.get(f"/api/publications/{publication.id}", headers=auth_headers)
+    assert pub.json()["comment_count"] == 0
+
+
+@pytest.mark.asyncio
+async def test_write_behind_counters(client, auth_headers, publication, monkeypatch):
+    monkeypatch.setattr(settings, "counter_write_behind", True)
+    resp = await client.post(f"/api/publications/{publication.id}/like", headers=auth_headers)
+    assert resp.json() == {"liked": True, "like_count": 1}
+
+    # Not yet written to the row
+    pub = await client.get(f"/api/publications/{publication.id}", headers=auth_headers)
+    assert pub.json()["like_count"] == 0
+
+    async with session_maker() as session:
+        await counter_buffer.flush(session)
+        await session.commit()
+    pub = await client.get(f"/api/publications/{publication.id}", headers=auth_headers)
+    assert pub.json()["like_count"] == 1
+
+
+@pytest.mark.asyncio
+async def test_reconcile_counters(client, auth_headers, publication):
+    await client.post(f"/api/publications/{publication.id}/like", headers=auth_headers)
+    async with session_maker() as session:
+        pub = await session.get(Publication, publication.id)
+        pub.like_count = 42
+        session.add(pub)
+        await session.commit()
+
+        assert await reconcile_publication_counters(session) == 1
+
+    pub = await client.get(f"/api/publications/{publication.id}", headers=auth_headers)
+    assert pub.json()["like_count"] == 1
+
+
+@pytest.mark.asyncio
+async def test_cancelled_counter_flush_keeps_its_deltas():
+    class StuckSession:
+        async def connection(self):
+            await asyncio.Event().wait()
+
+    buffer, pub_id = CounterBuffer(), uuid.uuid4()
+    buffer.add(pub_id, "like_count", 3)
+    flush = asyncio.create_task(buffer.flush(StuckSession()))
+    await asyncio.sleep(0)
+    flush.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await flush
+    assert buffer.pending(pub_id, "like_count") == 3
+
+
+@pytest.mark.asyncio
+async def test_reconcile_refuses_while_deltas_may_be_buffered(monkeypatch):
+    monkeypatch.setattr(settings, "counter_write_behind", True)
+    async with session_maker() as session:
+        with pytest.raises(RuntimeError):
+            await reconcile_publication_counters(session)
+
+
+@pytest.mark.asyncio
+async def test_feed_new_since_probe(client, auth_headers, publication, monkeypatch):
+    follower = await register_and_login(client, "Follower", "follower@example.com")
+    await client.post(f"/api/users/{publication.author_id}/follow", headers=follower)
+
+    resp = await client.get(
+        "/api/publications/feed/new",
+        params={"since_created_at": "2000-01-01T00:00:00", "since_id": str(publication.id)},
+        headers=follower,
+    )
+    assert resp.status_code == 200
+    assert resp.json() == {"count": 1, "ids": [str(publication.id)], "has_more": False}
+
+    params = {"since_created_at": publication.created_at.isoformat(), "since_id": str(publication.id)}
+    resp = await client.get("/api/publications/feed/new", params=params, headers=follower)
+    assert resp.json()["count"] == 0
+    # Served from the in-memory high-water mark this time, without a query.
+    queries = []
+    observe = REQUEST_DB_QUERIES.observe
+
+    def record(value, **labels):
+        queries.append(value)
+        observe(value, **labels)
+
+    monkeypatch.setattr(REQUEST_DB_QUERIES, "observe", record)
+    resp = await client.get("/api/publications/feed/new", params=params, headers=follower)
+    assert resp.json()["count"] == 0
+    assert queries == [0]
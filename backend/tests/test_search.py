@@ -0,0 +1,85 @@
+import uuid
+from datetime import datetime
+
+import pytest
+
+from app.models.document import Document
+from app.services.search import reindex_search
+from app.utils.pagination import encode_cursor
+from app.utils.tiptap import extract_text
+from tests.conftest import register_and_login, test_session_maker as session_maker
+
+
+def _doc(*paragraphs):
+    return {"type": "doc", "content": [
+        {"type": "paragraph", "content": [{"type": "text", "text": text}]} for text in paragraphs
+    ]}
+
+
+def test_extract_text():
+    content = {"type": "doc", "content": [
+        {"type": "heading", "content": [{"type": "text", "text": "Teo"}, {"type": "text", "text": "rema"}]},
+        {"type": "paragraph", "content": [
+            {"type": "text", "text": "Seja "},
+            {"type": "inlineMath", "attrs": {"latex": "x^2"}},
+        ]},
+    ]}
+    assert extract_text(content) == "Teorema\nSeja  x^2"
+    assert extract_text({"type": "latex", "source": "\\section{A}"}) == "\\section{A}"
+
+
+@pytest.mark.asyncio
+async def test_search_documents_and_publications(client, auth_headers, publication):
+    await client.post("/api/documents/", json={"title": "Notes", "content": _doc("Integral de Riemann")}, headers=auth_headers)
+    created = await client.post("/api/documents/", json={"title": "Riemann sums"}, headers=auth_headers)
+    await client.put(f"/api/documents/{created.json()['id']}", json={"content": _doc("updated body")}, headers=auth_headers)
+    # Someone else's document is never returned
+    other = await register_and_login(client, "Other", "other@example.com")
+    await client.post("/api/documents/", json={"title": "Riemann private"}, headers=other)
+
+    resp = await client.get("/api/search/?q=riemann", headers=auth_headers)
+    assert resp.status_code == 200
+    results = resp.json()
+    assert sorted(r["title"] for r in results) == ["Notes", "Riemann sums"]
+    notes = next(r for r in results if r["title"] == "Notes")
+    assert notes["kind"] == "document"
+    assert notes["snippet"] == "Integral de <mark>Riemann</mark>"
+
+    await client.post("/api/documents/", json={
+        "title": "Evil", "content": _doc("<img src=x onerror=alert(1)> riemann & co"),
+    }, headers=auth_headers)
+    resp = await client.get("/api/search/?q=riemann", headers=auth_headers)
+    evil = next(r for r in resp.json() if r["title"] == "Evil")
+    assert evil["snippet"] == "&lt;img src=x onerror=alert(1)&gt; <mark>riemann</mark> &amp; co"
+    await client.delete(f"/api/documents/{evil['id']}", headers=auth_headers)
+
+    # Content updates are reindexed
+    resp = await client.get("/api/search/?q=updated", headers=auth_headers)
+    assert [r["title"] for r in resp.json()] == ["Riemann sums"]
+
+    resp = await client.get(f"/api/search/?q={publication.title}", headers=auth_headers)
+    assert [r["kind"] for r in resp.json()] == ["publication"]
+
+    first = await client.get("/api/search/?q=riemann&limit=1", headers=auth_headers)
+    second = await client.get(
+        f"/api/search/?q=riemann&limit=1&cursor={first.headers['X-Next-Cursor']}", headers=auth_headers
+    )
+    assert {first.json()[0]["id"], second.json()[0]["id"]} == {r["id"] for r in results}
+    # A time cursor from another list is no rank.
+    other = encode_cursor(datetime(2026, 1, 1), uuid.uuid4())
+    resp = await client.get(f"/api/search/?q=riemann&cursor={other}", headers=auth_headers)
+    assert resp.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_reindex_search(client, auth_headers):
+    created = await client.post("/api/documents/", json={"title": "Old", "content": _doc("legacy text")}, headers=auth_headers)
+    async with session_maker() as session:
+        doc = await session.get(Document, uuid.UUID(created.json()["id"]))
+        doc.search_text = ""
+        session.add(doc)
+        await session.commit()
+        assert await reindex_search(session) == 1
+
+    resp = await client.get("/api/search/?q=legacy", headers=auth_headers)
+    assert [r["title"] for r in resp.json()] == ["Old"]
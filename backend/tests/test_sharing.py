@@ -1,4 +1,12 @@
+import uuid
+
 import pytest
+from sqlmodel import select
+
+from app.models.document import Document, DocumentContent
+from app.routers import sharing
+from app.services.contents import reconcile_content_refs
+from tests.conftest import register_and_login, test_session_maker as session_maker
 
 
 @pytest.mark.asyncio
@@ -66,3 +74,70 @@ async def test_revoke_share(client, auth_headers):
     # Token should no longer work
     resp = await client.get(f"/api/shared/{token}")
     assert resp.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_copies_share_content_until_edited(client, auth_headers):
+    content = {"type": "doc", "content": [{"type": "paragraph", "text": "template"}]}
+    doc = await client.post("/api/documents/", json={"title": "Template", "content": content}, headers=auth_headers)
+    doc_id = doc.json()["id"]
+    share = await client.post(f"/api/documents/{doc_id}/share", headers=auth_headers)
+    token = share.json()["share_token"]
+    copier_headers = await register_and_login(client, "Copier", "copier@example.com")
+
+    copies = []
+    for _ in range(3):
+        resp = await client.post(f"/api/shared/{token}/copy", headers=copier_headers)
+        assert resp.json()["content"] == content
+        copies.append(resp.json()["id"])
+
+    async with session_maker() as session:
+        stored = (await session.exec(select(DocumentContent))).all()
+        assert [row.ref_count for row in stored] == [4]
+        original = await session.get(Document, uuid.UUID(doc_id))
+        assert original.content == {}
+
+    # Reads resolve the shared content
+    assert (await client.get(f"/api/shared/{token}")).json()["content"] == content
+    assert (await client.get(f"/api/documents/{copies[0]}", headers=copier_headers)).json()["content"] == content
+
+    # The first save gives a copy its own content and drops its reference
+    edited = {"type": "doc", "content": [{"type": "paragraph", "text": "mine"}]}
+    await client.put(f"/api/documents/{copies[0]}", json={"content": edited}, headers=copier_headers)
+    await client.delete(f"/api/documents/{copies[1]}", headers=copier_headers)
+    assert (await client.get(f"/api/documents/{copies[0]}", headers=copier_headers)).json()["content"] == edited
+    assert (await client.get(f"/api/documents/{copies[2]}", headers=copier_headers)).json()["content"] == content
+
+    async with session_maker() as session:
+        stored = (await session.exec(select(DocumentContent))).all()
+        assert [row.ref_count for row in stored] == [2]
+        assert await reconcile_content_refs(session) == 0
+
+
+@pytest.mark.asyncio
+async def test_racing_first_copies_reference_content_once(client, auth_headers, monkeypatch):
+    content = {"type": "doc", "content": [{"type": "paragraph", "text": "template"}]}
+    doc = await client.post("/api/documents/", json={"title": "Template", "content": content}, headers=auth_headers)
+    share = await client.post(f"/api/documents/{doc.json()['id']}/share", headers=auth_headers)
+    token = share.json()["share_token"]
+    copier_headers = await register_and_login(client, "Copier", "copier@example.com")
+
+    # The second copy runs to completion after the first read the original
+    # (content not yet moved) and before it stores the content.
+    store_content = sharing.store_content
+    raced = []
+
+    async def racing_store_content(session, content, references):
+        if not raced:
+            raced.append(None)
+            raced[0] = await client.post(f"/api/shared/{token}/copy", headers=copier_headers)
+        return await store_content(session, content, references)
+
+    monkeypatch.setattr(sharing, "store_content", racing_store_content)
+    first = await client.post(f"/api/shared/{token}/copy", headers=copier_headers)
+    assert first.status_code == raced[0].status_code == 201
+
+    async with session_maker() as session:
+        stored = (await session.exec(select(DocumentContent))).all()
+        assert [row.ref_count for row in stored] == [3]
+        assert await reconcile_content_refs(session) == 0
@@ -0,0 +1,49 @@
+import asyncio
+import re
+import time
+
+from app.config import settings
+from app.metrics import render
+from app.telemetry import EVENT_LOOP_LAG, REQUEST_SECONDS, monitor_event_loop
+
+
+def sample(text: str, line: str) -> float:
+    match = re.search(rf"^{re.escape(line)} (\S+)$", text, re.MULTILINE)
+    assert match, line
+    return float(match.group(1))
+
+
+async def test_requests_are_timed_by_route_with_their_queries(client, auth_headers):
+    route = "/api/documents/{doc_id}"
+    before = REQUEST_SECONDS.count(method="GET", route=route, status="200")
+    created = await client.post("/api/documents/", json={"title": "Notas"}, headers=auth_headers)
+    doc = await client.get(f"/api/documents/{created.json()['id']}", headers=auth_headers)
+    assert doc.status_code == 200
+    assert REQUEST_SECONDS.count(method="GET", route=route, status="200") == before + 1
+
+    assert (await client.get("/api/no-such-thing")).status_code == 404
+    assert REQUEST_SECONDS.count(method="GET", route="unmatched", status="404") >= 1
+
+    metrics = (await client.get("/metrics")).text
+    # Authentication and the document itself: at least one query per request.
+    assert sample(metrics, f'http_request_db_queries_sum{{route="{route}"}}') >= 1
+    assert sample(metrics, f'http_request_db_seconds_count{{route="{route}"}}') >= 1
+    assert sample(metrics, "http_requests_in_flight") == 0
+    assert 'db_query_seconds_count{pool="test"}' in metrics
+    assert "/metrics" not in metrics
+
+
+async def test_tracing_on_without_an_sdk_changes_nothing(client, auth_headers, monkeypatch):
+    monkeypatch.setattr(settings, "otel_enabled", True)
+    assert (await client.get("/api/documents/", headers=auth_headers)).status_code == 200
+
+
+async def test_blocking_the_loop_shows_up_as_lag():
+    observed = EVENT_LOOP_LAG.count()
+    monitor = asyncio.create_task(monitor_event_loop(0.01))
+    await asyncio.sleep(0)
+    time.sleep(0.05)
+    await asyncio.sleep(0.05)
+    monitor.cancel()
+    assert EVENT_LOOP_LAG.count() > observed
+    assert "event_loop_lag_seconds_bucket" in render()
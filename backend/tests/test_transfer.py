@@ -0,0 +1,118 @@
+import base64
+import io
+import json
+import uuid
+import zipfile
+
+from app.config import settings
+from app.services.transfer import export_documents, run_import
+from app.utils.latex import generate_latex
+from tests.conftest import test_engine
+
+PNG = b"\x89PNG\r\n\x1a\nfake image bytes"
+
+
+def test_generate_latex_from_editor_json():
+    content = {"type": "doc", "content": [
+        {"type": "heading", "attrs": {"level": 1}, "content": [{"type": "text", "text": "Intro"}]},
+        {"type": "paragraph", "content": [
+            {"type": "text", "text": "50% of ", "marks": [{"type": "bold"}]},
+            {"type": "inlineMath", "attrs": {"latex": "α+1"}},
+        ]},
+        {"type": "calloutBlock", "attrs": {"calloutType": "theorem"}, "content": [
+            {"type": "paragraph", "content": [{"type": "text", "text": "True."}]},
+        ]},
+    ]}
+    tex = generate_latex(content)
+    assert "\\section{Intro}" in tex
+    assert "\\textbf{50\\% of }$\\alpha+1$" in tex
+    assert "\\newtheorem{theorem}{Teorema}" in tex
+    assert "\\begin{theorem}\nTrue.\n\\end{theorem}" in tex
+    assert generate_latex({"type": "latex", "source": "\\documentclass{article}"}) == "\\documentclass{article}"
+
+
+async def test_export_streams_zip_of_all_documents(client, auth_headers, tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "blob_dir", str(tmp_path))
+    data_url = "data:image/png;base64," + base64.b64encode(PNG).decode()
+    await client.post("/api/documents/", json={"title": "Com figura", "content": {"type": "doc", "content": [
+        {"type": "image", "attrs": {"src": data_url, "assetFilename": "fig.png"}},
+    ]}}, headers=auth_headers)
+    await client.post("/api/documents/", json={
+        "title": "Fonte", "content": {"type": "latex", "source": "\\documentclass{article}"},
+    }, headers=auth_headers)
+
+    response = await client.get("/api/documents/export", headers=auth_headers)
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/zip"
+
+    archive = zipfile.ZipFile(io.BytesIO(response.content))
+    names = archive.namelist()
+    figure = next(name.split("/")[0] for name in names if name.startswith("com-figura-"))
+    assert archive.read(f"{figure}/fig.png") == PNG
+    assert "\\includegraphics[width=0.8\\textwidth]{fig.png}" in archive.read(f"{figure}/document.tex").decode()
+    meta = json.loads(archive.read(f"{figure}/document.json"))
+    assert meta["title"] == "Com figura"
+    source = next(name for name in names if name.startswith("fonte-") and name.endswith(".tex"))
+    assert archive.read(source) == b"\\documentclass{article}"
+
+
+async def test_import_creates_documents_in_background_job(client, auth_headers, tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "blob_dir", str(tmp_path))
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        archive.writestr("tese/main.tex", "\\documentclass{article}\\title{Minha Tese}\\input{cap1}")
+        archive.writestr("tese/cap1.tex", "\\section{Um}")
+        archive.writestr("tese/figs/a.png", PNG)
+        archive.writestr("tese/figs/nota.html", "<script>alert(1)</script>")
+        archive.writestr("tese/main.aux", "junk")
+        archive.writestr("notas.tex", "\\documentclass{article}")
+
+    response = await client.post(
+        "/api/documents/import",
+        files={"file": ("projetos.zip", buffer.getvalue(), "application/zip")},
+        headers=auth_headers,
+    )
+    assert response.status_code == 202
+    job = (await client.get(f"/api/jobs/{response.json()['id']}", headers=auth_headers)).json()
+    assert job["status"] == "succeeded"
+    assert job["processed"] == job["total"] == 2
+
+    docs = {}
+    for doc_id in job["result"]["document_ids"]:
+        doc = (await client.get(f"/api/documents/{doc_id}", headers=auth_headers)).json()
+        docs[doc["title"]] = doc["content"]
+    assert set(docs) == {"Minha Tese", "notas"}
+    assets = {asset["filename"]: asset["src"] for asset in docs["Minha Tese"]["assets"]}
+    blob = await client.get(assets["figs/a.png"])
+    assert blob.content == PNG
+    assert blob.headers["content-type"] == "image/png"
+    html = await client.get(assets["figs/nota.html"])
+    assert html.headers["content-type"] == "application/octet-stream"
+    assert html.headers["content-disposition"].startswith("attachment")
+    assert "assets" not in docs["notas"]
+
+    bad = await client.post(
+        "/api/documents/import", files={"file": ("x.zip", b"not a zip", "application/zip")}, headers=auth_headers,
+    )
+    assert bad.status_code == 400
+
+
+async def test_import_archive_is_deleted_even_if_the_job_does_not_run(tmp_path):
+    path = tmp_path / "upload.zip"
+    path.write_bytes(b"PK")
+    await run_import(uuid.uuid4(), path)
+    assert not path.exists()
+
+
+async def test_export_holds_no_connection_between_batches(client, auth_headers):
+    for title in ("Um", "Dois"):
+        await client.post("/api/documents/", json={"title": title}, headers=auth_headers)
+    owner_id = uuid.UUID((await client.get("/api/auth/me", headers=auth_headers)).json()["id"])
+
+    chunks = []
+    async for chunk in export_documents(owner_id):
+        # The client may take its time with every chunk.
+        assert test_engine.pool.checkedout() == 0
+        chunks.append(chunk)
+    names = zipfile.ZipFile(io.BytesIO(b"".join(chunks))).namelist()
+    assert len([name for name in names if name.endswith("document.json")]) == 2
@@ -159,13 +159,14 @@ function EditorApp({ initialDocId, onGoHome }: { initialDocId: string; onGoHome:
     const registered = getCompileAssets()
     const registeredNames = new Set(registered.map((a) => a.filename))
 
-    // Scan editor content for image nodes with base64 src + assetFilename
+    // Scan editor content for image nodes with an inline or blob src + assetFilename
     if (editor) {
       editor.state.doc.descendants((node) => {
         if (node.type.name === 'image') {
           const src = node.attrs.src as string | undefined
           const assetFilename = node.attrs.assetFilename as string | undefined
-          if (src?.startsWith('data:') && assetFilename && !registeredNames.has(assetFilename)) {
+          const embedded = src?.startsWith('data:') || src?.startsWith('/api/blobs/')
+          if (embedded && assetFilename && !registeredNames.has(assetFilename)) {
             registered.push({ filename: assetFilename, dataUrl: src })
             registeredNames.add(assetFilename)
           }
@@ -16,10 +16,22 @@ export interface DocumentFull extends DocumentListItem {
   google_drive_file_id: string | null
 }
 
-export async function listDocuments(): Promise<DocumentListItem[]> {
-  const res = await apiFetch('/documents/')
+export interface DocumentListPage {
+  items: DocumentListItem[]
+  nextCursor: string | null
+}
+
+export async function listDocuments(
+  options: { q?: string; cursor?: string; limit?: number } = {},
+): Promise<DocumentListPage> {
+  const params = new URLSearchParams()
+  if (options.q) params.set('q', options.q)
+  if (options.cursor) params.set('cursor', options.cursor)
+  if (options.limit) params.set('limit', String(options.limit))
+  const query = params.toString()
+  const res = await apiFetch(`/documents/${query ? `?${query}` : ''}`)
   if (!res.ok) throw new Error('Failed to list documents')
-  return res.json()
+  return { items: await res.json(), nextCursor: res.headers.get('X-Next-Cursor') }
 }
 
 export async function getDocument(id: string): Promise<DocumentFull> {
@@ -39,7 +51,7 @@ export async function createDocument(title?: string, content?: Record<string, an
   return res.json()
 }
 
-export async function updateDocument(id: string, data: { title?: string; content?: any }): Promise<DocumentFull> {
+export async function updateDocument(id: string, data: { title?: string; content?: any }): Promise<{ version: number }> {
   const res = await apiFetch(`/documents/${id}`, {
     method: 'PUT',
     body: JSON.stringify(data),
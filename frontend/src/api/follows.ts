@@ -21,14 +21,29 @@ export async function toggleFollow(userId: string): Promise<{ following: boolean
   return res.json()
 }
 
-export async function getFollowers(userId: string): Promise<{ id: string; name: string }[]> {
-  const res = await apiFetch(`/users/${userId}/followers`)
-  if (!res.ok) throw new Error('Failed to get followers')
-  return res.json()
+export interface FollowListItem {
+  id: string
+  name: string
+  followed_at: string
+  is_following: boolean
 }
 
-export async function getFollowing(userId: string): Promise<{ id: string; name: string }[]> {
-  const res = await apiFetch(`/users/${userId}/following`)
-  if (!res.ok) throw new Error('Failed to get following')
-  return res.json()
+export interface FollowListPage {
+  items: FollowListItem[]
+  nextCursor: string | null
+}
+
+async function getFollowPage(path: string, cursor?: string): Promise<FollowListPage> {
+  const query = cursor ? `?cursor=${encodeURIComponent(cursor)}` : ''
+  const res = await apiFetch(`${path}${query}`)
+  if (!res.ok) throw new Error('Failed to get follow list')
+  return { items: await res.json(), nextCursor: res.headers.get('X-Next-Cursor') }
+}
+
+export function getFollowers(userId: string, cursor?: string): Promise<FollowListPage> {
+  return getFollowPage(`/users/${userId}/followers`, cursor)
+}
+
+export function getFollowing(userId: string, cursor?: string): Promise<FollowListPage> {
+  return getFollowPage(`/users/${userId}/following`, cursor)
 }
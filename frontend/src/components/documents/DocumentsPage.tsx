@@ -289,12 +289,43 @@ export function DocumentsPage() {
   const [layout, setLayout] = useState<ViewLayout>('grid')
   const [creating, setCreating] = useState(false)
 
+  const [nextCursor, setNextCursor] = useState<string | null>(null)
+  const [loadingMore, setLoadingMore] = useState(false)
+
+  // Search runs on the server; debounce while the user is typing.
   useEffect(() => {
-    listDocuments()
-      .then(setDocuments)
-      .catch(console.error)
-      .finally(() => setLoading(false))
-  }, [])
+    let cancelled = false
+    const timer = setTimeout(() => {
+      listDocuments({ q: search.trim() || undefined })
+        .then((page) => {
+          if (cancelled) return
+          setDocuments(page.items)
+          setNextCursor(page.nextCursor)
+        })
+        .catch(console.error)
+        .finally(() => {
+          if (!cancelled) setLoading(false)
+        })
+    }, search ? 250 : 0)
+    return () => {
+      cancelled = true
+      clearTimeout(timer)
+    }
+  }, [search])
+
+  async function handleLoadMore() {
+    if (!nextCursor || loadingMore) return
+    setLoadingMore(true)
+    try {
+      const page = await listDocuments({ q: search.trim() || undefined, cursor: nextCursor })
+      setDocuments(prev => [...prev, ...page.items])
+      setNextCursor(page.nextCursor)
+    } catch (err) {
+      console.error(err)
+    } finally {
+      setLoadingMore(false)
+    }
+  }
 
   const handleCreate = useCallback(async () => {
     if (creating) return
@@ -317,11 +348,7 @@ export function DocumentsPage() {
     }
   }
 
-  const filtered = documents.filter(d =>
-    (d.title || 'Sem título').toLowerCase().includes(search.toLowerCase())
-  )
-
-  const sorted = [...filtered].sort((a, b) => {
+  const sorted = [...documents].sort((a, b) => {
     if (sort === 'recent') return new Date(b.updated_at).getTime() - new Date(a.updated_at).getTime()
     if (sort === 'oldest') return new Date(a.updated_at).getTime() - new Date(b.updated_at).getTime()
     return (a.title || '').localeCompare(b.title || '')
@@ -425,6 +452,14 @@ export function DocumentsPage() {
           ))}
         </div>
       )}
+      {!loading && nextCursor && (
+        <div className="docs-page-load-more">
+          <button onClick={handleLoadMore} disabled={loadingMore} className="docs-page-empty-btn">
+            {loadingMore && <Loader2 size={16} className="animate-spin" />}
+            Carregar mais
+          </button>
+        </div>
+      )}
     </main>
   )
 }
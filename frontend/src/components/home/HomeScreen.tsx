@@ -261,8 +261,8 @@ export function HomeScreen() {
   const [creatingTemplateId, setCreatingTemplateId] = useState<string | null>(null)
 
   useEffect(() => {
-    listDocuments()
-      .then(setDocuments)
+    listDocuments({ limit: 6 })
+      .then((page) => setDocuments(page.items))
       .catch(console.error)
       .finally(() => setLoading(false))
   }, [])
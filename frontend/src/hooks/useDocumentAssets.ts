@@ -9,6 +9,7 @@ export interface AssetEntry {
 
 export interface CompileAsset {
   filename: string
+  /** Inline data URL, or a server blob URL (``/api/blobs/<hash>``) */
   dataUrl: string
 }
 
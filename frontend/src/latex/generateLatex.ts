@@ -214,7 +214,7 @@ function processNode(node: JSONContent): string {
       const figLabel = (node.attrs?.label ?? '') as string
       const starred = node.attrs?.starred ? '*' : ''
       const alignCmd = alignment === 'left' ? '\\raggedright' : alignment === 'right' ? '\\raggedleft' : '\\centering'
-      const isBase64 = src.startsWith('data:')
+      const isBase64 = src.startsWith('data:') || src.startsWith('/api/blobs/')
       const lines = [
         `\\begin{figure${starred}}[${position}]`,
         `  ${alignCmd}`,
@@ -18,7 +18,9 @@ export async function compileLatexSource(
 
   // Asset files (images, .bib, etc.)
   for (const asset of assets) {
-    const blob = dataUrlToBlob(asset.dataUrl)
+    const blob = asset.dataUrl.startsWith('data:')
+      ? dataUrlToBlob(asset.dataUrl)
+      : await (await fetch(asset.dataUrl)).blob()
     formData.append('assets', blob, asset.filename)
   }
 